@@ -5,6 +5,16 @@ import cv2
 import mediapipe as mp
 import numpy as np
 import logging
+import time
+from threading import Lock
+from src.core.video_processor import CaptureManager
+from src.core.broadcast import FrameBroadcaster
+from src.core.streaming import AdaptiveJPEGEncoder, MJPEGStreamWriter, MJPEG_MIMETYPE
+from src.core.model_pool import ModelPool
+from src.core.renderer import OverlayRenderer
+from src.core.landmarks import LandmarkExtractor
+from src.core.scheduler import ResolutionLadder
+from src.core.model_manager import PoseModelManager
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -20,19 +30,23 @@ app = Flask(__name__,
            static_folder=static_dir)
 
 # MediaPipe 初始化
-mp_pose = mp.solutions.pose
 mp_hands = mp.solutions.hands
-mp_drawing = mp.solutions.drawing_utils
-mp_drawing_styles = mp.solutions.drawing_styles
 mp_face_mesh = mp.solutions.face_mesh
 
-pose = mp_pose.Pose(
-    static_image_mode=False,
-    model_complexity=2,
-    enable_segmentation=True,
-    smooth_landmarks=True,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
+# 预热 model_complexity 0/1/2 三个实例，按推理延迟 p95 自动切换；
+# 与推理分辨率阶梯共用同一延迟信号：先降复杂度再降分辨率，恢复时先升分辨率再升复杂度
+pose = PoseModelManager(
+    levels=(0, 1, 2),
+    initial=2,
+    target_frame_time=1.0 / 30,
+    can_upgrade=lambda: resolution_ladder.at_full_resolution(),
+    pose_options={
+        'static_image_mode': False,
+        'enable_segmentation': True,
+        'smooth_landmarks': True,
+        'min_detection_confidence': 0.5,
+        'min_tracking_confidence': 0.5
+    }
 )
 
 hands = mp_hands.Hands(
@@ -49,10 +63,40 @@ face_mesh = mp_face_mesh.FaceMesh(
     min_tracking_confidence=0.5
 )
 
+# 并发推理配置：三个模型在线程池中并发处理同一帧
+INFERENCE_CONFIG = {
+    'concurrent': os.environ.get('INFERENCE_CONCURRENT', '1') != '0',
+    'max_workers': int(os.environ.get('INFERENCE_WORKERS', '3')),
+    # 推理分辨率阶梯，格式 "640x480,320x240,256x192"
+    'resolution_ladder': [
+        tuple(int(v) for v in rung.split('x'))
+        for rung in os.environ.get('INFERENCE_RESOLUTIONS', '640x480,480x360,320x240,256x192').split(',')
+    ]
+}
+
+model_pool = ModelPool(
+    {'pose': pose, 'hands': hands, 'face_mesh': face_mesh},
+    max_workers=INFERENCE_CONFIG['max_workers'],
+    concurrent=INFERENCE_CONFIG['concurrent']
+)
+
+resolution_ladder = ResolutionLadder(INFERENCE_CONFIG['resolution_ladder'], target_latency=1.0 / 30,
+                                     model_manager=pose)
+overlay_renderer = OverlayRenderer()
+jpeg_encoder = AdaptiveJPEGEncoder(quality=80, target_fps=30)
+landmark_extractor = LandmarkExtractor(max_hands=2, max_faces=1)
+
 # 全局变量
-camera = None
+capture_manager = CaptureManager({
+    'device': 0,
+    'width': 640,
+    'height': 480,
+    'fps': 30,
+    'buffer_size': 2
+})
 current_frame = None
-current_pose = None
+current_pose = None  # 最近一帧的姿态关键点副本 (33, 3)，整体替换，读写都持 pose_lock
+pose_lock = Lock()
 
 @app.route('/')
 def index():
@@ -60,19 +104,12 @@ def index():
 
 @app.route('/start_capture', methods=['POST'])
 def start_capture():
-    global camera
     try:
-        if camera is not None:
-            camera.release()  # 确保先释放之前的摄像头
+        capture_manager.release_capture()  # 确保先释放之前的摄像头
         
-        camera = cv2.VideoCapture(0)
-        if not camera.isOpened():
+        # 启动采集线程（摄像头参数在 CaptureManager 配置中设置）
+        if not capture_manager.start_capture():
             raise Exception("无法打开摄像头")
-            
-        # 设置摄像头参数
-        camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        camera.set(cv2.CAP_PROP_FPS, 30)
         
         logger.info("摄像头已成功启动")
         return jsonify({"message": "摄像头已启动", "status": "success"}), 200
@@ -82,346 +119,93 @@ def start_capture():
 
 @app.route('/stop_capture', methods=['POST'])
 def stop_capture():
-    global camera
     try:
-        if camera is not None:
-            camera.release()
-            camera = None
+        if capture_manager.is_running():
+            capture_manager.release_capture()
             logger.info("摄像头已关闭")
         return jsonify({"message": "摄像头已关闭", "status": "success"}), 200
     except Exception as e:
         logger.error(f"关闭摄像头失败: {str(e)}")
         return jsonify({"error": str(e), "status": "error"}), 500
 
-def generate_frames():
-    global camera, current_frame, current_pose
-    
-    # 定义上半身的连接关系
-    POSE_CONNECTIONS = [
-        # 面部关键点
-        (0, 1), (1, 2), (2, 3), (3, 4),    # 左侧面部
-        (0, 4), (4, 5), (5, 6), (6, 7),    # 右侧面部
-        (8, 9), (9, 10),                    # 嘴部
-        (0, 5),                             # 眉心连接
-        (1, 2), (2, 3),                     # 左眉
-        (4, 5), (5, 6),                     # 右眉
-        (2, 5),                             # 鼻梁
-        (3, 6),                             # 眼睛连接
-        
-        # 身体关键点
-        (11, 12),                           # 肩膀连接
-        (11, 13), (13, 15),                 # 左臂
-        (12, 14), (14, 16),                 # 右臂
-        
-        # 左手指连接
-        (15, 17), (17, 19), (19, 21),       # 左手拇指
-        (15, 17), (17, 19), (19, 21),       # 左手食指
-        (15, 17), (17, 19), (19, 21),       # 左手中指
-        (15, 17), (17, 19), (19, 21),       # 左手无名指
-        (15, 17), (17, 19), (19, 21),       # 左手小指
-        
-        # 右手指连接
-        (16, 18), (18, 20), (20, 22),       # 右手拇指
-        (16, 18), (18, 20), (20, 22),       # 右手食指
-        (16, 18), (18, 20), (20, 22),       # 右手中指
-        (16, 18), (18, 20), (20, 22),       # 右手无名指
-        (16, 18), (18, 20), (20, 22),       # 右手小指
-        
-        # 手指横向连接
-        (17, 19), (19, 21),                 # 左手指节连接
-        (18, 20), (20, 22),                 # 右手指节连接
-        
-        # 躯干
-        (11, 23), (12, 24), (23, 24)        # 上身躯干
-    ]
-    
-    # 更新关键点列表
-    upper_body_points = [
-        # 面部关键点
-        0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10,
-        # 身体关键点
-        11, 12, 13, 14, 15, 16,
-        # 手指关键点
-        17, 18, 19, 20, 21, 22,             # 基础手指点
-        23, 24                              # 躯干点
-    ]
+def produce_frame():
+    """采集最新帧并完成推理、绘制和JPEG编码，返回 EncodedFrame
 
-    # 定义面部关键连接，更详细的版本
-    FACE_CONNECTIONS = [
-        # 眉毛
-        ([70, 63, 105, 66, 107, 55, 65], (0, 0, 255)),          # 左眉
-        ([336, 296, 334, 293, 300, 285, 295], (0, 0, 255)),     # 右眉
-        
-        # 眼睛
-        ([33, 246, 161, 160, 159, 158, 157, 173, 133], (255, 0, 0)),  # 左眼
-        ([362, 398, 384, 385, 386, 387, 388, 466, 263], (255, 0, 0)), # 右眼
-        
-        # 鼻子
-        ([168, 6, 197, 195, 5], (0, 255, 0)),        # 鼻梁
-        ([198, 209, 49, 48, 219], (0, 255, 0)),      # 鼻翼左
-        ([420, 432, 279, 278, 438], (0, 255, 0)),    # 鼻翼右
-        
-        # 嘴唇
-        ([61, 185, 40, 39, 37, 0, 267, 269, 270, 409, 291], (0, 255, 255)),  # 上唇
-        ([146, 91, 181, 84, 17, 314, 405, 321, 375, 291], (0, 255, 255)),    # 下唇
+    由帧广播中心的生产线程调用，所有 /video_feed 客户端共享结果；没有新帧时返回 None。
+    """
+    global current_frame, current_pose
+    
+    try:
+        if not capture_manager.is_running():
+            logger.warning("摄像头未打开或已断开")
+            frame = np.zeros((480, 640, 3), dtype=np.uint8)
+            time.sleep(0.1)
+            return jpeg_encoder.encode(frame)
+
+        # 总是取采集线程中最新的一帧，过期帧已被丢弃
+        latest = capture_manager.get_latest_frame()
+        if latest is None:
+            return None
+        frame_id, frame_time, frame = latest
+
+        # 按当前档位缩小后再推理；关键点为归一化坐标，直接绘制到原始分辨率的帧上
+        start = time.perf_counter()
+        frame_rgb = cv2.cvtColor(resolution_ladder.prepare(frame), cv2.COLOR_BGR2RGB)
         
-        # 面部轮廓关键点
-        ([10, 338, 297, 332, 284], (255, 255, 0)),   # 左脸
-        ([454, 323, 361, 288, 397], (255, 255, 0)),  # 右脸
-        ([152, 148, 176], (255, 255, 0)),            # 下巴
-    ]
-
-    while True:
-        try:
-            if camera is None or not camera.isOpened():
-                logger.warning("摄像头未打开或已断开")
-                frame = np.zeros((480, 640, 3), dtype=np.uint8)
-                ret, buffer = cv2.imencode('.jpg', frame)
-                if ret:
-                    frame_bytes = buffer.tobytes()
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-                continue
-
-            success, frame = camera.read()
-            if not success or frame is None:
-                continue
-
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # 处理姿势
-            pose_results = pose.process(frame_rgb)
-            
-            # 处理手部
-            hands_results = hands.process(frame_rgb)
-
-            # 处理面部
-            face_results = face_mesh.process(frame_rgb)
+        # 姿势、手部、面部模型并发推理，按帧ID汇合结果
+        results = model_pool.process(frame_id, frame_rgb)
+        resolution_ladder.record_latency(time.perf_counter() - start)
+
+        # 每帧只提取一次关键点，后续绘制和 /pose 直接读取数组
+        landmarks = landmark_extractor.extract(
+            frame_id, results['pose'], results['hands'], results['face_mesh'])
+        if landmarks.has_pose:
+            # LandmarkExtractor 的数组两帧后会被覆盖，/pose 在请求线程中读取，必须保存副本
+            pose_points = landmarks.pose[:, :3].copy()
+            with pose_lock:
+                current_pose = pose_points
+
+        # 批量绘制叠加层
+        overlay_renderer.draw(
+            frame,
+            pose=landmarks.pose if landmarks.has_pose else None,
+            hands=landmarks.hand_list,
+            faces=landmarks.face_list
+        )
+
+        # 每帧只编码一次，JPEG 质量/分辨率随客户端吞吐自适应
+        return jpeg_encoder.encode(frame)
 
-            # 绘制姿势关键点
-            if pose_results.pose_landmarks:
-                h, w, c = frame.shape
-                
-                # 绘制连接线
-                for connection in POSE_CONNECTIONS:
-                    try:
-                        start_point = pose_results.pose_landmarks.landmark[connection[0]]
-                        end_point = pose_results.pose_landmarks.landmark[connection[1]]
-                        
-                        if start_point.visibility > 0.5 and end_point.visibility > 0.5:
-                            start_x = int(start_point.x * w)
-                            start_y = int(start_point.y * h)
-                            end_x = int(end_point.x * w)
-                            end_y = int(end_point.y * h)
-                            
-                            # 根据连接类型使用不同颜色
-                            if connection[0] <= 10:  # 面部连接
-                                color = (255, 0, 0)  # 蓝色
-                                thickness = 1
-                            elif connection[0] >= 15 and connection[0] <= 22:  # 手指连接
-                                color = (0, 255, 255)  # 黄色
-                                thickness = 1
-                                # 添加手指关节点
-                                cv2.circle(frame, (start_x, start_y), 2, color, -1)
-                                cv2.circle(frame, (end_x, end_y), 2, color, -1)
-                            else:  # 其他连接
-                                color = (0, 255, 0)  # 绿色
-                                thickness = 2
-                            
-                            cv2.line(frame, (start_x, start_y), (end_x, end_y), 
-                                   color=color, thickness=thickness)
-                    except Exception as e:
-                        continue
-
-                # 绘制关键点
-                for idx in upper_body_points:
-                    try:
-                        landmark = pose_results.pose_landmarks.landmark[idx]
-                        if landmark.visibility > 0.5:
-                            cx = int(landmark.x * w)
-                            cy = int(landmark.y * h)
-                            
-                            if idx <= 10:  # 面部关键点
-                                color = (255, 0, 0)  # 蓝色
-                                radius = 2
-                            elif idx in [11, 12, 13, 14, 15, 16]:  # 手臂关键点
-                                color = (0, 0, 255)  # 红色
-                                radius = 3
-                            elif idx >= 17:  # 手部关键点
-                                color = (0, 255, 255)  # 黄色
-                                radius = 2
-                            else:  # 躯干关键点
-                                color = (255, 255, 0)  # 青色
-                                radius = 3
-                            
-                            cv2.circle(frame, (cx, cy), radius, color, -1)
-                            cv2.circle(frame, (cx, cy), radius + 1, color, 1)
-                    except Exception as e:
-                        continue
-
-            # 绘制手部关键点和连接
-            if hands_results.multi_hand_landmarks:
-                for hand_landmarks in hands_results.multi_hand_landmarks:
-                    # 绘制手部关键点和连接线
-                    mp_drawing.draw_landmarks(
-                        frame,
-                        hand_landmarks,
-                        mp_hands.HAND_CONNECTIONS,
-                        mp_drawing_styles.get_default_hand_landmarks_style(),
-                        mp_drawing_styles.get_default_hand_connections_style()
-                    )
-                    
-                    # 自定义手指连接线
-                    h, w, c = frame.shape
-                    
-                    # 定义手指关键点组
-                    fingers = [
-                        [4, 3, 2, 1],    # 拇指
-                        [8, 7, 6, 5],    # 食指
-                        [12, 11, 10, 9],  # 中指
-                        [16, 15, 14, 13], # 无名指
-                        [20, 19, 18, 17]  # 小指
-                    ]
-                    
-                    # 绘制每个手指的连接线
-                    for finger in fingers:
-                        for i in range(len(finger)-1):
-                            start = hand_landmarks.landmark[finger[i]]
-                            end = hand_landmarks.landmark[finger[i+1]]
-                            
-                            start_x = int(start.x * w)
-                            start_y = int(start.y * h)
-                            end_x = int(end.x * w)
-                            end_y = int(end.y * h)
-                            
-                            # 绘制连接线
-                            cv2.line(frame, 
-                                   (start_x, start_y), 
-                                   (end_x, end_y),
-                                   (0, 255, 255),  # 黄色
-                                   2)
-                            
-                            # 绘制关节点
-                            cv2.circle(frame, (start_x, start_y), 3, (0, 255, 255), -1)
-                            cv2.circle(frame, (end_x, end_y), 3, (0, 255, 255), -1)
-                    
-                    # 绘制手指横向连接
-                    knuckles = [5, 9, 13, 17]  # 指关节点
-                    for i in range(len(knuckles)-1):
-                        start = hand_landmarks.landmark[knuckles[i]]
-                        end = hand_landmarks.landmark[knuckles[i+1]]
-                        
-                        start_x = int(start.x * w)
-                        start_y = int(start.y * h)
-                        end_x = int(end.x * w)
-                        end_y = int(end.y * h)
-                        
-                        cv2.line(frame, 
-                               (start_x, start_y), 
-                               (end_x, end_y),
-                               (0, 255, 255),  # 黄色
-                               1)
-
-            # 绘制面部网格
-            if face_results.multi_face_landmarks:
-                for face_landmarks in face_results.multi_face_landmarks:
-                    h, w, c = frame.shape
-                    
-                    # 绘制所有面部关键点，使用更柔和的颜色
-                    for i in range(468):  # MediaPipe Face Mesh 有468个关键点
-                        landmark = face_landmarks.landmark[i]
-                        x = int(landmark.x * w)
-                        y = int(landmark.y * h)
-                        
-                        # 使用更柔和的颜色方案
-                        if i in range(0, 68):  # 轮廓点
-                            color = (200, 180, 130)  # 淡金色
-                        elif i in range(68, 136):  # 眉毛点
-                            color = (180, 120, 90)  # 深棕色
-                        elif i in range(136, 204):  # 眼睛点
-                            color = (120, 150, 230)  # 淡蓝色
-                        elif i in range(204, 272):  # 鼻子点
-                            color = (150, 200, 180)  # 青绿色
-                        else:  # 嘴唇和其他点
-                            color = (140, 160, 210)  # 淡紫色
-                        
-                        # 绘制更小的点，提高精致感
-                        cv2.circle(frame, (x, y), 1, color, -1)
-                    
-                    # 主要特征连接线使用更优雅的颜色
-                    feature_colors = {
-                        'eyebrow': (160, 140, 110),   # 眉毛：深金色
-                        'eye': (130, 160, 220),       # 眼睛：天蓝色
-                        'nose': (140, 190, 170),      # 鼻子：青色
-                        'mouth': (170, 150, 200),     # 嘴唇：淡紫色
-                        'face': (190, 170, 120)       # 轮廓：金棕色
-                    }
-                    
-                    # 绘制主要连接线
-                    for points, _ in FACE_CONNECTIONS:
-                        points_coords = []
-                        for point_idx in points:
-                            landmark = face_landmarks.landmark[point_idx]
-                            x = int(landmark.x * w)
-                            y = int(landmark.y * h)
-                            points_coords.append((x, y))
-                            
-                            # 根据点的位置选择颜色
-                            if point_idx in range(68, 136):  # 眉毛区域
-                                color = feature_colors['eyebrow']
-                            elif point_idx in range(136, 204):  # 眼睛区域
-                                color = feature_colors['eye']
-                            elif point_idx in range(204, 272):  # 鼻子区域
-                                color = feature_colors['nose']
-                            elif point_idx > 272:  # 嘴唇区域
-                                color = feature_colors['mouth']
-                            else:  # 面部轮廓
-                                color = feature_colors['face']
-                            
-                            # 绘制稍大的关键点
-                            cv2.circle(frame, (x, y), 2, color, -1)
-                        
-                        # 绘制连接线
-                        for i in range(len(points_coords)-1):
-                            cv2.line(frame, points_coords[i], points_coords[i+1], color, 1)
-                    
-                    # 移除文字标注，保持界面简洁
-
-            ret, buffer = cv2.imencode('.jpg', frame)
-            if not ret:
-                continue
-
-            frame_bytes = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+    except Exception as e:
+        logger.error(f"处理帧时出错: {str(e)}")
+        return None
 
-        except Exception as e:
-            logger.error(f"处理帧时出错: {str(e)}")
-            continue
+# 单生产者广播中心：每帧只推理和编码一次
+frame_broadcaster = FrameBroadcaster(produce_frame, queue_size=2)
+mjpeg_writer = MJPEGStreamWriter(frame_broadcaster, jpeg_encoder)
 
 @app.route('/video_feed')
 def video_feed():
     try:
-        return Response(generate_frames(),
-                       mimetype='multipart/x-mixed-replace; boundary=frame')
+        # 所有客户端共享同一个推理管线的输出
+        return Response(mjpeg_writer.stream(), mimetype=MJPEG_MIMETYPE)
     except Exception as e:
         logger.error(f"视频流出错: {str(e)}")
         return "视频流错误", 500
 
 @app.route('/pose')
 def get_pose():
-    if current_pose is None:
+    with pose_lock:
+        pose_points = current_pose
+    if pose_points is None:
         return jsonify([])
-    return jsonify(current_pose)
+    return jsonify(pose_points.tolist())
 
 def restart_camera():
-    global camera
-    if camera is not None:
-        camera.release()
-    camera = cv2.VideoCapture(0)
-    if not camera.isOpened():
+    capture_manager.release_capture()
+    if not capture_manager.start_capture():
         raise Exception("无法重新打开摄像头")
-    return camera.isOpened()
+    return capture_manager.is_running()
 
 @app.route('/restart_camera', methods=['POST'])
 def handle_restart_camera():
@@ -434,14 +218,28 @@ def handle_restart_camera():
     except Exception as e:
         return jsonify({"error": str(e), "status": "error"}), 500
 
+@app.route('/inference_stats')
+def inference_stats():
+    """获取推理延迟、采集和广播统计"""
+    return jsonify({
+        "latency": model_pool.get_latency_stats(),
+        "resolution": resolution_ladder.get_stats(),
+        "pose_model": pose.get_status(),
+        "capture": capture_manager.get_stats(),
+        "broadcast": frame_broadcaster.get_stats(),
+        "jpeg": jpeg_encoder.get_stats()
+    })
+
 # 添加摄像头状态检查路由
 @app.route('/camera_status')
 def camera_status():
-    global camera
-    is_running = camera is not None and camera.isOpened()
+    is_running = capture_manager.is_running()
+    stats = capture_manager.get_stats()
     return jsonify({
         "isRunning": is_running,
-        "status": "running" if is_running else "stopped"
+        "status": "running" if is_running else "stopped",
+        "capturedFrames": stats['captured_frames'],
+        "droppedFrames": stats['dropped_frames']
     })
 
 if __name__ == "__main__":
@@ -1,4 +1,11 @@
-from .server import app
 from .core import CaptureManager, VideoProcessor
 
-__all__ = ['app', 'CaptureManager', 'VideoProcessor']
\ No newline at end of file
+__all__ = ['app', 'CaptureManager', 'VideoProcessor']
+
+
+def __getattr__(name):
+    # 延迟导入 Web 服务：命令行工具和批处理工作进程导入 src 时不加载服务端模型
+    if name == 'app':
+        from .server import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
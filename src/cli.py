@@ -0,0 +1,139 @@
+"""
+命令行入口
+meeting-saver batch <视频文件> -o <输出文件>  离线批量提取录制会议的关键点
+meeting-saver bitrate <关键点文件>          统计关键点文件在各质量等级下每帧的位数
+meeting-saver train-dict <关键点文件>... -o <字典文件>  从录制的关键点训练数据包预置字典
+meeting-saver train-basis <关键点文件>... -o <姿态基文件>  从录制的关键点拟合 PCA 姿态基
+"""
+
+import argparse
+import sys
+import numpy as np
+from .core.batch import process_video, save_keypoints, load_keypoints
+from .core.compression_enhanced import EnhancedCompressor, measure_bitrate, training_payloads
+from .core.dictionary import train_dictionary, save_dictionary, load_dictionary
+from .core.landmarks import expand_selected
+from .core.pca_codec import train_basis, save_basis, compare_with_pointwise
+
+
+def _run_batch(args):
+    keypoints, fps = process_video(
+        args.video,
+        workers=args.workers,
+        segments=args.segments,
+        model_complexity=args.model_complexity
+    )
+    save_keypoints(args.output, keypoints, fps,
+                   packed_quality=args.quality if args.format == 'packed' else None)
+    print(f"已写入 {args.output}: {len(keypoints)} 帧")
+    return 0
+
+
+def _run_bitrate(args):
+    keypoints, fps = load_keypoints(args.keypoints)
+    frames = expand_selected(keypoints)
+    qualities = args.quality or list(EnhancedCompressor().quality_levels)
+    dictionary = load_dictionary(args.dictionary) if args.dictionary else None
+
+    header = f"{'质量等级':<10}{'帧数':>8}{'定长(位/帧)':>14}{'熵编码(位/帧)':>16}{'差分帧节省':>12}"
+    if dictionary:
+        header += f"{'加字典(位/帧)':>16}{'字典压缩帧':>12}"
+    print(header)
+    for quality in qualities:
+        before = measure_bitrate(frames, quality, entropy_coding=False)
+        after = measure_bitrate(frames, quality, entropy_coding=True)
+        saving = 1 - after['delta_bits'] / before['delta_bits'] if before['delta_bits'] else 0.0
+        line = (f"{quality:<10}{after['frames']:>8}{before['mean_bits']:>14.1f}"
+                f"{after['mean_bits']:>16.1f}{saving:>12.1%}")
+        if dictionary:
+            with_dictionary = measure_bitrate(frames, quality, entropy_coding=True, dictionary=dictionary)
+            line += f"{with_dictionary['mean_bits']:>16.1f}{with_dictionary['deflated_frames']:>12}"
+        print(line)
+    return 0
+
+
+def _run_train_dict(args):
+    samples = []
+    for path in args.keypoints:
+        keypoints, _ = load_keypoints(path)
+        frames = expand_selected(keypoints)
+        for quality in EnhancedCompressor().quality_levels:
+            samples.extend(training_payloads(frames, quality))
+
+    dictionary = train_dictionary(samples, size=args.size)
+    save_dictionary(args.output, dictionary, args.version)
+    print(f"已写入 {args.output}: 版本 {args.version}, {len(dictionary)} 字节, 样本 {len(samples)} 个")
+    return 0
+
+
+def _run_train_basis(args):
+    frames = np.concatenate([expand_selected(load_keypoints(path)[0]) for path in args.keypoints])
+    indices = EnhancedCompressor().quality_indices[args.quality]
+    basis = train_basis(frames, indices, components=args.components, version=args.version)
+    save_basis(args.output, basis)
+    print(f"已写入 {args.output}: 版本 {args.version}, {len(indices)} 个点, {len(basis)} 个主成分")
+
+    print(f"{'带宽(Kbps)':<12}{'系数':>6}{'姿态基(位/帧)':>16}{'误差':>10}{'逐点(位/帧)':>14}{'误差':>10}")
+    for bandwidth in args.bandwidth or [0.2, 0.5, 1.0]:
+        report = compare_with_pointwise(frames, basis, args.quality, bandwidth)
+        print(f"{bandwidth:<12}{report['components']:>6}{report['pca_bits']:>16.1f}{report['pca_error']:>10.4f}"
+              f"{report['pointwise_bits']:>14.1f}{report['pointwise_error']:>10.4f}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='meeting-saver', description='Meeting Saver 命令行工具')
+    subparsers = parser.add_subparsers(dest='command')
+
+    batch = subparsers.add_parser('batch', help='离线批量提取视频关键点')
+    batch.add_argument('video', help='录制的视频文件')
+    batch.add_argument('-o', '--output', required=True, help='输出的关键点文件(.npz)')
+    batch.add_argument('-w', '--workers', type=int, default=None, help='工作进程数，默认等于CPU核数')
+    batch.add_argument('-s', '--segments', type=int, default=None, help='视频切分段数，默认为进程数的4倍')
+    batch.add_argument('--model-complexity', type=int, default=1, choices=[0, 1, 2],
+                       help='MediaPipe Pose 模型复杂度')
+    batch.add_argument('-f', '--format', choices=['npz', 'packed'], default='npz',
+                       help='npz 保存原始浮点数组；packed 按帧组量化编码，体积小但有损且不含 z')
+    batch.add_argument('-q', '--quality', default='high', choices=list(EnhancedCompressor().quality_levels),
+                       help='packed 格式使用的质量等级')
+    batch.set_defaults(func=_run_batch)
+
+    bitrate = subparsers.add_parser('bitrate', help='统计关键点文件压缩后每帧的位数')
+    bitrate.add_argument('keypoints', help='batch 命令输出的关键点文件(.npz)')
+    bitrate.add_argument('-q', '--quality', action='append',
+                         help='只统计指定的质量等级，可重复指定，默认全部')
+    bitrate.add_argument('-d', '--dictionary', help='同时统计使用预置字典后的位数')
+    bitrate.set_defaults(func=_run_bitrate)
+
+    train = subparsers.add_parser('train-dict', help='从录制的关键点训练数据包预置字典')
+    train.add_argument('keypoints', nargs='+', help='batch 命令输出的关键点文件(.npz)')
+    train.add_argument('-o', '--output', required=True, help='输出的字典文件')
+    train.add_argument('--size', type=int, default=4096, help='字典大小(字节)')
+    train.add_argument('--version', type=int, default=1, help='字典版本号，两端必须一致')
+    train.set_defaults(func=_run_train_dict)
+
+    basis = subparsers.add_parser('train-basis', help='从录制的关键点拟合 PCA 姿态基')
+    basis.add_argument('keypoints', nargs='+', help='batch 命令输出的关键点文件(.npz)')
+    basis.add_argument('-o', '--output', required=True, help='输出的姿态基文件')
+    basis.add_argument('-q', '--quality', default='medium', choices=list(EnhancedCompressor().quality_levels),
+                       help='姿态基覆盖的点集合取该质量等级传输的点，也是对比的逐点编码等级')
+    basis.add_argument('-k', '--components', type=int, default=16, help='保存的主成分数')
+    basis.add_argument('-b', '--bandwidth', type=float, action='append',
+                       help='对比时的带宽预算(Kbps)，可重复指定')
+    basis.add_argument('--version', type=int, default=1, help='姿态基版本号，两端必须一致')
+    basis.set_defaults(func=_run_train_basis)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not getattr(args, 'func', None):
+        parser.print_help()
+        return 1
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+关键点归档编解码模块
+录制会话按帧组(GOP)整体编码：先量化整段序列，再沿时间轴取整数差分，
+每个帧组按最大残差选择位宽，全部帧组写入一段连续缓冲并附帧组偏移索引，
+可以按帧号直接定位到所在帧组解码。量化、差分和打包都在 NumPy 中按整段完成
+
+缓冲格式：
+  头部: 魔数 | 版本 | 精度 | 点数 P | 总帧数 T | 帧组长度 G | 帧组数
+  P 个点下标(uint8)，帧组数 + 1 个字节偏移(uint32，相对数据区起点)，数据区
+  每个帧组: 有效帧标志(各 1 位) | 残差位宽(5) | 首个有效帧坐标(精度位) |
+           各有效帧可见标志(各 1 位) | 相邻有效帧的坐标差分(残差位宽，有符号)
+"""
+
+import struct
+import numpy as np
+from .bitstream import BitWriter, BitReader
+
+ARCHIVE_MAGIC = b'MSKB'
+ARCHIVE_VERSION = 1
+HEADER_FORMAT = '>4sBBHIHI'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+WIDTH_BITS = 5
+
+
+def encode_gops(keypoints, indices, precision, gop_size=30):
+    """把 (T, N, 4) 关键点序列中 indices 指定的点编码为一段连续缓冲
+
+    含 NaN 的帧（未检测到人体）记为无效帧，解码后整帧为 NaN
+    """
+    keypoints = np.asarray(keypoints, dtype=np.float32)
+    indices = np.asarray(indices, dtype=np.int64)
+    total_frames = len(keypoints)
+    max_val = (1 << precision) - 1
+
+    selected = keypoints[:, indices]
+    valid = ~np.isnan(selected).any(axis=(1, 2))
+    coords = np.zeros(selected.shape[:2] + (2,), dtype=np.int64)
+    coords[valid] = np.clip(np.round(selected[valid, :, :2] * max_val), 0, max_val)
+    visible = selected[..., 3] >= 0.5
+
+    blocks = []
+    for start in range(0, total_frames, gop_size):
+        end = min(start + gop_size, total_frames)
+        blocks.append(_encode_gop(valid[start:end], coords[start:end], visible[start:end], precision))
+
+    offsets = np.concatenate(([0], np.cumsum([len(block) for block in blocks]))).astype('>u4')
+    header = struct.pack(HEADER_FORMAT, ARCHIVE_MAGIC, ARCHIVE_VERSION, precision,
+                         len(indices), total_frames, gop_size, len(blocks))
+    return b''.join([header, indices.astype(np.uint8).tobytes(), offsets.tobytes()] + blocks)
+
+
+def decode_gops(data, num_points, frames=None):
+    """解码 encode_gops 的输出，返回 (T, num_points, 4)，未编码的点和无效帧为 NaN
+
+    frames 为 slice 时只解码覆盖这些帧的帧组
+    """
+    info = read_archive_info(data)
+    total_frames, gop_size = info['frames'], info['gop_size']
+    indices, offsets, data_start = info['indices'], info['offsets'], info['data_start']
+    max_val = (1 << info['precision']) - 1
+
+    first, last, _ = (frames or slice(None)).indices(total_frames)
+    first_gop, last_gop = first // gop_size, max(first, last - 1) // gop_size + 1
+
+    output = np.full((total_frames, num_points, 4), np.nan, dtype=np.float32)
+    for gop in range(first_gop, min(last_gop, info['gops'])):
+        start = gop * gop_size
+        end = min(start + gop_size, total_frames)
+        block = data[data_start + offsets[gop]:data_start + offsets[gop + 1]]
+        valid, coords, visible = _decode_gop(block, end - start, len(indices), info['precision'])
+
+        frames_out = output[start:end]
+        rows = frames_out[valid]
+        rows[:, indices, :2] = coords / max_val
+        rows[:, indices, 2] = 0.0
+        rows[:, indices, 3] = visible
+        frames_out[valid] = rows
+
+    return output[first:last] if frames is not None else output
+
+
+def read_archive_info(data):
+    """解析缓冲头部和帧组索引"""
+    if len(data) < HEADER_SIZE:
+        raise ValueError("归档数据不完整")
+    magic, version, precision, num_points, total_frames, gop_size, gops = \
+        struct.unpack(HEADER_FORMAT, data[:HEADER_SIZE])
+    if magic != ARCHIVE_MAGIC:
+        raise ValueError("不是关键点归档数据")
+    if version != ARCHIVE_VERSION:
+        raise ValueError(f"不支持的归档版本: {version}")
+
+    index_start = HEADER_SIZE + num_points
+    data_start = index_start + (gops + 1) * 4
+    return {
+        'precision': precision,
+        'frames': total_frames,
+        'gop_size': gop_size,
+        'gops': gops,
+        'indices': np.frombuffer(data, dtype=np.uint8, count=num_points, offset=HEADER_SIZE).astype(np.int64),
+        'offsets': np.frombuffer(data, dtype='>u4', count=gops + 1, offset=index_start).astype(np.int64),
+        'data_start': data_start
+    }
+
+
+def _encode_gop(valid, coords, visible, precision):
+    writer = BitWriter()
+    writer.write_array(valid, 1)
+    coords = coords[valid]
+    if len(coords) == 0:
+        writer.write(0, WIDTH_BITS)
+        return writer.to_bytes()
+
+    # 沿时间轴的整数差分，位宽按本帧组最大残差确定
+    residuals = np.diff(coords, axis=0)
+    largest = int(np.abs(residuals).max()) if residuals.size else 0
+    width = largest.bit_length() + 1 if largest else 0
+
+    writer.write(width, WIDTH_BITS)
+    writer.write_array(coords[0], precision)
+    writer.write_array(visible[valid], 1)
+    if width:
+        writer.write_signed_array(residuals, width)
+    return writer.to_bytes()
+
+
+def _decode_gop(block, length, num_points, precision):
+    reader = BitReader(block)
+    valid = reader.read_array(length, 1).astype(bool)
+    width = reader.read(WIDTH_BITS)
+    count = int(valid.sum())
+    if count == 0:
+        return valid, np.zeros((0, num_points, 2)), np.zeros((0, num_points))
+
+    first = reader.read_array((num_points, 2), precision)
+    visible = reader.read_array((count, num_points), 1)
+    residuals = np.zeros((count - 1, num_points, 2), dtype=np.int64)
+    if width:
+        residuals = reader.read_signed_array((count - 1, num_points, 2), width)
+
+    coords = np.concatenate((first[None], residuals), axis=0).cumsum(axis=0)
+    return valid, coords, visible
@@ -0,0 +1,141 @@
+"""
+离线批处理模块
+把录制好的会议视频切成若干段，在进程池中并行提取关键点（每个工作进程一个 MediaPipe 实例），
+按顺序拼接各段结果并写入一个压缩的关键点文件
+"""
+
+import multiprocessing
+import time
+import cv2
+import numpy as np
+import mediapipe as mp
+from .compression_enhanced import EnhancedCompressor
+from .landmarks import LandmarkExtractor, SELECTED_KEYPOINTS, expand_selected
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 工作进程内的全局模型实例
+_worker_pose = None
+_worker_extractor = None
+
+
+def split_segments(total_frames, num_segments):
+    """把 [0, total_frames) 均分为不超过 num_segments 段，返回 [(start, end), ...]"""
+    num_segments = max(1, min(num_segments, total_frames))
+    bounds = np.linspace(0, total_frames, num_segments + 1).astype(int)
+    return [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def _init_worker(model_complexity):
+    """工作进程初始化：每个进程只创建一个 MediaPipe Pose 实例"""
+    global _worker_pose, _worker_extractor
+    _worker_pose = mp.solutions.pose.Pose(
+        static_image_mode=False,
+        model_complexity=model_complexity,
+        smooth_landmarks=True,
+        enable_segmentation=False,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+    _worker_extractor = LandmarkExtractor(max_hands=0, max_faces=0)
+
+
+def _process_segment(task):
+    """处理一段视频，返回 (start, keypoints[n, K, 4])，未检测到人体的帧填 NaN"""
+    video_path, start, end = task
+    keypoints = np.full((end - start, len(SELECTED_KEYPOINTS), 4), np.nan, dtype=np.float32)
+
+    # 各段互不相邻，先清掉上一段留下的跟踪状态
+    _worker_pose.reset()
+
+    capture = cv2.VideoCapture(video_path)
+    try:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for i in range(end - start):
+            success, frame = capture.read()
+            if not success:
+                logger.warning(f"读取第 {start + i} 帧失败，该段提前结束")
+                break
+
+            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            image.flags.writeable = False
+            results = _worker_pose.process(image)
+            landmarks = _worker_extractor.extract(start + i, pose_results=results)
+            if landmarks.has_pose:
+                keypoints[i] = landmarks.pose[SELECTED_KEYPOINTS]
+    finally:
+        capture.release()
+
+    return start, keypoints
+
+
+def probe_video(video_path):
+    """读取视频的总帧数和帧率"""
+    capture = cv2.VideoCapture(video_path)
+    try:
+        if not capture.isOpened():
+            raise IOError(f"无法打开视频文件: {video_path}")
+        total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    finally:
+        capture.release()
+    return total_frames, fps
+
+
+def process_video(video_path, workers=None, segments=None, model_complexity=1):
+    """并行提取整段视频的关键点
+
+    返回 (keypoints[T, K, 4], fps)，各段按原始顺序拼接
+    """
+    total_frames, fps = probe_video(video_path)
+    if total_frames <= 0:
+        raise ValueError(f"视频没有可处理的帧: {video_path}")
+
+    workers = workers or multiprocessing.cpu_count()
+    tasks = [(video_path, start, end)
+             for start, end in split_segments(total_frames, segments or workers * 4)]
+    logger.info(f"开始处理 {video_path}: {total_frames} 帧, {len(tasks)} 段, {workers} 个进程")
+
+    started = time.time()
+    # spawn 避免在已加载 MediaPipe 线程的父进程上 fork
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(workers, initializer=_init_worker, initargs=(model_complexity,)) as pool:
+        # imap 保证按提交顺序返回，直接拼接即可
+        parts = [part for _, part in pool.imap(_process_segment, tasks)]
+
+    keypoints = np.concatenate(parts, axis=0)
+    elapsed = time.time() - started
+    logger.info(f"处理完成: {len(keypoints)} 帧, 耗时 {elapsed:.1f}s, "
+                f"相当于实时速度的 {len(keypoints) / fps / max(elapsed, 1e-6):.1f} 倍")
+    return keypoints, fps
+
+
+def save_keypoints(path, keypoints, fps, packed_quality=None):
+    """写入压缩的关键点文件
+
+    packed_quality 为 EnhancedCompressor 的质量等级时，按帧组整体量化编码后保存（有损，不含 z），
+    否则保存原始 float32 数组
+    """
+    arrays = {
+        'fps': np.float32(fps),
+        'keypoint_indices': np.array(SELECTED_KEYPOINTS, dtype=np.int16)
+    }
+    if packed_quality:
+        compressor = EnhancedCompressor()
+        compressor.current_quality = packed_quality
+        packed = compressor.compress_batch(expand_selected(keypoints))
+        arrays['packed'] = np.frombuffer(packed, dtype=np.uint8)
+    else:
+        arrays['keypoints'] = keypoints
+    np.savez_compressed(path, **arrays)
+
+
+def load_keypoints(path):
+    """读取关键点文件，返回 (keypoints[T, K, 4], fps)"""
+    with np.load(path) as data:
+        fps = float(data['fps'])
+        if 'packed' in data:
+            keypoints = EnhancedCompressor().decompress_batch(data['packed'].tobytes())
+            return keypoints[:, data['keypoint_indices']], fps
+        return data['keypoints'], fps
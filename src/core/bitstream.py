@@ -0,0 +1,126 @@
+"""
+位流读写模块
+关键点数据包按位紧凑排列，不做字节对齐，最后一个字节不足 8 位时补 0。
+整组数值一次性用 NumPy 展开为位数组再打包，避免逐位的 Python 循环
+"""
+
+import numpy as np
+
+
+def _to_bits(values, widths):
+    """把整数数组按各自位宽展开为 0/1 位数组，高位在前
+
+    widths 为整数时所有数值同宽，省去逐个数值的位宽掩码
+    """
+    values = np.asarray(values, dtype=np.int64).ravel()
+    if values.size == 0:
+        return np.empty(0, dtype=np.uint8)
+    uniform = np.isscalar(widths)
+    width = int(widths) if uniform else int(widths.max())
+    if width <= 0:
+        return np.empty(0, dtype=np.uint8)
+    if values.min() < 0 or (values >> widths).any():
+        raise ValueError("数值超出位宽范围")
+
+    shifts = np.arange(width - 1, -1, -1)
+    bits = ((values[:, None] >> shifts) & 1).astype(np.uint8)
+    if uniform:
+        return bits.ravel()
+    # 只保留每个数值自己的低 widths 位
+    return bits[shifts[None, :] < widths[:, None]]
+
+
+def _column_widths(bits, shape):
+    """位宽可以是整数，也可以是按最后一维逐列给出的序列"""
+    return np.broadcast_to(np.asarray(bits, dtype=np.int64), shape).ravel()
+
+
+class BitWriter:
+    """按位写入无符号/有符号整数，高位在前"""
+
+    def __init__(self):
+        self.chunks = []
+        self.length = 0
+
+    def write(self, value, bits):
+        """写入 bits 位无符号整数"""
+        self.write_array([value], bits)
+
+    def write_signed(self, value, bits):
+        """写入 bits 位有符号整数（补码）"""
+        self.write_signed_array([value], bits)
+
+    def write_array(self, values, bits):
+        """写入整数数组，bits 为统一位宽或按最后一维逐列的位宽"""
+        values = np.asarray(values, dtype=np.int64)
+        if not np.isscalar(bits):
+            bits = _column_widths(bits, values.shape)
+        chunk = _to_bits(values, bits)
+        self.chunks.append(chunk)
+        self.length += len(chunk)
+
+    def write_signed_array(self, values, bits):
+        """写入有符号整数数组（补码）"""
+        values = np.asarray(values, dtype=np.int64)
+        widths = bits if np.isscalar(bits) else _column_widths(bits, values.shape).reshape(values.shape)
+        limit = np.left_shift(1, widths - 1)
+        if ((values < -limit) | (values >= limit)).any():
+            raise ValueError("数值超出有符号位宽范围")
+        self.write_array(values & (np.left_shift(1, widths) - 1), bits)
+
+    def extend(self, other):
+        """追加另一个 BitWriter 的全部位"""
+        self.chunks.extend(other.chunks)
+        self.length += other.length
+
+    def to_bytes(self):
+        if not self.chunks:
+            return b''
+        return np.packbits(np.concatenate(self.chunks)).tobytes()
+
+
+class BitReader:
+    """按位读取 BitWriter 写出的数据"""
+
+    def __init__(self, data):
+        self.bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+        self.length = len(self.bits)
+        self.position = 0
+
+    def read(self, bits):
+        """读取 bits 位无符号整数"""
+        return int(self.read_array(1, bits)[0])
+
+    def read_signed(self, bits):
+        """读取 bits 位有符号整数（补码）"""
+        return int(self.read_signed_array(1, bits)[0])
+
+    def read_array(self, shape, bits):
+        """读取指定形状的无符号整数数组，bits 含义同 BitWriter.write_array"""
+        shape = (shape,) if np.isscalar(shape) else tuple(shape)
+        widths = _column_widths(bits, shape)
+        total = int(widths.sum())
+        if self.position + total > self.length:
+            raise ValueError("数据包长度不足")
+        chunk = self.bits[self.position:self.position + total].astype(np.int64)
+        self.position += total
+        if widths.size == 0:
+            return np.zeros(shape, dtype=np.int64)
+
+        width = int(widths.max())
+        if width <= 0:
+            return np.zeros(shape, dtype=np.int64)
+        # 把每个字段的位右对齐到统一宽度的矩阵中，再按权重求和
+        offsets = np.arange(width)
+        padded = np.zeros((widths.size, width), dtype=np.int64)
+        mask = offsets[None, :] >= (width - widths)[:, None]
+        padded[mask] = chunk
+        values = padded @ (np.int64(1) << (width - 1 - offsets))
+        return values.reshape(shape)
+
+    def read_signed_array(self, shape, bits):
+        """读取有符号整数数组（补码）"""
+        values = self.read_array(shape, bits)
+        widths = _column_widths(bits, values.shape).reshape(values.shape)
+        sign = np.left_shift(1, widths - 1)
+        return np.where(values & sign, values - np.left_shift(sign, 1), values)
@@ -0,0 +1,113 @@
+"""
+帧广播模块
+单个生产者（采集 + 推理 + 绘制 + JPEG编码）每帧只运行一次，
+所有 /video_feed 客户端通过各自的有界队列共享同一份编码结果
+"""
+
+import queue
+import time
+from threading import Thread, Lock
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class Subscription:
+    """单个客户端的订阅，持有一个有界队列"""
+
+    def __init__(self, queue_size=2):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped_frames = 0
+
+    def push(self, data):
+        """放入新帧，队列满时丢弃最旧的一帧（慢客户端不拖慢其他客户端）"""
+        while True:
+            try:
+                self.queue.put_nowait(data)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped_frames += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=1.0):
+        """取下一帧，超时返回 None"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class FrameBroadcaster:
+    """单生产者广播中心
+
+    produce_frame 是一个无参函数，返回一帧已编码的数据（streaming.EncodedFrame），没有新帧时返回 None。
+    有订阅者时启动生产线程，最后一个订阅者离开后线程自动退出。
+    客户端的输出循环由 streaming.MJPEGStreamWriter 负责，它通过 subscribe/unsubscribe 订阅。
+    """
+
+    def __init__(self, produce_frame, queue_size=2):
+        self.produce_frame = produce_frame
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.lock = Lock()
+        self.producer_thread = None
+        self.frames_produced = 0
+
+    def subscribe(self):
+        """新增订阅者，必要时启动生产线程"""
+        subscription = Subscription(self.queue_size)
+        with self.lock:
+            self.subscribers.add(subscription)
+            if self.producer_thread is None or not self.producer_thread.is_alive():
+                self.producer_thread = Thread(target=self._producer_loop)
+                self.producer_thread.daemon = True
+                self.producer_thread.start()
+                logger.info("帧广播生产线程已启动")
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """移除订阅者"""
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def publish(self, data):
+        """将一帧分发给所有订阅者（所有客户端共享同一个对象，不复制）"""
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            subscription.push(data)
+
+    def get_stats(self):
+        """获取广播统计"""
+        with self.lock:
+            subscribers = list(self.subscribers)
+        return {
+            'subscribers': len(subscribers),
+            'frames_produced': self.frames_produced,
+            'dropped_frames': sum(s.dropped_frames for s in subscribers)
+        }
+
+    def _producer_loop(self):
+        """生产线程：没有订阅者时退出"""
+        while True:
+            with self.lock:
+                if not self.subscribers:
+                    self.producer_thread = None
+                    logger.info("没有订阅者，帧广播生产线程退出")
+                    return
+
+            try:
+                data = self.produce_frame()
+            except Exception as e:
+                logger.error(f"生成广播帧出错: {str(e)}")
+                time.sleep(0.01)
+                continue
+
+            if data is None:
+                continue
+
+            self.frames_produced += 1
+            self.publish(data)
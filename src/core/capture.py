@@ -1,6 +1,7 @@
 import cv2
 import mediapipe as mp
 import logging
+from .landmarks import LandmarkExtractor, SELECTED_KEYPOINTS
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -14,6 +15,7 @@ logger.addHandler(handler)
 # MediaPipe setup
 mp_pose = mp.solutions.pose
 pose = mp_pose.Pose(static_image_mode=False, model_complexity=1, smooth_landmarks=True, enable_segmentation=False, min_detection_confidence=0.5, min_tracking_confidence=0.5)
+landmark_extractor = LandmarkExtractor(max_hands=0, max_faces=0)
 
 def process_frame_with_mediapipe(frame):
     # 将 BGR 图像转换为 RGB
@@ -21,14 +23,9 @@ def process_frame_with_mediapipe(frame):
     # 处理图像并获取结果
     results = pose.process(image)
 
-    # 提取关键点
-    keypoints = []
-    if results.pose_landmarks:
-        # 选择上半身关键点，特别是面部和手部
-        selected_keypoints = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 15, 16, 17, 18, 19, 20, 21, 22]
-        for i in selected_keypoints:
-            landmark = results.pose_landmarks.landmark[i]
-            keypoints.append([landmark.x, landmark.y, landmark.z, landmark.visibility])
+    # 提取关键点：选择上半身关键点，特别是面部和手部，返回 (21, 4) float32 数组
+    landmarks = landmark_extractor.extract(-1, pose_results=results)
+    keypoints = landmarks.selected_pose(SELECTED_KEYPOINTS)
 
     # 将关键点信息添加到帧中（可选）
     # mp.solutions.drawing_utils.draw_landmarks(frame, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
@@ -1,137 +1,286 @@
+from collections import OrderedDict
 import numpy as np
-from collections import deque
+from .archive import encode_gops, decode_gops
+from .bitstream import BitWriter, BitReader
+from .entropy import ResidualCoder
+from .prediction import make_predictor
 
-class KeypointCompressor:
-    def __init__(self):
-        self.last_keypoints = None
+# 数据包字段：
+#   'seq'  发送序号，每帧加 1
+#   'ref'  差分帧的参考帧序号。等于 seq - 1 时按运动预测编码；指向更早的帧时为重同步帧，
+#          直接相对该参考帧编码，两端的预测器都从这一帧重新开始
+# 编码端只用重建值更新参考帧和预测器，解码端收到的帧与编码端的重建值一致
+
+# 两端保存的参考帧数量，决定丢包后能回退到多早的帧
+REFERENCE_FRAMES = 16
+
+# 请求重同步后这么多帧仍未收到重同步帧时再次请求(反馈本身也可能丢失)
+RESYNC_RETRY_FRAMES = 16
+
+REFERENCE_POINTS = {
+    'head': 0,      # 头部
+    'shoulder_l': 11,  # 左肩
+    'shoulder_r': 12,  # 右肩
+}
+
+
+def _reference_layout(reference_points):
+    """基准点名称、下标和熵编码上下文（头部和肩部各一个）"""
+    names = list(reference_points)
+    indices = np.array(list(reference_points.values()))
+    groups = np.array([0 if name == 'head' else 1 for name in names])
+    return names, indices, groups
+
+
+class ReferenceBuffer:
+    """按序号保存最近的重建帧"""
+
+    def __init__(self, size=REFERENCE_FRAMES):
+        self.size = size
+        self.frames = OrderedDict()
+
+    def __contains__(self, seq):
+        return seq in self.frames
+
+    def __getitem__(self, seq):
+        return self.frames[seq]
+
+    def add(self, seq, frame):
+        self.frames[seq] = frame
+        while len(self.frames) > self.size:
+            self.frames.popitem(last=False)
+
+    def discard_after(self, seq):
+        """丢弃序号大于 seq 的帧：它们依赖的参考在解码端已经丢失"""
+        for key in [key for key in self.frames if key > seq]:
+            del self.frames[key]
+
+    def clear(self):
+        self.frames.clear()
+
+
+class KeypointEncoder:
+    """基准点编码端，关键帧间隔内发送相对运动预测的差分帧
+
+    request_keyframe 由解码端的反馈触发：解码端最后一帧正确解码的序号仍在参考缓冲中时，
+    下一帧相对它编码(重同步帧)，否则发送关键帧
+    """
+
+    def __init__(self, entropy_coding=False, predictor='linear', reference_points=None):
         self.keyframe_interval = 30  # 每30帧发送一个关键帧
-        self.frame_count = 0
         self.movement_threshold = 0.01  # 移动检测阈值
-        self.reference_points = {
-            'head': 0,      # 头部
-            'shoulder_l': 11,  # 左肩
-            'shoulder_r': 12,  # 右肩
-        }
-        self.history = deque(maxlen=5)  # 保存最近5帧用于预测
-        
-    def compress(self, keypoints):
-        """超低带宽压缩算法"""
+        self.reference_points = reference_points or REFERENCE_POINTS
+        self.reference_names, self.reference_indices, self.reference_groups = \
+            _reference_layout(self.reference_points)
+
+        # 预测器，可选 prediction.PREDICTORS 中的名称或工厂函数，两端须一致
+        self.predictor = make_predictor(predictor)
+
+        # 熵编码模式：差分帧的全部基准点残差经算术编码后放入 'data'
+        self.entropy_coding = entropy_coding
+        self.residual_coder = ResidualCoder([0.003, 0.004])
+
+        self.seq = -1
+        self.frame_count = 0
+        self.references = ReferenceBuffer()
+        self.resync_ref = None
+        self.force_keyframe = False
+
+    def request_keyframe(self, last_good_seq=None):
+        """解码端检测到丢包后调用，last_good_seq 为它最后一帧正确解码的序号"""
+        if last_good_seq is not None and last_good_seq in self.references:
+            self.resync_ref = last_good_seq
+        else:
+            self.force_keyframe = True
+
+    def encode(self, keypoints):
+        """编码一帧 (N, 4) 关键点，返回数据包(dict)"""
         if keypoints is None or len(keypoints) == 0:
             return None
-            
+        keypoints = np.asarray(keypoints, dtype=np.float32)
+
+        self.seq += 1
         self.frame_count += 1
-        is_keyframe = self.frame_count % self.keyframe_interval == 0
-        
-        if is_keyframe:
-            # 关键帧：发送基准点完整坐标
-            compressed = self._compress_keyframe(keypoints)
+        previous = self.seq - 1
+        if (self.force_keyframe or previous not in self.references
+                or self.frame_count % self.keyframe_interval == 0):
+            packet, reconstructed = self._encode_keyframe(keypoints)
+            self.predictor.reset()
+        elif self.resync_ref is not None and self.resync_ref != previous:
+            # 重同步帧：相对解码端确认过的帧编码，不使用运动预测
+            reference = self.references[self.resync_ref]
+            packet, reconstructed = self._encode_delta(keypoints, self.resync_ref, reference, reference)
+            self.predictor.reset()
         else:
-            # 差分帧：仅发送变化量
-            compressed = self._compress_delta_frame(keypoints)
-            
-        self.last_keypoints = keypoints.copy()
-        self.history.append(keypoints)
-        
-        return compressed
-        
-    def _compress_keyframe(self, keypoints):
-        """压缩关键帧"""
-        compressed = {
+            reference = self.references[previous]
+            predicted = self.predictor.predict()
+            packet, reconstructed = self._encode_delta(keypoints, previous, reference, predicted)
+
+        self.force_keyframe = False
+        self.resync_ref = None
+        packet['seq'] = self.seq
+        self.references.add(self.seq, reconstructed)
+        self.predictor.update(reconstructed)
+        return packet
+
+    def _encode_keyframe(self, keypoints):
+        """关键帧：只保存基准点，将坐标压缩到8位整数(0-255)"""
+        names, indices = self._available_references(len(keypoints))
+        coords = (keypoints[indices, :2] * 255).astype(np.int64)
+
+        reconstructed = np.zeros((33, 2))  # MediaPipe默认33个关键点
+        reconstructed[indices] = coords / 255
+        return {
             'type': 'K',  # K表示关键帧
-            'points': {}
-        }
-        
-        # 只保存基准点
-        for name, idx in self.reference_points.items():
-            if idx < len(keypoints):
-                point = keypoints[idx]
-                # 将坐标压缩到8位整数(0-255)
-                x = int(point[0] * 255)
-                y = int(point[1] * 255)
-                compressed['points'][name] = [x, y]
-                
-        return compressed
-        
-    def _compress_delta_frame(self, keypoints):
-        """压缩差分帧"""
-        if self.last_keypoints is None:
-            return self._compress_keyframe(keypoints)
-            
-        compressed = {
+            'points': dict(zip(names, coords.tolist()))
+        }, reconstructed
+
+    def _encode_delta(self, keypoints, ref, reference, predicted):
+        """差分帧：只编码相对预测值的误差，返回 (数据包, 重建帧)"""
+        names, indices = self._available_references(len(keypoints))
+        deltas = keypoints[indices, :2] - predicted[indices]
+
+        # 如果移动超过阈值才记录，将差值压缩到4位(-8到7)
+        moved = (np.abs(deltas) > self.movement_threshold).any(axis=1)
+        quantized = np.where(moved[:, None], np.clip((deltas * 16).astype(np.int64), -8, 7), 0)
+        reconstructed = _apply_deltas(reference, predicted, indices, quantized)
+
+        if self.entropy_coding and len(indices) == len(self.reference_indices):
+            writer = BitWriter()
+            self.residual_coder.encode(writer, quantized, self.reference_groups, 8, 16)
+            return {'type': 'D', 'ref': ref, 'data': writer.to_bytes()}, reconstructed
+
+        return {
             'type': 'D',  # D表示差分帧
-            'deltas': {}
-        }
-        
-        # 计算预测值
-        predicted = self._predict_next_frame()
-        
-        # 只编码预测误差
-        for name, idx in self.reference_points.items():
-            if idx < len(keypoints) and idx < len(self.last_keypoints):
-                current = keypoints[idx]
-                predicted_point = predicted[idx] if predicted is not None else self.last_keypoints[idx]
-                
-                # 计算与预测值的差异
-                dx = current[0] - predicted_point[0]
-                dy = current[1] - predicted_point[1]
-                
-                # 如果移动超过阈值才记录
-                if abs(dx) > self.movement_threshold or abs(dy) > self.movement_threshold:
-                    # 将差值压缩到4位(-8到7)
-                    dx_compressed = max(-8, min(7, int(dx * 16)))
-                    dy_compressed = max(-8, min(7, int(dy * 16)))
-                    compressed['deltas'][name] = [dx_compressed, dy_compressed]
-                
-        return compressed
-        
-    def _predict_next_frame(self):
-        """基于历史数据预测下一帧"""
-        if len(self.history) < 2:
+            'ref': ref,
+            'deltas': {names[i]: quantized[i].tolist() for i in np.flatnonzero(moved)}
+        }, reconstructed
+
+    def _available_references(self, count):
+        """数组中存在的基准点名称和下标"""
+        available = self.reference_indices < count
+        return [name for name, ok in zip(self.reference_names, available) if ok], self.reference_indices[available]
+
+
+class KeypointDecoder:
+    """基准点解码端，与编码端分开保存状态
+
+    序号不连续或参考帧不在缓冲中时不解码该帧，记录最后一帧正确解码的序号，
+    由 keyframe_request 取出后反馈给编码端的 request_keyframe。
+    一次丢包后在途的后续帧都会解码失败，收到重同步帧(关键帧或相对更早参考的差分帧)之前不重复请求
+    """
+
+    def __init__(self, predictor='linear', reference_points=None):
+        self.reference_points = reference_points or REFERENCE_POINTS
+        self.reference_names, self.reference_indices, self.reference_groups = \
+            _reference_layout(self.reference_points)
+        self.predictor = make_predictor(predictor)
+        self.residual_coder = ResidualCoder([0.003, 0.004])
+
+        self.last_seq = None
+        self.references = ReferenceBuffer()
+        self.pending_request = False
+        self.request_seq = None  # 发出请求时的序号，收到重同步帧后清除
+        self.lost_frames = 0
+
+    def keyframe_request(self):
+        """有待反馈的重同步请求时返回最后一帧正确解码的序号(没有时为 -1)，否则返回 None"""
+        if not self.pending_request:
             return None
-            
-        # 使用线性预测
-        last_two = list(self.history)[-2:]
-        velocity = []
-        
-        for i in range(len(last_two[0])):
-            dx = last_two[1][i][0] - last_two[0][i][0]
-            dy = last_two[1][i][1] - last_two[0][i][1]
-            velocity.append([dx, dy])
-            
-        predicted = []
-        for i, point in enumerate(self.history[-1]):
-            px = point[0] + velocity[i][0]
-            py = point[1] + velocity[i][1]
-            predicted.append([px, py])
-            
-        return predicted
-        
-    def decompress(self, compressed_data):
-        """解压数据"""
-        if compressed_data is None:
+        self.pending_request = False
+        return -1 if self.last_seq is None else self.last_seq
+
+    def decode(self, packet):
+        """解码数据包，返回 (33, 2) 基准点坐标，无法解码时返回 None 并请求重同步"""
+        if packet is None:
             return None
-            
-        if compressed_data['type'] == 'K':
-            # 解压关键帧
-            keypoints = np.zeros((33, 2))  # MediaPipe默认33个关键点
-            for name, point in compressed_data['points'].items():
-                idx = self.reference_points[name]
-                keypoints[idx] = [point[0] / 255, point[1] / 255]
-                
+        seq = packet.get('seq')
+        if self.last_seq is not None and seq is not None and seq <= self.last_seq:
+            return None  # 重复或过期的数据包
+
+        if packet['type'] == 'K':
+            keypoints = np.zeros((33, 2))
+            names = list(packet['points'])
+            if names:
+                indices = [self.reference_points[name] for name in names]
+                keypoints[indices] = np.array(list(packet['points'].values())) / 255
+            self.predictor.reset()
+            self.request_seq = None
         else:
-            # 解压差分帧
-            if self.last_keypoints is None:
+            ref = packet.get('ref')
+            if ref not in self.references:
+                self._lost(seq)
                 return None
-                
-            keypoints = self.last_keypoints.copy()
-            predicted = self._predict_next_frame()
-            
-            for name, delta in compressed_data['deltas'].items():
-                idx = self.reference_points[name]
-                base_point = predicted[idx] if predicted is not None else self.last_keypoints[idx]
-                keypoints[idx] = [
-                    base_point[0] + delta[0] / 16,
-                    base_point[1] + delta[1] / 16
-                ]
-                
-        return keypoints 
\ No newline at end of file
+            reference = self.references[ref]
+            if ref == seq - 1 and ref == self.last_seq:
+                predicted = self.predictor.predict()
+            else:
+                # 重同步帧：缓冲中比参考帧新的帧都已失效
+                self.references.discard_after(ref)
+                self.predictor.reset()
+                predicted = reference
+                self.request_seq = None
+            keypoints = self._decode_delta(packet, reference, predicted)
+
+        self.last_seq = seq
+        self.references.add(seq, keypoints)
+        self.predictor.update(keypoints)
+        return keypoints.copy()
+
+    def _decode_delta(self, packet, reference, predicted):
+        if 'data' in packet:
+            deltas = self.residual_coder.decode(BitReader(packet['data']), self.reference_groups, 8, 16)
+            return _apply_deltas(reference, predicted, self.reference_indices, deltas)
+
+        names = list(packet['deltas'])
+        indices = np.array([self.reference_points[name] for name in names], dtype=np.int64)
+        deltas = np.array(list(packet['deltas'].values()), dtype=np.int64).reshape(-1, 2)
+        return _apply_deltas(reference, predicted, indices, deltas)
+
+    def _lost(self, seq):
+        self.lost_frames += 1
+        if (self.request_seq is None or seq is None
+                or seq - self.request_seq >= RESYNC_RETRY_FRAMES):
+            self.request_seq = seq
+            self.pending_request = True
+
+
+def _apply_deltas(reference, predicted, indices, deltas):
+    """残差为 0 的点保持参考帧位置，其余点为预测值加残差"""
+    reconstructed = reference.copy()
+    moved = deltas.any(axis=1)
+    indices = indices[moved]
+    reconstructed[indices] = predicted[indices] + deltas[moved] / 16
+    return reconstructed
+
+
+class KeypointCompressor:
+    """本地编解码的组合：compress 走编码端，decompress 走独立的解码端"""
+
+    def __init__(self, entropy_coding=False, predictor='linear'):
+        self.encoder = KeypointEncoder(entropy_coding, predictor)
+        self.decoder = KeypointDecoder(predictor)
+        self.reference_points = self.encoder.reference_points
+        self.reference_indices = self.encoder.reference_indices
+
+    def compress(self, keypoints):
+        """超低带宽压缩算法"""
+        return self.encoder.encode(keypoints)
+
+    def decompress(self, compressed_data):
+        """解压数据"""
+        packet = self.decoder.decode(compressed_data)
+        request = self.decoder.keyframe_request()
+        if request is not None:
+            self.encoder.request_keyframe(request)
+        return packet
+
+    def compress_batch(self, keypoints, gop_size=30):
+        """整段编码 (T, N, 4) 关键点序列的基准点，8 位精度，返回带帧组偏移索引的连续缓冲"""
+        keypoints = np.asarray(keypoints, dtype=np.float32)
+        indices = self.reference_indices[self.reference_indices < keypoints.shape[1]]
+        return encode_gops(keypoints, indices, 8, gop_size)
+        
+    def decompress_batch(self, data, frames=None):
+        """解码 compress_batch 的输出，返回 (T, 33, 4)，非基准点为 NaN"""
+        return decode_gops(data, 33, frames)
@@ -1,9 +1,50 @@
 import numpy as np
-from collections import deque
-import zlib
+from .archive import encode_gops, decode_gops
+from .bitstream import BitWriter, BitReader
+from .entropy import ResidualCoder
+from .kinematics import KinematicTree
+from .landmarks import POSE_LANDMARKS
+from .prediction import MotionHistory, make_predictor
 
-class EnhancedCompressor:
-    def __init__(self):
+# 数据包格式：
+#   头部 16 位：版本(3) | 字典压缩标志(1) | 类型(2) | 质量等级序号(3) | 帧号低 7 位(7)
+#   关键帧：按优先级分组顺序，每点 x(p) y(p) 可见(1)，p 为质量等级的 precision；
+#     骨骼树模式下点坐标前先写 1 位布局标志，置位时子节点改写相对父节点的偏移，
+#     位宽由骨骼长度范围决定(见 kinematics.py)；有偏移超出范围时清零标志，仍按绝对坐标写
+#   差分帧：先写全部点的变化标志(各 1 位)，再依次写变化点的 dx(p-2) dy(p-2) 有符号残差
+#   熵编码差分帧：残差范围与差分帧相同，按分组上下文做自适应算术编码，只在比定长差分帧小时使用
+#   姿态基帧(PCA_FRAME)：只传输 PCA 主成分系数，由 pca_codec.PCACodec 编解码
+#   设置预置字典时，头部之后的位流整体以字典做 raw deflate，只在更小时使用并置字典压缩标志；
+#     压缩形式为 头部 | 字典标识(8) | deflate 数据，字典标识与解码端字典不一致时拒绝解码
+# 坐标量化到 [0, 2^p - 1] 的整数网格，差分残差在同一网格上相对运动预测值计算，
+# 编码端用重建值而不是原始值做预测，保证两端预测一致、误差不累积；两端的预测器都在每个关键帧重新开始
+# 解码端按帧号检查连续性：差分帧必须紧接上一帧，否则参考已失效，丢弃到下一个关键帧为止，
+# 并通过 keyframe_request 反馈给编码端的 request_keyframe；重复或迟到的数据包直接丢弃
+FORMAT_VERSION = 6
+VERSION_BITS = 3
+TYPE_BITS = 2
+QUALITY_BITS = 3
+FRAME_BITS = 7
+HEADER_BITS = (VERSION_BITS, 1, TYPE_BITS, QUALITY_BITS, FRAME_BITS)
+HEADER_BYTES = sum(HEADER_BITS) // 8
+FRAME_MODULO = 1 << FRAME_BITS
+
+# 请求关键帧后这么多帧仍未收到时再次请求(反馈本身也可能丢失)
+RESYNC_RETRY_FRAMES = 16
+
+KEYFRAME = 0
+DELTA_FRAME = 1
+ENTROPY_DELTA_FRAME = 2
+PCA_FRAME = 3
+
+
+class _EnhancedFormat:
+    """编码端和解码端共用的数据包格式：关键点分组、质量等级、熵编码模型、预置字典和骨骼树
+
+    两端必须用相同的 dictionary、predictor 和 kinematic 参数构造
+    """
+
+    def __init__(self, dictionary=None, predictor='kalman', kinematic=True):
         # 更细粒度的关键点优先级
         self.keypoints_priority = {
             'face_core': [0,1,2,3,4],      # 核心面部特征
@@ -13,14 +54,10 @@ class EnhancedCompressor:
             'hands': [15,16,17,18,19,20,21,22],
             'lower_body': [25,26,27,28,29,30,31,32]
         }
-        
-        # 运动预测和状态追踪
-        self.motion_history = {k: deque(maxlen=10) for k in self.keypoints_priority.keys()}
-        self.last_keyframe = None
-        self.frame_count = 0
-        
-        # 自适应参数
-        self.bandwidth_budget = 0.2  # 初始带宽预算(Kbps)
+
+        # predictor 为 prediction.PREDICTORS 中的名称或工厂函数，编码端和解码端须一致
+        self.predictor_spec = predictor
+
         self.quality_levels = {
             'minimal': {'precision': 4, 'keyframe_interval': 60, 'points': ['face_core']},
             'ultra_low': {'precision': 5, 'keyframe_interval': 45, 'points': ['face_core', 'upper_core']},
@@ -28,131 +65,231 @@ class EnhancedCompressor:
             'medium': {'precision': 8, 'keyframe_interval': 20, 'points': ['face_core', 'face_detail', 'upper_core', 'upper_detail']},
             'high': {'precision': 10, 'keyframe_interval': 15, 'points': ['face_core', 'face_detail', 'upper_core', 'upper_detail', 'hands']}
         }
+        self.quality_names = list(self.quality_levels)  # 头部中的质量等级序号
+
+        # 分组下标只计算一次：每个质量等级传输的点按优先级顺序排好
+        self.group_ids = np.empty(POSE_LANDMARKS, dtype=np.int64)
+        for group_id, indices in enumerate(self.keypoints_priority.values()):
+            self.group_ids[indices] = group_id
+        self.group_sizes = np.bincount(self.group_ids, minlength=len(self.keypoints_priority))
+        self.quality_indices = {
+            name: np.concatenate([indices for group, indices in self.keypoints_priority.items()
+                                  if group in quality['points']])
+            for name, quality in self.quality_levels.items()
+        }
+
+        # 各分组残差的拉普拉斯尺度（归一化坐标），作为熵编码上下文模型的初始分布
+        self.residual_scales = {
+            'face_core': 0.002,
+            'face_detail': 0.002,
+            'upper_core': 0.003,
+            'upper_detail': 0.006,
+            'hands': 0.01,
+            'lower_body': 0.006
+        }
+        self.residual_coder = ResidualCoder([self.residual_scales[name] for name in self.keypoints_priority])
+
+        # 预置压缩字典(PacketDictionary)，两端必须加载同一版本
+        self.dictionary = dictionary
+
+        # 骨骼树相对编码，关闭时所有点都作为根节点，即逐点绝对编码；两端须一致
+        self.kinematic = kinematic
+        self.kinematic_tree = KinematicTree() if kinematic else None
+        self.flat_tree = KinematicTree(parents=np.full(POSE_LANDMARKS, -1))
+
+    @staticmethod
+    def _keyframe_widths(layout):
+        return np.column_stack([layout.field_widths(), np.ones(len(layout.widths), dtype=np.int64)])
+
+    @staticmethod
+    def _reconstruct_keyframe(indices, coords, visible, max_val):
+        reconstructed = np.full((POSE_LANDMARKS, 4), np.nan, dtype=np.float32)
+        reconstructed[indices, :2] = coords / max_val
+        reconstructed[indices, 2] = 0.0
+        reconstructed[indices, 3] = visible
+        return reconstructed
+
+    @staticmethod
+    def _reconstruct_delta(reference, indices, coords, max_val):
+        reconstructed = reference.copy()
+        reconstructed[indices, :2] = np.clip(coords, 0, max_val) / max_val
+        return reconstructed
+
+    @staticmethod
+    def _quantized_prediction(predictor, indices, max_val):
+        """预测坐标换算到量化网格"""
+        predicted = predictor.predict()
+        return np.round(predicted[indices] * max_val).astype(np.int64)
+
+
+class EnhancedEncoder(_EnhancedFormat):
+    """关键点编码端，只保存编码端状态
+
+    预测器和运动历史只用重建值更新，并在每个关键帧重新开始；
+    request_keyframe 由解码端的反馈触发，下一帧发送关键帧
+    """
+
+    def __init__(self, entropy_coding=False, dictionary=None, predictor='kalman', kinematic=True,
+                 rate_controller=None):
+        super().__init__(dictionary, predictor, kinematic)
+
+        # 运动预测和状态追踪（保存重建后的坐标）
+        self.motion_history = MotionHistory()
+        self.predictor = make_predictor(predictor)
+        self.last_keyframe = None
+        self.last_reconstructed = None
+        self.last_quality = None
+        self.frame_count = 0
+        self.keyframe_count = 0  # 最近一个关键帧的帧号
+        self.force_keyframe = False  # 解码端请求的关键帧
+
+        # 自适应参数
+        self.bandwidth_budget = 0.2  # 初始带宽预算(Kbps)
         self.current_quality = 'low'
 
-    def compress(self, keypoints, bandwidth=None):
-        """增强的压缩算法"""
+        # 算术编码逐符号在 Python 中循环，每帧编解码耗时约为定长差分帧的两倍，只省 1~3 字节，
+        # 实时流默认关闭；离线统计(measure_bitrate、bitrate 命令)显式开启。解码端总能处理熵编码帧
+        self.entropy_coding = entropy_coding
+
+        # 率失真控制器(rate_control.RateController)，设置后逐帧试编码选择质量等级和帧类型，
+        # 代替固定带宽阈值和关键帧取模
+        self.rate_controller = rate_controller
+
+    def request_keyframe(self):
+        """解码端检测到丢包后调用，下一帧发送关键帧"""
+        self.force_keyframe = True
+
+    def encode(self, keypoints, bandwidth=None):
+        """增强的压缩算法，返回二进制数据包"""
         if keypoints is None:
             return None
+        
+        # 直接使用提取层输出的 (N, 4) float32 数组，缺少的点按不可见处理
+        keypoints = np.asarray(keypoints, dtype=np.float32)
+        if len(keypoints) < POSE_LANDMARKS:
+            padded = np.zeros((POSE_LANDMARKS, 4), dtype=np.float32)
+            padded[:len(keypoints), :keypoints.shape[1]] = keypoints[:, :4]
+            keypoints = padded
             
         # 更新带宽预算
         if bandwidth:
             self.bandwidth_budget = bandwidth
-            self._adjust_quality_level()
+            if self.rate_controller is None:
+                self._adjust_quality_level()
+            else:
+                self.rate_controller.set_rate(bandwidth)
 
         self.frame_count += 1
-        is_keyframe = self._should_send_keyframe()
         
         try:
-            if is_keyframe:
-                data = self._compress_keyframe(keypoints)
+            if self.rate_controller is not None:
+                self.current_quality, frame_type, payload, reconstructed = \
+                    self.rate_controller.select(self, keypoints)
             else:
-                data = self._compress_delta_frame(keypoints)
-            
+                frame_type, payload, reconstructed = self._encode_frame(
+                    keypoints, self.current_quality, self._needs_keyframe(self.current_quality))
+
+            # 预测从每个关键帧重新开始：解码端可能是丢包后靠这个关键帧重同步的，
+            # 之前的运动历史两端不一定一致；质量等级变化时也总是关键帧
+            if frame_type == KEYFRAME:
+                self.motion_history.clear()
+                self.predictor.reset()
+                self.last_keyframe = reconstructed
+                self.keyframe_count = self.frame_count
+                self.force_keyframe = False
+
             # 运动状态更新
-            self._update_motion_history(keypoints)
-            
-            # 压缩数据
-            compressed = {
-                'type': 'K' if is_keyframe else 'D',
-                'frame': self.frame_count,
-                'data': data,
-                'quality': self.current_quality
-            }
+            self.motion_history.append(reconstructed[:, :2])
+            self.predictor.update(reconstructed[:, :2])
+            self.last_reconstructed = reconstructed
+            self.last_quality = self.current_quality
             
-            # 最终压缩
-            return self._pack_data(compressed)
+            return self._pack_data(frame_type, payload)
             
         except Exception as e:
             print(f"压缩错误: {e}")
             return None
 
-    def _compress_keyframe(self, keypoints):
-        """关键帧压缩增强版"""
-        quality = self.quality_levels[self.current_quality]
-        precision = quality['precision']
+    def _encode_frame(self, keypoints, quality, keyframe):
+        """按指定质量等级编码一帧，返回 (帧类型, 位流, 重建后的关键点)
+
+        不修改编码端状态，率失真控制器用它对候选等级试编码
+        """
+        payload = BitWriter()
+        if keyframe:
+            return KEYFRAME, payload, self._compress_keyframe(keypoints, payload, quality)
+        frame_type, reconstructed = self._compress_delta_frame(keypoints, payload, quality)
+        return frame_type, payload, reconstructed
+
+    def _needs_keyframe(self, quality):
+        """按质量等级编码时是否只能发送关键帧"""
+        return (self.last_reconstructed is None or quality != self.last_quality or self.force_keyframe
+                or self._should_send_keyframe(quality))
+
+    def _write_header(self, writer, frame_type, deflated=False, quality=None):
+        writer.write_array([
+            FORMAT_VERSION,
+            1 if deflated else 0,
+            frame_type,
+            self.quality_names.index(quality or self.current_quality),
+            self.frame_count & ((1 << FRAME_BITS) - 1)
+        ], HEADER_BITS)
+
+    def _compress_keyframe(self, keypoints, writer, quality):
+        """关键帧压缩增强版，返回重建后的关键点"""
+        precision = self.quality_levels[quality]['precision']
         max_val = (1 << precision) - 1
+        indices = self.quality_indices[quality]
         
-        compressed = {}
-        
-        # 分层压缩
-        for priority, indices in self.keypoints_priority.items():
-            points_data = []
-            for idx in indices:
-                if idx < len(keypoints):
-                    point = keypoints[idx]
-                    # 使用动态精度量化
-                    x = int(point[0] * max_val)
-                    y = int(point[1] * max_val)
-                    conf = int(point[2] * 100) if len(point) > 2 else 100
-                    points_data.append([x, y, conf])
-            
-            compressed[priority] = points_data
+        # 使用动态精度量化
+        coords = np.clip(np.round(keypoints[indices, :2] * max_val), 0, max_val).astype(np.int64)
+        visible = (keypoints[indices, 3] >= 0.5).astype(np.int64)
+        layout = self.flat_tree.layout(indices, precision)
+        fields = coords
+        if self.kinematic:
+            relative = self.kinematic_tree.layout(indices, precision)
+            relative_fields = relative.encode_keyframe(coords)
+            writer.write(relative_fields is not None, 1)
+            if relative_fields is not None:
+                layout, fields = relative, relative_fields
+        writer.write_array(np.column_stack([layout.to_unsigned(fields), visible]), self._keyframe_widths(layout))
             
-        return compressed
+        return self._reconstruct_keyframe(indices, coords, visible, max_val)
 
-    def _compress_delta_frame(self, keypoints):
-        """差分帧压缩增强版"""
-        if self.last_keyframe is None:
-            return self._compress_keyframe(keypoints)
-            
-        quality = self.quality_levels[self.current_quality]
-        precision = quality['precision'] - 2  # 差分帧使用更少位数
-        max_delta = (1 << (precision - 1)) - 1  # 有符号数范围
+    def _compress_delta_frame(self, keypoints, writer, quality):
+        """差分帧压缩增强版，返回 (帧类型, 重建后的关键点)"""
+        indices = self.quality_indices[quality]
+        quality = self.quality_levels[quality]
+        max_val = (1 << quality['precision']) - 1
+        delta_bits = quality['precision'] - 2  # 差分帧使用更少位数
+        max_delta = (1 << (delta_bits - 1)) - 1  # 有符号数范围
         
-        compressed = {}
-        predicted = self._predict_motion()
+        predicted = self._quantized_prediction(self.predictor, indices, max_val)
+        current = np.round(keypoints[indices, :2] * max_val).astype(np.int64)
         
-        for priority, indices in self.keypoints_priority.items():
-            deltas = []
-            for idx in indices:
-                if idx < len(keypoints) and idx < len(self.last_keyframe):
-                    current = keypoints[idx]
-                    predicted_point = predicted[idx] if predicted else self.last_keyframe[idx]
-                    
-                    # 计算与预测位置的差异
-                    dx = current[0] - predicted_point[0]
-                    dy = current[1] - predicted_point[1]
-                    
-                    # 量化差异值
-                    dx_compressed = max(-max_delta, min(max_delta, int(dx * (1 << precision))))
-                    dy_compressed = max(-max_delta, min(max_delta, int(dy * (1 << precision))))
-                    
-                    # 只在有显著变化时记录
-                    if abs(dx_compressed) > 0 or abs(dy_compressed) > 0:
-                        deltas.append([idx, dx_compressed, dy_compressed])
-            
-            if deltas:
-                compressed[priority] = deltas
-                
-        return compressed
-
-    def _predict_motion(self):
-        """增强的运动预测"""
-        predicted = np.zeros_like(self.last_keyframe)
+        # 量化与预测位置的差异，超出范围的部分留给后续帧补偿
+        deltas = np.clip(current - predicted, -max_delta, max_delta)
+        changed = deltas.any(axis=1)
         
-        for priority, history in self.motion_history.items():
-            if len(history) >= 2:
-                indices = self.keypoints_priority[priority]
-                recent = np.array(list(history)[-3:])  # 使用最近3帧
-                
-                for idx in indices:
-                    if idx < len(predicted):
-                        # 计算速度和加速度
-                        velocities = np.diff(recent[:, idx], axis=0)
-                        if len(velocities) >= 2:
-                            acceleration = velocities[-1] - velocities[-2]
-                            # 二次运动预测
-                            predicted[idx] = recent[-1][idx] + velocities[-1] + 0.5 * acceleration
-                        else:
-                            # 线性预测
-                            predicted[idx] = recent[-1][idx] + velocities[-1]
-                            
-        return predicted
-
-    def _should_send_keyframe(self):
+        # 定长编码：只在有变化时记录
+        fixed = BitWriter()
+        fixed.write_array(changed, 1)
+        fixed.write_signed_array(deltas[changed], delta_bits)
+        frame_type = DELTA_FRAME
+
+        if self.entropy_coding:
+            coded = BitWriter()
+            self.residual_coder.encode(coded, deltas, self.group_ids[indices], max_delta, max_val)
+            if coded.length < fixed.length:
+                fixed, frame_type = coded, ENTROPY_DELTA_FRAME
+
+        writer.extend(fixed)
+        return frame_type, self._reconstruct_delta(self.last_reconstructed, indices, predicted + deltas, max_val)
+
+
+    def _should_send_keyframe(self, quality):
         """决定是否发送关键帧"""
-        quality = self.quality_levels[self.current_quality]
+        quality = self.quality_levels[quality]
         base_interval = quality['keyframe_interval']
         
         # 检测运动剧烈程度
@@ -164,18 +301,18 @@ class EnhancedCompressor:
         return self.frame_count % adjusted_interval == 0
 
     def _calculate_motion_intensity(self):
-        """计算运动强度"""
-        total_motion = 0
-        count = 0
+        """计算运动强度：各个已传输分组平均位移的均值"""
+        if len(self.motion_history) < 2:
+            return 0
         
-        for history in self.motion_history.values():
-            if len(history) >= 2:
-                recent = list(history)[-2:]
-                motion = np.mean(np.abs(recent[1] - recent[0]))
-                total_motion += motion
-                count += 1
-                
-        return total_motion / count if count > 0 else 0
+        recent = self.motion_history.recent(2)
+        motion = np.abs(recent[1] - recent[0]).mean(axis=1)
+        missing = np.isnan(motion)
+        group_motion = np.bincount(self.group_ids, weights=np.where(missing, 0, motion),
+                                   minlength=len(self.group_sizes)) / self.group_sizes
+        # 只统计完整传输的分组
+        complete = np.bincount(self.group_ids, weights=missing, minlength=len(self.group_sizes)) == 0
+        return float(group_motion[complete].mean()) if complete.any() else 0
 
     def _adjust_quality_level(self):
         """根据带宽预算调整质量等级"""
@@ -188,34 +325,255 @@ class EnhancedCompressor:
         else:
             self.current_quality = 'high'
 
-    def _pack_data(self, data):
-        """最终数据打包和压缩"""
-        try:
-            # 转换为字节串
-            packed = str(data).encode('utf-8')
-            # zlib压缩
-            compressed = zlib.compress(packed)
-            return compressed
-        except Exception as e:
-            print(f"数据打包错误: {e}")
-            return None
+    def _pack_data(self, frame_type, payload, quality=None):
+        """最终数据打包：头部加位流，有预置字典且字典压缩后更小时改用压缩形式"""
+        writer = BitWriter()
+        self._write_header(writer, frame_type, quality=quality)
+        writer.extend(payload)
+        packet = writer.to_bytes()
 
-    def decompress(self, compressed_data):
-        """解压数据"""
+        if self.dictionary is not None:
+            deflated = bytes([self.dictionary.tag]) + self.dictionary.compress(payload.to_bytes())
+            if HEADER_BYTES + len(deflated) < len(packet):
+                header = BitWriter()
+                self._write_header(header, frame_type, deflated=True, quality=quality)
+                packet = header.to_bytes() + deflated
+        return packet
+
+
+class EnhancedDecoder(_EnhancedFormat):
+    """关键点解码端，与编码端分开保存状态
+
+    按帧号检查连续性，差分帧的参考失效时不解码，由 keyframe_request 取出请求后
+    反馈给编码端的 request_keyframe；预测器在每个关键帧重新开始，与编码端保持一致
+    """
+
+    def __init__(self, dictionary=None, predictor='kalman', kinematic=True):
+        super().__init__(dictionary, predictor, kinematic)
+        self.predictor = make_predictor(predictor)
+        self.reference = None
+        self.reference_quality = None
+        self.last_frame = None         # 最后一帧正确解码的帧号
+        self.request_frame = None      # 请求关键帧时的帧号，收到关键帧前不重复请求
+        self.pending_request = False
+        self.lost_frames = 0
+
+    def keyframe_request(self):
+        """有待反馈的关键帧请求时返回 True，取出后清除"""
+        pending, self.pending_request = self.pending_request, False
+        return pending
+
+    def decode(self, compressed_data):
+        """解压数据，返回 (33, 4) 关键点，未传输的点为 NaN"""
         try:
-            # zlib解压
-            decompressed = zlib.decompress(compressed_data)
-            # 解析数据结构
-            data = eval(decompressed.decode('utf-8'))
+            version, deflated, frame_type, quality_index, frame = read_header(compressed_data)
+            if version != FORMAT_VERSION:
+                raise ValueError(f"不支持的数据包版本: {version}")
+            quality = self.quality_names[quality_index]
+            if not self._in_sequence(frame, frame_type == KEYFRAME):
+                return None
+
+            if deflated:
+                if self.dictionary is None:
+                    raise ValueError("数据包使用了预置字典，但未加载字典")
+                if compressed_data[HEADER_BYTES] != self.dictionary.tag:
+                    raise ValueError("数据包的预置字典与本端加载的字典版本不一致")
+                reader = BitReader(self.dictionary.decompress(compressed_data[HEADER_BYTES + 1:]))
+            else:
+                reader = BitReader(compressed_data)
+                reader.position = sum(HEADER_BITS)
             
-            if data['type'] == 'K':
-                return self._decompress_keyframe(data)
+            if frame_type == KEYFRAME:
+                keypoints = self._decompress_keyframe(reader, quality)
+                self.request_frame = None
+            elif frame_type in (DELTA_FRAME, ENTROPY_DELTA_FRAME):
+                keypoints = self._decompress_delta_frame(reader, quality, frame_type == ENTROPY_DELTA_FRAME)
+            elif frame_type == PCA_FRAME:
+                raise ValueError("姿态基帧需要用 PCACodec 解码")
             else:
-                return self._decompress_delta_frame(data)
+                raise ValueError(f"未知的帧类型: {frame_type}")
+            self.last_frame = frame
+            return keypoints
                 
         except Exception as e:
             print(f"解压错误: {e}")
-            return None 
+            return None
+
+    def _in_sequence(self, frame, keyframe):
+        """帧号检查：关键帧总可解码(重复或迟到的除外)，差分帧必须紧接上一帧正确解码的帧"""
+        if self.last_frame is not None:
+            step = (frame - self.last_frame) % FRAME_MODULO
+            late = step == 0 or step > FRAME_MODULO // 2
+            if keyframe:
+                return self.request_frame is not None or not late
+            if late:
+                return False  # 重复或迟到的数据包，参考帧已经过去
+            if step == 1:
+                return True  # 紧接上一帧，等待关键帧期间迟到的下一帧也可以解码
+        elif keyframe:
+            return True
+        self._lost(frame)
+        return False
+
+    def _lost(self, frame):
+        """差分帧的参考已失效：请求关键帧，等待期间每 RESYNC_RETRY_FRAMES 帧才重复一次"""
+        self.lost_frames += 1
+        if self.request_frame is None or (frame - self.request_frame) % FRAME_MODULO >= RESYNC_RETRY_FRAMES:
+            self.request_frame = frame
+            self.pending_request = True
+
+    def _decompress_keyframe(self, reader, quality):
+        """解压关键帧"""
+        precision = self.quality_levels[quality]['precision']
+        indices = self.quality_indices[quality]
+
+        tree = self.kinematic_tree if self.kinematic and reader.read(1) else self.flat_tree
+        layout = tree.layout(indices, precision)
+        fields = reader.read_array((len(indices), 3), self._keyframe_widths(layout))
+        coords = layout.decode_keyframe(layout.from_unsigned(fields[:, :2]))
+        keypoints = self._reconstruct_keyframe(indices, coords, fields[:, 2], (1 << precision) - 1)
+
+        # 与编码端一致，预测从关键帧重新开始
+        self.predictor.reset()
+        self.reference_quality = quality
+        return self._finish_decoding(keypoints)
+
+    def _decompress_delta_frame(self, reader, quality, entropy_coded=False):
+        """解压差分帧，需要先收到同一质量等级的关键帧"""
+        if self.reference is None or quality != self.reference_quality:
+            raise ValueError("缺少参考帧，等待关键帧")
+
+        precision = self.quality_levels[quality]['precision']
+        max_val = (1 << precision) - 1
+        indices = self.quality_indices[quality]
+
+        if entropy_coded:
+            max_delta = (1 << (precision - 3)) - 1
+            deltas = self.residual_coder.decode(reader, self.group_ids[indices], max_delta, max_val)
+        else:
+            changed = reader.read_array(len(indices), 1).astype(bool)
+            deltas = np.zeros((len(indices), 2), dtype=np.int64)
+            deltas[changed] = reader.read_signed_array((int(changed.sum()), 2), precision - 2)
+
+        predicted = self._quantized_prediction(self.predictor, indices, max_val)
+        keypoints = self._reconstruct_delta(self.reference, indices, predicted + deltas, max_val)
+        return self._finish_decoding(keypoints)
+
+    def _finish_decoding(self, keypoints):
+        self.predictor.update(keypoints[:, :2])
+        self.reference = keypoints
+        return keypoints.copy()
+
+
+class EnhancedCompressor:
+    """编码端和解码端的组合：compress 走 EnhancedEncoder，decompress 走独立的 EnhancedDecoder
+
+    两端状态分开保存。关键帧反馈不在本地转接：远端解码端的 keyframe_request
+    需要交给发送端的 request_keyframe
+    """
+
+    def __init__(self, entropy_coding=False, dictionary=None, predictor='kalman', kinematic=True,
+                 rate_controller=None):
+        self.encoder = EnhancedEncoder(entropy_coding, dictionary, predictor, kinematic, rate_controller)
+        self.decoder = EnhancedDecoder(dictionary, predictor, kinematic)
+        self.keypoints_priority = self.encoder.keypoints_priority
+        self.quality_levels = self.encoder.quality_levels
+        self.quality_names = self.encoder.quality_names
+        self.quality_indices = self.encoder.quality_indices
+
+    @property
+    def current_quality(self):
+        return self.encoder.current_quality
+
+    @current_quality.setter
+    def current_quality(self, quality):
+        self.encoder.current_quality = quality
+
+    @property
+    def last_reconstructed(self):
+        """编码端最近一帧的重建值，即解码端应当输出的结果"""
+        return self.encoder.last_reconstructed
+
+    @property
+    def lost_frames(self):
+        return self.decoder.lost_frames
+
+    def request_keyframe(self):
+        """解码端检测到丢包后调用，下一帧发送关键帧"""
+        self.encoder.request_keyframe()
+
+    def keyframe_request(self):
+        """解码端有待反馈的关键帧请求时返回 True，取出后清除"""
+        return self.decoder.keyframe_request()
+
+    def compress(self, keypoints, bandwidth=None):
+        """增强的压缩算法，返回二进制数据包"""
+        return self.encoder.encode(keypoints, bandwidth)
+
+    def decompress(self, compressed_data):
+        """解压数据，返回 (33, 4) 关键点，未传输的点为 NaN"""
+        return self.decoder.decode(compressed_data)
+
+    def compress_batch(self, keypoints, gop_size=30):
+        """整段编码 (T, N, 4) 关键点序列，返回带帧组偏移索引的连续缓冲
+
+        使用当前质量等级的点集合和精度；帧组内的时间差分不截断，解码结果即逐点量化值
+        """
+        keypoints = np.asarray(keypoints, dtype=np.float32)
+        if keypoints.shape[1] < POSE_LANDMARKS:
+            padded = np.zeros((len(keypoints), POSE_LANDMARKS, 4), dtype=np.float32)
+            padded[:, :keypoints.shape[1], :keypoints.shape[2]] = keypoints[..., :4]
+            keypoints = padded
+        precision = self.quality_levels[self.current_quality]['precision']
+        return encode_gops(keypoints, self.quality_indices[self.current_quality], precision, gop_size)
+
+    def decompress_batch(self, data, frames=None):
+        """解码 compress_batch 的输出，返回 (T, 33, 4)；frames 为 slice 时只解码所需帧组"""
+        return decode_gops(data, POSE_LANDMARKS, frames)
+
+
+def read_header(packet):
+    """解析数据包头部，返回 (版本, 字典压缩标志, 帧类型, 质量等级序号, 帧号)"""
+    reader = BitReader(packet[:HEADER_BYTES])
+    return tuple(int(value) for value in reader.read_array(len(HEADER_BITS), HEADER_BITS))
+
+
+def measure_bitrate(frames, quality='low', entropy_coding=True, dictionary=None):
+    """用录制的关键点序列 (T, 33, 4) 统计固定质量等级下每帧的平均位数
+
+    未检测到人体（含 NaN）的帧跳过
+    """
+    encoder = EnhancedEncoder(entropy_coding=entropy_coding, dictionary=dictionary)
+    encoder.current_quality = quality
+    bits = {KEYFRAME: [], DELTA_FRAME: [], ENTROPY_DELTA_FRAME: []}
+    deflated_frames = 0
+    for keypoints in frames:
+        if np.isnan(keypoints).any():
+            continue
+        packet = encoder.encode(keypoints)
+        _, deflated, frame_type, _, _ = read_header(packet)
+        bits[frame_type].append(len(packet) * 8)
+        deflated_frames += deflated
+
+    deltas = bits[DELTA_FRAME] + bits[ENTROPY_DELTA_FRAME]
+    total = bits[KEYFRAME] + deltas
+    return {
+        'frames': len(total),
+        'mean_bits': float(np.mean(total)) if total else 0.0,
+        'keyframe_bits': float(np.mean(bits[KEYFRAME])) if bits[KEYFRAME] else 0.0,
+        'delta_bits': float(np.mean(deltas)) if deltas else 0.0,
+        'entropy_coded_frames': len(bits[ENTROPY_DELTA_FRAME]),
+        'deflated_frames': deflated_frames
+    }
+
+
+def training_payloads(frames, quality, entropy_coding=True):
+    """生成训练预置字典用的样本：各帧数据包去掉头部后的位流"""
+    encoder = EnhancedEncoder(entropy_coding=entropy_coding)
+    encoder.current_quality = quality
+    return [encoder.encode(keypoints)[HEADER_BYTES:]
+            for keypoints in frames if not np.isnan(keypoints).any()]
+
 
 class PriorityManager:
     def __init__(self):
@@ -0,0 +1,91 @@
+"""
+预置压缩字典模块
+几十字节的数据包单独用 zlib 压缩没有可引用的历史，往往越压越大。
+这里从录制的关键点数据包中训练一个预置字典，两端启动时加载同一版本，
+每个数据包都以字典为历史独立做 raw deflate，关键帧仍可单独解码。
+压缩后的数据包带 1 字节字典标识(字典数据和版本号的 CRC32 低 8 位)，两端字典不一致时拒绝解码，
+而不是输出错误的坐标
+"""
+
+import struct
+import zlib
+from collections import Counter
+
+DICTIONARY_MAGIC = b'MSDICT'
+HEADER_FORMAT = '>6sHI'  # 魔数 | 字典版本 | 字典数据的 CRC32
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# deflate 的窗口为 32KB，字典再大也用不上
+MAX_DICTIONARY_SIZE = 32 * 1024
+
+
+class PacketDictionary:
+    """用预置字典压缩/解压单个数据包"""
+
+    def __init__(self, data, version=1):
+        if len(data) > MAX_DICTIONARY_SIZE:
+            data = data[-MAX_DICTIONARY_SIZE:]
+        self.data = bytes(data)
+        self.version = version
+        self.tag = zlib.crc32(struct.pack('>H', version), zlib.crc32(self.data)) & 0xFF
+
+    def compress(self, payload):
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, self.data)
+        return compressor.compress(payload) + compressor.flush()
+
+    def decompress(self, data):
+        decompressor = zlib.decompressobj(-15, self.data)
+        return decompressor.decompress(data) + decompressor.flush()
+
+
+def train_dictionary(samples, size=4096, min_length=3, max_length=8):
+    """从样本数据包中训练预置字典
+
+    统计样本中重复出现的子串，按 出现次数 * (长度 - 2) 估算可节省的字节数，
+    取得分最高且互不包含的子串拼接为字典；得分越高越靠近字典末尾，匹配距离更短
+    """
+    counts = Counter()
+    for sample in samples:
+        seen = set()
+        for length in range(min_length, max_length + 1):
+            for start in range(len(sample) - length + 1):
+                seen.add(sample[start:start + length])
+        # 每个样本内只计一次，避免个别长数据包主导统计
+        counts.update(seen)
+
+    candidates = sorted(
+        (item for item in counts.items() if item[1] > 1),
+        key=lambda item: item[1] * (len(item[0]) - 2),
+        reverse=True
+    )
+
+    dictionary = b''
+    for substring, _ in candidates:
+        if len(dictionary) + len(substring) > size or substring in dictionary:
+            continue
+        dictionary = substring + dictionary
+        if len(dictionary) >= size - min_length:
+            break
+
+    return dictionary
+
+
+def save_dictionary(path, data, version):
+    with open(path, 'wb') as f:
+        f.write(struct.pack(HEADER_FORMAT, DICTIONARY_MAGIC, version, zlib.crc32(data)))
+        f.write(data)
+
+
+def load_dictionary(path):
+    """读取字典文件，返回 PacketDictionary"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    if len(content) < HEADER_SIZE:
+        raise ValueError(f"字典文件不完整: {path}")
+    magic, version, checksum = struct.unpack(HEADER_FORMAT, content[:HEADER_SIZE])
+    data = content[HEADER_SIZE:]
+    if magic != DICTIONARY_MAGIC:
+        raise ValueError(f"不是压缩字典文件: {path}")
+    if zlib.crc32(data) != checksum:
+        raise ValueError(f"字典文件校验失败: {path}")
+    return PacketDictionary(data, version)
@@ -0,0 +1,195 @@
+"""
+熵编码模块
+运动预测后的差分残差集中在 0 附近，定长字段浪费了大部分位数。
+这里用自适应算术编码压缩残差：每个关键点分组、每个坐标轴一个上下文模型，
+初始概率取拉普拉斯先验，在一个数据包内边编码边更新。
+模型不跨数据包保存，丢包不会让两端的概率模型失去同步
+"""
+
+import numpy as np
+
+CODE_BITS = 32
+TOP = (1 << CODE_BITS) - 1
+HALF = 1 << (CODE_BITS - 1)
+QUARTER = 1 << (CODE_BITS - 2)
+
+# 频率总和上限，保证区间宽度除以总频率后仍有足够精度
+MAX_TOTAL = 1 << 16
+
+# 先验的最小尺度(量化步)：量化后的残差至少有约半步的抖动，过窄的先验会让非零残差代价过高
+MIN_SCALE = 0.5
+
+
+class AdaptiveModel:
+    """[-max_value, max_value] 上的自适应频率模型，累计频率表增量更新"""
+
+    def __init__(self, prior, increment=32):
+        self.max_value = (len(prior) - 1) // 2
+        self.increment = increment
+        self.cumulative = np.concatenate(([0], np.cumsum(prior)))
+        self.total = int(self.cumulative[-1])
+
+    def interval(self, symbol):
+        """返回符号的累计频率区间 (low, high)"""
+        index = symbol + self.max_value
+        return self.cumulative[index].item(), self.cumulative[index + 1].item()
+
+    def find(self, target):
+        """按累计频率查找符号，返回 (symbol, low, high)"""
+        index = int(self.cumulative.searchsorted(target, side='right')) - 1
+        return index - self.max_value, self.cumulative[index].item(), self.cumulative[index + 1].item()
+
+    def update(self, symbol):
+        self.cumulative[symbol + self.max_value + 1:] += self.increment
+        self.total += self.increment
+        if self.total > MAX_TOTAL:
+            freqs = (np.diff(self.cumulative) + 1) // 2
+            self.cumulative = np.concatenate(([0], np.cumsum(freqs)))
+            self.total = int(self.cumulative[-1])
+
+
+_prior_cache = {}
+
+
+def laplacian_prior(max_value, scale, total=1024):
+    """离散拉普拉斯分布的整数频率表，scale 以量化步长为单位，每个符号至少为 1"""
+    key = (max_value, round(scale, 3), total)
+    if key not in _prior_cache:
+        symbols = np.arange(-max_value, max_value + 1)
+        weights = np.exp(-np.abs(symbols) / max(scale, MIN_SCALE))
+        _prior_cache[key] = np.maximum(1, np.floor(weights / weights.sum() * total)).astype(np.int64)
+    return _prior_cache[key]
+
+
+class ArithmeticEncoder:
+    """整数算术编码器，输出 0/1 位列表"""
+
+    def __init__(self):
+        self.low = 0
+        self.high = TOP
+        self.pending = 0
+        self.bits = []
+
+    def encode(self, model, symbol):
+        low, high = model.interval(symbol)
+        span = self.high - self.low + 1
+        total = model.total
+        self.high = self.low + span * high // total - 1
+        self.low = self.low + span * low // total
+
+        while True:
+            if self.high < HALF:
+                self._emit(0)
+            elif self.low >= HALF:
+                self._emit(1)
+                self.low -= HALF
+                self.high -= HALF
+            elif self.low >= QUARTER and self.high < 3 * QUARTER:
+                self.pending += 1
+                self.low -= QUARTER
+                self.high -= QUARTER
+            else:
+                break
+            self.low <<= 1
+            self.high = (self.high << 1) | 1
+        model.update(symbol)
+
+    def finish(self):
+        """输出足以确定最终区间的位"""
+        self.pending += 1
+        self._emit(0 if self.low < QUARTER else 1)
+        return self.bits
+
+    def _emit(self, bit):
+        self.bits.append(bit)
+        if self.pending:
+            self.bits.extend([1 - bit] * self.pending)
+            self.pending = 0
+
+
+class ArithmeticDecoder:
+    """从 BitReader 当前位置解码到数据末尾，越过末尾的位按 0 补齐"""
+
+    def __init__(self, reader):
+        # 算术编码数据位于数据包末尾，一次取出剩余的位
+        self.bits = reader.bits[reader.position:].tolist()
+        reader.position = reader.length
+        self.position = 0
+        self.low = 0
+        self.high = TOP
+        self.code = 0
+        for _ in range(CODE_BITS):
+            self.code = (self.code << 1) | self._next_bit()
+
+    def _next_bit(self):
+        position = self.position
+        self.position += 1
+        return self.bits[position] if position < len(self.bits) else 0
+
+    def decode(self, model):
+        span = self.high - self.low + 1
+        total = model.total
+        target = ((self.code - self.low + 1) * total - 1) // span
+        symbol, low, high = model.find(target)
+        self.high = self.low + span * high // total - 1
+        self.low = self.low + span * low // total
+
+        while True:
+            if self.high < HALF:
+                pass
+            elif self.low >= HALF:
+                self.low -= HALF
+                self.high -= HALF
+                self.code -= HALF
+            elif self.low >= QUARTER and self.high < 3 * QUARTER:
+                self.low -= QUARTER
+                self.high -= QUARTER
+                self.code -= QUARTER
+            else:
+                break
+            self.low <<= 1
+            self.high = (self.high << 1) | 1
+            self.code = (self.code << 1) | self._next_bit()
+        model.update(symbol)
+        return symbol
+
+
+class ResidualCoder:
+    """按分组上下文对 (n, 2) 整数残差做熵编码
+
+    scales 为各分组残差的拉普拉斯尺度（归一化坐标单位），编码时按量化步数换算，
+    因此同一组先验适用于所有精度的质量等级
+    """
+
+    def __init__(self, scales, increment=32):
+        self.scales = list(scales)
+        self.increment = increment
+
+    def encode(self, writer, residuals, groups, max_value, steps):
+        """把残差写入 writer，groups 为每个点所属分组的序号，steps 为每单位坐标的量化步数"""
+        encoder = ArithmeticEncoder()
+        models = self._models(groups, max_value, steps)
+        for group, (dx, dy) in zip(groups, np.asarray(residuals).tolist()):
+            encoder.encode(models[group][0], dx)
+            encoder.encode(models[group][1], dy)
+        bits = encoder.finish()
+        writer.write_array(bits, 1)
+        return len(bits)
+
+    def decode(self, reader, groups, max_value, steps):
+        """从 reader 读出残差，返回 (n, 2) 整数数组"""
+        decoder = ArithmeticDecoder(reader)
+        models = self._models(groups, max_value, steps)
+        residuals = np.zeros((len(groups), 2), dtype=np.int64)
+        for i, group in enumerate(groups):
+            residuals[i, 0] = decoder.decode(models[group][0])
+            residuals[i, 1] = decoder.decode(models[group][1])
+        return residuals
+
+    def _models(self, groups, max_value, steps):
+        """每个分组的 x、y 各一个模型，每个数据包重新从先验开始"""
+        models = {}
+        for group in set(int(g) for g in groups):
+            prior = laplacian_prior(max_value, self.scales[group] * steps)
+            models[group] = (AdaptiveModel(prior, self.increment), AdaptiveModel(prior, self.increment))
+        return models
@@ -0,0 +1,241 @@
+"""
+前向纠错模块
+卫星链路单向延迟 300-500ms，等重传回来画面早已过时。发送端把连续发出的 k 个数据包编为一组，
+额外发送 m 个校验包，接收端收到组内任意 k 个包即可恢复丢失的数据包，不需要往返。
+m = 1 时可用 XOR 校验；m > 1 时用 GF(256) 上的 Cauchy 矩阵构造系统 Reed-Solomon 码。
+m 按测得的丢包率自适应选取：使一组内丢包数超过 m 的概率不高于 target_loss
+
+编码符号：2 字节长度 + 数据包，补零到组内最长符号的长度
+校验包载荷：模式(1) | k(1) | m(1) | 校验序号(1) | k 个数据包相对组首序号的偏移(各 1 字节) | 校验符号
+组首序号放在数据报头部的序号字段
+"""
+
+import struct
+from math import comb
+import numpy as np
+
+XOR = 0
+REED_SOLOMON = 1
+MODES = {'xor': XOR, 'rs': REED_SOLOMON}
+
+PARITY_HEADER = '>BBBB'
+PARITY_HEADER_SIZE = struct.calcsize(PARITY_HEADER)
+LENGTH_FORMAT = '>H'
+
+# GF(256)，本原多项式 x^8 + x^4 + x^3 + x^2 + 1
+_EXP = np.zeros(512, dtype=np.int64)
+_LOG = np.zeros(256, dtype=np.int64)
+_value = 1
+for _power in range(255):
+    _EXP[_power] = _value
+    _LOG[_value] = _power
+    _value <<= 1
+    if _value & 0x100:
+        _value ^= 0x11D
+_EXP[255:510] = _EXP[:255]
+
+# 乘法表和逆元表，按字节数组整体查表
+_MUL = np.zeros((256, 256), dtype=np.uint8)
+_MUL[1:, 1:] = _EXP[_LOG[1:, None] + _LOG[None, 1:]]
+_INV = np.zeros(256, dtype=np.int64)
+_INV[1:] = _EXP[255 - _LOG[1:]]
+
+
+def parity_rows(mode, k, m):
+    """校验包的生成矩阵行 (m, k)：XOR 为全 1，Reed-Solomon 为 Cauchy 矩阵 1 / (x_j + y_i)"""
+    if mode == XOR:
+        return np.ones((m, k), dtype=np.int64)
+    x = np.arange(k, k + m)[:, None]
+    y = np.arange(k)[None, :]
+    return _INV[x ^ y]
+
+
+def _combine(rows, symbols):
+    """GF(256) 上的矩阵乘法：rows (r, k) 乘 symbols (k, L)"""
+    output = np.zeros((len(rows), symbols.shape[1]), dtype=np.uint8)
+    for j, row in enumerate(rows):
+        for coefficient, symbol in zip(row, symbols):
+            if coefficient:
+                output[j] ^= _MUL[coefficient][symbol]
+    return output
+
+
+def _invert(matrix):
+    """GF(256) 上的 Gauss-Jordan 求逆，矩阵奇异时抛出 ValueError"""
+    n = len(matrix)
+    augmented = np.concatenate([np.asarray(matrix, dtype=np.int64), np.eye(n, dtype=np.int64)], axis=1)
+    for col in range(n):
+        pivot = next((row for row in range(col, n) if augmented[row, col]), None)
+        if pivot is None:
+            raise ValueError("校验矩阵奇异，无法恢复")
+        augmented[[col, pivot]] = augmented[[pivot, col]]
+        augmented[col] = _MUL[_INV[augmented[col, col]]][augmented[col]]
+        for row in range(n):
+            if row != col and augmented[row, col]:
+                augmented[row] ^= _MUL[augmented[row, col]][augmented[col]]
+    return augmented[:, n:]
+
+
+def _to_symbols(payloads, length=None):
+    encoded = [struct.pack(LENGTH_FORMAT, len(payload)) + payload for payload in payloads]
+    length = length or max(len(symbol) for symbol in encoded)
+    symbols = np.zeros((len(encoded), length), dtype=np.uint8)
+    for i, symbol in enumerate(encoded):
+        symbols[i, :len(symbol)] = np.frombuffer(symbol, dtype=np.uint8)
+    return symbols
+
+
+def _from_symbol(symbol):
+    size = struct.unpack(LENGTH_FORMAT, symbol[:2].tobytes())[0]
+    return symbol[2:2 + size].tobytes()
+
+
+def block_failure_probability(loss, k, m):
+    """k + m 个包独立以概率 loss 丢失时，丢失数超过 m(无法完全恢复)的概率"""
+    n = k + m
+    return sum(comb(n, lost) * loss ** lost * (1 - loss) ** (n - lost) for lost in range(m + 1, n + 1))
+
+
+class FECEncoder:
+    """发送端：按发出顺序把数据包分组，组满或超过 max_delay 秒时生成校验包
+
+    mode 为 'xor' 或 'rs'；'xor' 每组最多 1 个校验包
+    """
+
+    def __init__(self, mode='rs', block_size=4, max_parity=3, target_loss=0.02, max_delay=0.4):
+        if mode not in MODES:
+            raise ValueError(f"未知的纠错模式: {mode}")
+        self.mode = MODES[mode]
+        self.block_size = block_size
+        self.max_parity = 1 if self.mode == XOR else max_parity
+        self.target_loss = target_loss
+        self.max_delay = max_delay
+        self.parity = self.max_parity
+
+        self.block = []            # [(序号, 数据包)]
+        self.block_started = None
+        self.data_bytes = 0
+        self.parity_bytes = 0
+
+    def set_loss_rate(self, loss):
+        """按丢包率选取每组的校验包数"""
+        self.parity = next((m for m in range(self.max_parity + 1)
+                            if block_failure_probability(loss, self.block_size, m) <= self.target_loss),
+                           self.max_parity)
+
+    @property
+    def overhead(self):
+        """校验包字节数占数据包字节数的比例"""
+        return self.parity_bytes / self.data_bytes if self.data_bytes else 0.0
+
+    def add(self, seq, payload, now):
+        """登记一个首次发出的数据包，返回需要发送的 [(组首序号, 校验包载荷)]"""
+        seqs = [s for s, _ in self.block] + [seq]
+        if len(seqs) > 1 and max(seqs) - min(seqs) > 255:
+            parities = self.flush()  # 偏移放不进 1 字节，先结束当前组
+        else:
+            parities = []
+        if not self.block:
+            self.block_started = now
+        self.block.append((seq, payload))
+        self.data_bytes += len(payload)
+        if len(self.block) >= self.block_size:
+            parities += self.flush()
+        return parities
+
+    def deadline(self):
+        """当前未满的组需要强制结束的时刻，没有未结束的组时返回 None"""
+        return None if not self.block else self.block_started + self.max_delay
+
+    def flush(self):
+        """结束当前组并生成校验包"""
+        block, self.block = self.block, []
+        if not block or self.parity == 0:
+            return []
+        seqs = [seq for seq, _ in block]
+        base = min(seqs)
+        k, m = len(block), self.parity
+        symbols = _to_symbols([payload for _, payload in block])
+        parity = _combine(parity_rows(self.mode, k, m), symbols)
+        header = bytes(seq - base for seq in seqs)
+        output = []
+        for index in range(m):
+            body = struct.pack(PARITY_HEADER, self.mode, k, m, index) + header + parity[index].tobytes()
+            self.parity_bytes += len(body)
+            output.append((base, body))
+        return output
+
+
+class FECDecoder:
+    """接收端：保存最近的数据包和校验包，组内收到任意 k 个包时恢复丢失的数据包"""
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.received = {}   # 序号 -> 数据包
+        self.blocks = {}     # 组首序号 -> {'seqs', 'mode', 'parity': {校验序号: 符号}}
+        self.recovered = 0
+
+    def on_data(self, seq, payload):
+        """收到数据包，返回因此可以恢复的 [(序号, 数据包)]"""
+        self.received[seq] = payload
+        self._trim()
+        recovered = []
+        for base, block in list(self.blocks.items()):
+            if seq in block['seqs']:
+                recovered += self._try_recover(base)
+        return recovered
+
+    def on_parity(self, base, body):
+        """收到校验包，返回可以恢复的 [(序号, 数据包)]"""
+        mode, k, m, index = struct.unpack(PARITY_HEADER, body[:PARITY_HEADER_SIZE])
+        offsets = body[PARITY_HEADER_SIZE:PARITY_HEADER_SIZE + k]
+        block = self.blocks.setdefault(base, {
+            'seqs': [base + offset for offset in offsets],
+            'mode': mode,
+            'parity_count': m,
+            'parity': {}
+        })
+        block['parity'][index] = np.frombuffer(body[PARITY_HEADER_SIZE + k:], dtype=np.uint8)
+        self._trim()
+        return self._try_recover(base)
+
+    def _try_recover(self, base):
+        block = self.blocks[base]
+        seqs = block['seqs']
+        missing = [i for i, seq in enumerate(seqs) if seq not in self.received]
+        if not missing:
+            del self.blocks[base]
+            return []
+        if len(missing) > len(block['parity']):
+            return []
+
+        # 用收到的数据包和足够的校验包组成 k 个方程求解
+        k = len(seqs)
+        length = len(next(iter(block['parity'].values())))
+        present = [i for i in range(k) if i not in missing]
+        rows = parity_rows(block['mode'], k, block['parity_count'])
+        indices = sorted(block['parity'])[:len(missing)]
+        matrix = np.concatenate([np.eye(k, dtype=np.int64)[present], rows[indices]])
+        symbols = np.concatenate([
+            _to_symbols([self.received[seqs[i]] for i in present], length),
+            np.stack([block['parity'][index] for index in indices])
+        ]) if present else np.stack([block['parity'][index] for index in indices])
+        try:
+            source = _combine(_invert(matrix), symbols)
+        except ValueError:
+            return []
+
+        del self.blocks[base]
+        recovered = []
+        for i in missing:
+            payload = _from_symbol(source[i])
+            self.received[seqs[i]] = payload
+            recovered.append((seqs[i], payload))
+        self.recovered += len(recovered)
+        return recovered
+
+    def _trim(self):
+        while len(self.received) > self.capacity:
+            del self.received[min(self.received)]
+        while len(self.blocks) > self.capacity:
+            del self.blocks[min(self.blocks)]
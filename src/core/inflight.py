@@ -0,0 +1,125 @@
+"""
+在途数据包表
+SatelliteAdapter 的待确认数据包按状态分两段保存：排队中(尚未发出)和在途(已发出等待确认)，
+在途段按发送时刻排序。确认按序号 O(1) 删除，超时检查只从最早发出的一端取出已超时的数据包，
+不再全表扫描。表的数据包数和字节数有上限，超出时淘汰最早的数据包。
+带宽估计按确认到达计算投递速率：每个数据包发出时记下当时已确认的字节数和时刻，
+确认时用这段时间内新确认的字节数除以经过的时间得到一个样本，取窗口内样本的最大值，
+发送方自己没数据可发时的偏低样本不会拉低估计。表本身不加锁，由调用方持锁访问
+"""
+
+from collections import OrderedDict, deque
+
+
+class InFlightTable:
+    """待确认数据包表，数据包为 SatelliteAdapter.send_data 创建的 dict"""
+
+    def __init__(self, max_packets=1024, max_bytes=256 * 1024, rate_window=10.0):
+        self.max_packets = max_packets
+        self.max_bytes = max_bytes
+        self.rate_window = rate_window
+
+        self.queued = OrderedDict()     # 序号 -> 数据包，按入队顺序
+        self.in_flight = OrderedDict()  # 序号 -> 数据包，按发送时刻
+        self.total_bytes = 0
+
+        # 增量计数
+        self.acked = 0
+        self.timeouts = 0
+        self.evicted = 0
+        self.delivered = 0              # 累计确认的数据报字节数
+        self.delivered_time = None      # 最近一次确认(或空闲后首次发送)的时刻
+        self.rate_samples = deque()     # 窗口内的投递速率样本 (时刻, 位/秒)
+
+    def __len__(self):
+        return len(self.queued) + len(self.in_flight)
+
+    def __contains__(self, seq):
+        return seq in self.queued or seq in self.in_flight
+
+    def add(self, packet):
+        """新数据包入队，超出上限时淘汰最早的数据包并返回被淘汰的列表"""
+        self.queued[packet['seq']] = packet
+        self.total_bytes += len(packet['data'])
+        evicted = []
+        while len(self) > self.max_packets or (self.total_bytes > self.max_bytes and len(self) > 1):
+            evicted.append(self._pop_oldest())
+        self.evicted += len(evicted)
+        return evicted
+
+    def mark_sent(self, seq, now, size):
+        """数据包发出：移到在途段末尾，记下投递速率采样的起点"""
+        if not self.in_flight:
+            self.delivered_time = now  # 空闲期间不计入投递时间
+        packet = self.queued.pop(seq, None) or self.in_flight.pop(seq, None)
+        if packet is not None:
+            packet['sent'] = now
+            packet['size'] = size
+            packet['delivered'] = self.delivered
+            packet['delivered_time'] = self.delivered_time
+            self.in_flight[seq] = packet
+
+    def acknowledge(self, seq, now):
+        """收到确认，返回对应的数据包，已不在表中时返回 None"""
+        packet = self.in_flight.pop(seq, None) or self.queued.pop(seq, None)
+        if packet is None:
+            return None
+        self.total_bytes -= len(packet['data'])
+        self.acked += 1
+        if packet.get('size'):
+            self.delivered += packet['size']
+            self.delivered_time = now
+            elapsed = now - packet['delivered_time']
+            if elapsed > 0:
+                self.rate_samples.append((now, (self.delivered - packet['delivered']) * 8 / elapsed))
+            self._trim_window(now)
+        return packet
+
+    def expire(self, now, timeout):
+        """取出发出后超过 timeout 秒仍未确认的数据包，它们回到排队段等待重传或被调用方丢弃"""
+        expired = []
+        while self.in_flight:
+            seq, packet = next(iter(self.in_flight.items()))
+            if now - packet['sent'] < timeout:
+                break
+            del self.in_flight[seq]
+            packet['sent'] = None
+            self.queued[seq] = packet
+            expired.append(packet)
+        self.timeouts += len(expired)
+        return expired
+
+    def discard(self, seq):
+        """放弃数据包(重传次数用尽)"""
+        packet = self.queued.pop(seq, None) or self.in_flight.pop(seq, None)
+        if packet is not None:
+            self.total_bytes -= len(packet['data'])
+        return packet
+
+    def next_deadline(self, timeout):
+        """最早一个在途数据包的超时时刻，没有在途数据包时返回 None"""
+        if not self.in_flight:
+            return None
+        return next(iter(self.in_flight.values()))['sent'] + timeout
+
+    def delivery_rate(self, now):
+        """最近 rate_window 秒内投递速率样本的最大值(位/秒)，没有样本时返回 None"""
+        self._trim_window(now)
+        if not self.rate_samples:
+            return None
+        return max(rate for _, rate in self.rate_samples)
+
+    def clear(self):
+        self.queued.clear()
+        self.in_flight.clear()
+        self.total_bytes = 0
+
+    def _pop_oldest(self):
+        source = self.in_flight if self.in_flight else self.queued
+        _, packet = source.popitem(last=False)
+        self.total_bytes -= len(packet['data'])
+        return packet
+
+    def _trim_window(self, now):
+        while self.rate_samples and now - self.rate_samples[0][0] > self.rate_window:
+            self.rate_samples.popleft()
@@ -0,0 +1,126 @@
+"""
+骨骼树相对编码模块
+以头部(鼻尖 0)和左右肩(11、12)为根遍历 MediaPipe 姿态骨骼树：
+关键帧中子节点传输相对父节点(重建值)的偏移，按骨骼长度范围逐骨骼分配位宽，
+偏移量化步长与绝对坐标相同，因此重建误差不变而位数更少。
+偏移超出骨骼范围时由编码端改发绝对坐标关键帧，不做截断。
+差分帧沿用逐点的时间预测：卡尔曼预测已跟随整体移动，再叠加父节点误差只会放大抖动
+"""
+
+import numpy as np
+
+# 根节点，与 KeypointCompressor.reference_points 一致
+ROOTS = (0, 11, 12)
+
+# 每个点的父节点，根节点为 -1
+POSE_PARENTS = np.array([
+    -1,                   # 0 鼻尖
+    0, 1, 2,              # 1-3 左眼内、中、外
+    0, 4, 5,              # 4-6 右眼内、中、外
+    3, 6,                 # 7-8 左耳、右耳
+    0, 9,                 # 9-10 嘴左、嘴右
+    -1, -1,               # 11-12 左肩、右肩
+    11, 12,               # 13-14 肘
+    13, 14,               # 15-16 腕
+    15, 16, 15, 16, 15, 16,  # 17-22 小指、食指、拇指
+    11, 12,               # 23-24 髋
+    23, 24, 25, 26,       # 25-28 膝、踝
+    27, 28, 27, 28        # 29-32 脚跟、脚尖
+])
+
+# 子节点相对父节点偏移的最大范围(归一化坐标)
+BONE_RANGES = np.array([
+    0.0,
+    0.0625, 0.0625, 0.0625,
+    0.0625, 0.0625, 0.0625,
+    0.125, 0.125,
+    0.125, 0.125,
+    0.0, 0.0,
+    0.5, 0.5,
+    0.5, 0.5,
+    0.125, 0.125, 0.125, 0.125, 0.125, 0.125,
+    0.5, 0.5,
+    0.5, 0.5, 0.5, 0.5,
+    0.25, 0.25, 0.25, 0.25
+])
+
+
+class KinematicLayout:
+    """某个点集合和精度下的骨骼树编码布局，所有数组按 indices 的顺序排列"""
+
+    def __init__(self, indices, precision, parents, ranges):
+        self.max_val = (1 << precision) - 1
+        position = {int(idx): i for i, idx in enumerate(indices)}
+
+        # 父节点未传输时上溯到最近的已传输祖先，没有则作为根
+        self.parents = np.full(len(indices), -1, dtype=np.int64)
+        for i, idx in enumerate(indices):
+            parent = parents[idx]
+            while parent >= 0 and parent not in position:
+                parent = parents[parent]
+            if parent >= 0:
+                self.parents[i] = position[parent]
+
+        # 按深度分层，同一层的点可以一起重建
+        depth = np.zeros(len(indices), dtype=np.int64)
+        for i in range(len(indices)):
+            node = self.parents[i]
+            while node >= 0:
+                depth[i] += 1
+                node = self.parents[node]
+        self.levels = [np.flatnonzero(depth == d) for d in range(1, depth.max() + 1)] if len(depth) else []
+
+        # 逐骨骼位宽：偏移的量化步长与绝对坐标相同，位宽不小于绝对坐标时直接传绝对坐标
+        limits = np.round(ranges[indices] * self.max_val).astype(np.int64)
+        widths = np.array([int(limit).bit_length() + 1 for limit in limits])
+        self.relative = (self.parents >= 0) & (widths < precision)
+        self.limits = np.where(self.relative, limits, 0)
+        self.widths = np.where(self.relative, widths, precision)
+
+    def encode_keyframe(self, coords):
+        """coords 为量化后的 (n, 2) 绝对坐标，返回写入的字段；有偏移超出骨骼范围时返回 None"""
+        fields = coords.copy()
+        for level in self.levels:
+            level = level[self.relative[level]]
+            offsets = coords[level] - coords[self.parents[level]]
+            if (np.abs(offsets) > self.limits[level, None]).any():
+                return None
+            fields[level] = offsets
+        return fields
+
+    def decode_keyframe(self, fields):
+        """由字段还原量化坐标，偏移字段为有符号数"""
+        reconstructed = fields.copy()
+        for level in self.levels:
+            level = level[self.relative[level]]
+            reconstructed[level] = reconstructed[self.parents[level]] + fields[level]
+        return reconstructed
+
+    def field_widths(self):
+        return np.repeat(self.widths[:, None], 2, axis=1)
+
+    def to_unsigned(self, fields):
+        """偏移字段转为补码，便于与绝对坐标一起按位写入"""
+        widths = self.field_widths()
+        return np.where(self.relative[:, None], fields & ((1 << widths) - 1), fields)
+
+    def from_unsigned(self, values):
+        widths = self.field_widths()
+        sign = 1 << (widths - 1)
+        signed = np.where(values & sign, values - (sign << 1), values)
+        return np.where(self.relative[:, None], signed, values)
+
+
+class KinematicTree:
+    """骨骼树，按点集合和精度缓存编码布局"""
+
+    def __init__(self, parents=POSE_PARENTS, ranges=BONE_RANGES):
+        self.parents = parents
+        self.ranges = ranges
+        self._layouts = {}
+
+    def layout(self, indices, precision):
+        key = (tuple(int(i) for i in indices), precision)
+        if key not in self._layouts:
+            self._layouts[key] = KinematicLayout(indices, precision, self.parents, self.ranges)
+        return self._layouts[key]
@@ -0,0 +1,98 @@
+"""
+关键点提取模块
+每帧只遍历一次 MediaPipe 的 protobuf 结果，写入预分配的 float32 (N, 4) 数组
+[x, y, z, visibility]，绘制、/pose 接口、压缩器和动作幅度计算都直接读取这些数组
+"""
+
+import numpy as np
+
+POSE_LANDMARKS = 33
+HAND_LANDMARKS = 21
+FACE_LANDMARKS = 468
+
+# 上半身关键点，特别是面部和手部
+SELECTED_KEYPOINTS = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 15, 16, 17, 18, 19, 20, 21, 22]
+
+
+def expand_selected(keypoints, indices=SELECTED_KEYPOINTS):
+    """把只含选中点的 (..., K, 4) 数组还原为完整的 (..., 33, 4) 姿态布局，其余点不可见"""
+    keypoints = np.asarray(keypoints, dtype=np.float32)
+    full = np.zeros(keypoints.shape[:-2] + (POSE_LANDMARKS, 4), dtype=np.float32)
+    full[..., indices, :] = keypoints
+    return full
+
+
+class LandmarkFrame:
+    """一帧的关键点数组（归一化坐标）"""
+
+    def __init__(self, max_hands=2, max_faces=1):
+        self.frame_id = -1
+        self.pose = np.zeros((POSE_LANDMARKS, 4), dtype=np.float32)
+        self.hands = np.zeros((max_hands, HAND_LANDMARKS, 4), dtype=np.float32)
+        self.faces = np.zeros((max_faces, FACE_LANDMARKS, 4), dtype=np.float32)
+        self.has_pose = False
+        self.num_hands = 0
+        self.num_faces = 0
+
+    @property
+    def hand_list(self):
+        return [self.hands[i] for i in range(self.num_hands)]
+
+    @property
+    def face_list(self):
+        return [self.faces[i] for i in range(self.num_faces)]
+
+    def selected_pose(self, indices=SELECTED_KEYPOINTS):
+        """选中的姿态关键点，没有检测到人体时返回空数组"""
+        if not self.has_pose:
+            return np.empty((0, 4), dtype=np.float32)
+        return self.pose[indices]
+
+
+class LandmarkExtractor:
+    """把 MediaPipe 结果写入预分配数组
+
+    内部轮换使用 buffers 个 LandmarkFrame：新一帧写入时，上一帧的数组仍保持不变，
+    其他线程可以安全读取。需要跨越更多帧保存数据的使用方（如压缩器历史）应自行复制。
+    """
+
+    def __init__(self, max_hands=2, max_faces=1, buffers=2):
+        self.frames = [LandmarkFrame(max_hands, max_faces) for _ in range(buffers)]
+        self.index = 0
+        self.latest = None
+
+    def extract(self, frame_id, pose_results=None, hands_results=None, face_results=None):
+        """提取一帧的全部关键点，返回 LandmarkFrame"""
+        self.index = (self.index + 1) % len(self.frames)
+        frame = self.frames[self.index]
+        frame.frame_id = frame_id
+
+        pose_landmarks = getattr(pose_results, 'pose_landmarks', None)
+        frame.has_pose = pose_landmarks is not None
+        if frame.has_pose:
+            _fill(frame.pose, pose_landmarks, has_visibility=True)
+
+        frame.num_hands = _fill_many(frame.hands, getattr(hands_results, 'multi_hand_landmarks', None))
+        frame.num_faces = _fill_many(frame.faces, getattr(face_results, 'multi_face_landmarks', None))
+
+        self.latest = frame
+        return frame
+
+
+def _fill(out, landmark_list, has_visibility=False):
+    """单次遍历 protobuf 写入预分配数组；hands/face_mesh 没有 visibility，统一填 1"""
+    landmarks = landmark_list.landmark
+    count = min(len(landmarks), len(out))
+    if has_visibility:
+        out[:count] = [(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks[:count]]
+    else:
+        out[:count] = [(lm.x, lm.y, lm.z, 1.0) for lm in landmarks[:count]]
+
+
+def _fill_many(out, landmark_lists):
+    if not landmark_lists:
+        return 0
+    count = min(len(landmark_lists), len(out))
+    for i in range(count):
+        _fill(out[i], landmark_lists[i])
+    return count
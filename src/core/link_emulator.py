@@ -0,0 +1,251 @@
+"""
+链路仿真模块
+在进程内模拟卫星链路，放在两个 SatelliteAdapter 之间代替 UDP：
+令牌桶限速(发送阻塞到最后一位离开链路)、固定延迟加抖动、伯努利或 Gilbert-Elliott 突发丢包，
+也可以回放实际链路抓到的逐包延迟/丢包记录。
+丢包和延迟由带种子的随机数按发送顺序抽取，同样的发送序列得到同样的结果
+
+回放文件格式：每行一个数据包 `延迟毫秒 是否丢失(0/1)`，空格或逗号分隔，# 开头为注释，
+回放到末尾后从头循环
+"""
+
+import heapq
+import itertools
+import time
+from threading import Condition
+import numpy as np
+from .transport import Transport
+
+
+class TokenBucket:
+    """令牌桶限速，rate 为位/秒，burst 为可突发的字节数
+
+    reserve 返回数据包最后一位离开链路的时刻；令牌可以透支，透支部分按速率补回
+    """
+
+    def __init__(self, rate, burst=0):
+        self.rate = float(rate)
+        self.burst = burst * 8
+        self.tokens = self.burst
+        self.updated = None
+
+    def reserve(self, size, now):
+        if self.updated is None:
+            self.updated = now
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        self.tokens -= size * 8
+        if self.tokens >= 0:
+            return now
+        return self.updated - self.tokens / self.rate
+
+
+class BernoulliLoss:
+    """每个数据包独立地以概率 p 丢失"""
+
+    def __init__(self, p, rng):
+        self.p = p
+        self.rng = rng
+
+    def lost(self):
+        return self.rng.random() < self.p
+
+
+class GilbertElliottLoss:
+    """两状态马尔可夫突发丢包：好状态丢包率 loss_good，坏状态丢包率 loss_bad
+
+    每个数据包先按当前状态决定是否丢失，再以 p(好→坏) 或 r(坏→好) 转移状态
+    """
+
+    def __init__(self, p, r, rng, loss_good=0.0, loss_bad=1.0):
+        self.p = p
+        self.r = r
+        self.rng = rng
+        self.loss_good = loss_good
+        self.loss_bad = loss_bad
+        self.bad = False
+
+    @classmethod
+    def from_average(cls, loss, burst_length, rng):
+        """按平均丢包率和平均突发长度(包)构造，坏状态全部丢失、好状态不丢"""
+        r = 1.0 / burst_length
+        p = loss * r / (1.0 - loss) if loss < 1.0 else 1.0
+        return cls(p, r, rng)
+
+    def lost(self):
+        lost = self.rng.random() < (self.loss_bad if self.bad else self.loss_good)
+        if self.bad:
+            self.bad = self.rng.random() >= self.r
+        else:
+            self.bad = self.rng.random() < self.p
+        return lost
+
+
+class TraceReplay:
+    """按顺序回放逐包的 (延迟秒, 是否丢失) 记录"""
+
+    def __init__(self, records):
+        if not records:
+            raise ValueError("链路记录为空")
+        self.records = list(records)
+        self.position = 0
+
+    @classmethod
+    def from_file(cls, path):
+        records = []
+        with open(path) as f:
+            for line in f:
+                line = line.split('#', 1)[0].replace(',', ' ').split()
+                if not line:
+                    continue
+                delay = float(line[0]) / 1000
+                lost = len(line) > 1 and int(line[1]) != 0
+                records.append((delay, lost))
+        return cls(records)
+
+    def next(self):
+        record = self.records[self.position]
+        self.position = (self.position + 1) % len(self.records)
+        return record
+
+
+# EmulatedLink.configure 接受的参数
+LINK_CONDITIONS = ('bandwidth', 'latency', 'jitter', 'packet_loss', 'burst_length',
+                   'trace', 'seed', 'reorder', 'burst')
+
+
+class EmulatedLink:
+    """单向仿真链路
+
+    bandwidth 单位 Kbps，latency、jitter 单位毫秒，packet_loss 为平均丢包率；
+    burst_length 大于 1 时使用 Gilbert-Elliott 突发丢包，否则为伯努利丢包。
+    设置 trace 后延迟和丢包改由回放记录决定，带宽限制仍然生效。
+    reorder=False 时抖动不会让后发的数据包先到达
+    """
+
+    def __init__(self, bandwidth=0.4, latency=400, jitter=0, packet_loss=0.0, burst_length=1,
+                 trace=None, seed=None, reorder=False, burst=0, clock=time.time, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.condition = Condition()
+        self.in_flight = []  # (到达时刻, 序号, 数据报) 小顶堆
+        self.counter = itertools.count()
+        self.last_arrival = 0.0
+        self.closed = False
+        self.stats = {'sent': 0, 'lost': 0, 'delivered': 0, 'bytes': 0}
+        self.conditions = {}
+        self.configure(bandwidth=bandwidth, latency=latency, jitter=jitter, packet_loss=packet_loss,
+                       burst_length=burst_length, trace=trace, seed=seed, reorder=reorder, burst=burst)
+
+    def configure(self, **changes):
+        """更新链路参数，只修改给出的参数，其余保持不变；已在链路上的数据报按原定时刻到达
+
+        参数名同构造函数；给出 seed 时重新设置随机数
+        """
+        unknown = set(changes) - set(LINK_CONDITIONS)
+        if unknown:
+            raise TypeError(f"未知的链路参数: {', '.join(sorted(unknown))}")
+        with self.condition:
+            self.conditions.update(changes)
+            conditions = self.conditions
+            if 'seed' in changes:
+                self.rng = np.random.default_rng(conditions['seed'])
+            if changes.keys() & {'bandwidth', 'burst'}:
+                self.bucket = TokenBucket(conditions['bandwidth'] * 1000, conditions['burst'])
+            self.latency = conditions['latency'] / 1000
+            self.jitter = conditions['jitter'] / 1000
+            self.trace = conditions['trace']
+            self.reorder = conditions['reorder']
+            if changes.keys() & {'packet_loss', 'burst_length', 'seed'}:
+                if conditions['burst_length'] > 1:
+                    self.loss = GilbertElliottLoss.from_average(conditions['packet_loss'],
+                                                                conditions['burst_length'], self.rng)
+                else:
+                    self.loss = BernoulliLoss(conditions['packet_loss'], self.rng)
+
+    def transmit(self, datagram, block=True):
+        """发送一个数据报：阻塞到它离开链路，返回是否被丢弃"""
+        now = self.clock()
+        with self.condition:
+            departure = self.bucket.reserve(len(datagram), now)
+            if self.trace is not None:
+                delay, lost = self.trace.next()
+            else:
+                lost = self.loss.lost()
+                delay = self.latency + (self.rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+
+            self.stats['sent'] += 1
+            self.stats['bytes'] += len(datagram)
+            if lost:
+                self.stats['lost'] += 1
+            else:
+                arrival = departure + max(0.0, delay)
+                if not self.reorder:
+                    arrival = max(arrival, self.last_arrival)
+                self.last_arrival = arrival
+                heapq.heappush(self.in_flight, (arrival, next(self.counter), datagram))
+                self.condition.notify_all()
+
+        if block and departure > now:
+            self.sleep(departure - now)
+        return lost
+
+    def receive(self, timeout=None):
+        """等待下一个已到达的数据报，timeout 为 None 时一直阻塞；超时或链路已关闭时返回 None"""
+        deadline = None if timeout is None else self.clock() + timeout
+        with self.condition:
+            while not self.closed:
+                now = self.clock()
+                if self.in_flight and self.in_flight[0][0] <= now:
+                    self.stats['delivered'] += 1
+                    return heapq.heappop(self.in_flight)[2]
+                if deadline is not None and now >= deadline:
+                    return None
+                wait = None if deadline is None else deadline - now
+                if self.in_flight:
+                    arrival = self.in_flight[0][0] - now
+                    wait = arrival if wait is None else min(wait, arrival)
+                self.condition.wait(wait)
+            return None
+
+    def close(self):
+        """关闭链路，唤醒所有阻塞在 receive 中的线程"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def pending(self):
+        with self.condition:
+            return len(self.in_flight)
+
+
+class EmulatedTransport(Transport):
+    """仿真链路的一端：从 outgoing 发送，从 incoming 接收"""
+
+    def __init__(self, outgoing, incoming):
+        self.outgoing = outgoing
+        self.incoming = incoming
+
+    def send(self, datagram):
+        self.outgoing.transmit(datagram)
+
+    def receive(self, timeout=None):
+        return self.incoming.receive(timeout)
+
+    def close(self):
+        self.incoming.close()
+
+
+def emulated_pair(seed=None, **conditions):
+    """创建一对相连的仿真端点，两个方向各一条参数相同、随机数独立的链路"""
+    seeds = np.random.SeedSequence(seed).spawn(2)
+    forward = EmulatedLink(seed=seeds[0], **conditions)
+    backward = EmulatedLink(seed=seeds[1], **conditions)
+    return EmulatedTransport(forward, backward), EmulatedTransport(backward, forward)
+
+
+def emulated_loopback(seed=None, **conditions):
+    """发往自身的仿真端点，单个适配器即可测量链路的限速和延迟"""
+    link = EmulatedLink(seed=seed, **conditions)
+    return EmulatedTransport(link, link)
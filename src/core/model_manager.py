@@ -0,0 +1,117 @@
+"""
+姿态模型管理模块
+预先创建并预热 model_complexity 0/1/2 三个 MediaPipe Pose 实例，
+根据推理延迟的滚动 p95 与目标帧时间比较，带迟滞地在各复杂度之间切换
+"""
+
+import time
+from collections import deque
+from threading import Lock
+import numpy as np
+import mediapipe as mp
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_POSE_OPTIONS = {
+    'static_image_mode': False,
+    'smooth_landmarks': True,
+    'min_detection_confidence': 0.5,
+    'min_tracking_confidence': 0.5
+}
+
+
+class PoseModelManager:
+    """按延迟自动调整 model_complexity 的姿态模型
+
+    p95 超过 target_frame_time 时降一级；p95 低于 target_frame_time * upgrade_ratio 时升一级。
+    每次切换后清空统计窗口并等待 cooldown 帧，避免在两个级别之间来回切换。
+    can_upgrade 为返回 bool 的函数，返回 False 时不升级，用于与 ResolutionLadder 协调：
+    分辨率回到最高档之前保持当前复杂度。
+    提供与 MediaPipe Pose 相同的 process(image) 接口，可直接放入 ModelPool。
+    """
+
+    def __init__(self, levels=(0, 1, 2), initial=1, target_frame_time=1.0 / 30,
+                 window=30, upgrade_ratio=0.5, cooldown=60, warmup=True, pose_options=None,
+                 can_upgrade=None):
+        self.levels = sorted(levels)
+        self.target_frame_time = target_frame_time
+        self.upgrade_ratio = upgrade_ratio
+        self.cooldown = cooldown
+        self.latency_history = deque(maxlen=window)
+        self.frames_since_switch = 0
+        self.switch_count = 0
+        self.can_upgrade = can_upgrade
+        self.lock = Lock()
+
+        options = dict(DEFAULT_POSE_OPTIONS)
+        options.update(pose_options or {})
+        self.models = {}
+        for level in self.levels:
+            self.models[level] = mp.solutions.pose.Pose(model_complexity=level, **options)
+            if warmup:
+                self._warmup(self.models[level])
+
+        self.current_level = initial if initial in self.models else self.levels[-1]
+        logger.info(f"姿态模型已加载，复杂度 {self.levels}，当前 {self.current_level}")
+
+    def process(self, image):
+        """用当前复杂度的模型处理一帧，并更新延迟统计"""
+        with self.lock:
+            model = self.models[self.current_level]
+            start = time.perf_counter()
+            results = model.process(image)
+            self.record_latency(time.perf_counter() - start)
+        return results
+
+    def record_latency(self, latency):
+        """记录一次推理延迟(秒)，必要时切换复杂度"""
+        self.latency_history.append(latency)
+        self.frames_since_switch += 1
+        if (len(self.latency_history) < self.latency_history.maxlen
+                or self.frames_since_switch < self.cooldown):
+            return self.current_level
+
+        p95 = self.p95_latency()
+        index = self.levels.index(self.current_level)
+        if p95 > self.target_frame_time and index > 0:
+            self._switch(self.levels[index - 1], p95)
+        elif (p95 < self.target_frame_time * self.upgrade_ratio and index < len(self.levels) - 1
+                and (self.can_upgrade is None or self.can_upgrade())):
+            self._switch(self.levels[index + 1], p95)
+        return self.current_level
+
+    def p95_latency(self):
+        if not self.latency_history:
+            return 0.0
+        return float(np.percentile(self.latency_history, 95))
+
+    def get_status(self):
+        """获取当前复杂度和延迟状态"""
+        p95 = self.p95_latency()
+        return {
+            'model_complexity': self.current_level,
+            'p95_latency_ms': p95 * 1000,
+            'target_frame_time_ms': self.target_frame_time * 1000,
+            # 已降到最低复杂度仍然超时，说明主机已饱和
+            'saturated': self.current_level == self.levels[0] and p95 > self.target_frame_time,
+            'switch_count': self.switch_count
+        }
+
+    def close(self):
+        for model in self.models.values():
+            model.close()
+
+    def _switch(self, level, p95):
+        logger.info(f"姿态模型复杂度 {self.current_level} -> {level}，p95延迟 {p95 * 1000:.1f}ms")
+        self.current_level = level
+        self.latency_history.clear()
+        self.frames_since_switch = 0
+        self.switch_count += 1
+
+    @staticmethod
+    def _warmup(model):
+        """用空白帧预热，避免切换时首帧初始化耗时"""
+        blank = np.zeros((256, 256, 3), dtype=np.uint8)
+        blank.flags.writeable = False
+        model.process(blank)
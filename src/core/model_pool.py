@@ -0,0 +1,114 @@
+"""
+并发推理模块
+pose、hands、face_mesh 三个模型在线程池中并发处理同一帧，按帧ID汇合结果，
+并统计每个模型的推理延迟
+"""
+
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+import numpy as np
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class InferenceJob:
+    """一帧的并发推理任务，result() 等待所有模型完成后按模型名返回结果"""
+
+    def __init__(self, frame_id, futures, submit_time, on_done):
+        self.frame_id = frame_id
+        self.futures = futures
+        self.submit_time = submit_time
+        self.on_done = on_done
+        self.results = None
+
+    def result(self, timeout=None):
+        if self.results is None:
+            self.results = {name: future.result(timeout) for name, future in self.futures.items()}
+            self.on_done(time.perf_counter() - self.submit_time)
+        return self.results
+
+
+class ModelPool:
+    """多模型并发推理池
+
+    models: {名称: 带 process(image) 方法的模型}，例如 MediaPipe 的 Pose/Hands/FaceMesh。
+    concurrent=False 时退化为顺序执行，便于在单核机器上对比。
+    """
+
+    def __init__(self, models, max_workers=None, concurrent=True, latency_window=100):
+        self.models = dict(models)
+        self.concurrent = concurrent
+        self.max_workers = max_workers or len(self.models)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers) if concurrent else None
+
+        # MediaPipe 图不可重入：同一模型同一时刻只允许一个线程调用
+        self.model_locks = {name: Lock() for name in self.models}
+
+        # 延迟统计(秒)
+        self.latency_history = {name: deque(maxlen=latency_window) for name in self.models}
+        self.frame_latency_history = deque(maxlen=latency_window)
+
+    def _run_model(self, name, image):
+        """在工作线程中运行单个模型并记录延迟"""
+        with self.model_locks[name]:
+            start = time.perf_counter()
+            result = self.models[name].process(image)
+            self.latency_history[name].append(time.perf_counter() - start)
+        return result
+
+    def submit(self, frame_id, image):
+        """提交一帧，返回 InferenceJob"""
+        # 只读标记让 MediaPipe 直接引用而不复制输入图像
+        image.flags.writeable = False
+        submit_time = time.perf_counter()
+
+        if self.executor is None:
+            futures = {name: _CompletedFuture(self._run_model, name, image) for name in self.models}
+        else:
+            futures = {name: self.executor.submit(self._run_model, name, image) for name in self.models}
+
+        return InferenceJob(frame_id, futures, submit_time, self.frame_latency_history.append)
+
+    def process(self, frame_id, image):
+        """同步处理一帧，返回 {'frame_id': ..., 模型名: 结果, ...}"""
+        results = self.submit(frame_id, image).result()
+        results['frame_id'] = frame_id
+        return results
+
+    def get_latency_stats(self):
+        """获取各模型及整帧的延迟统计(毫秒)"""
+        stats = {name: _summarize(history) for name, history in self.latency_history.items()}
+        stats['frame'] = _summarize(self.frame_latency_history)
+        stats['concurrent'] = self.concurrent
+        stats['max_workers'] = self.max_workers if self.concurrent else 1
+        return stats
+
+    def shutdown(self):
+        """关闭线程池"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+
+class _CompletedFuture:
+    """顺序模式下立即执行的占位 Future"""
+
+    def __init__(self, fn, *args):
+        self._result = fn(*args)
+
+    def result(self, timeout=None):
+        return self._result
+
+
+def _summarize(history):
+    if not history:
+        return {'last': 0.0, 'mean': 0.0, 'p95': 0.0}
+    values = np.asarray(history) * 1000
+    return {
+        'last': float(values[-1]),
+        'mean': float(values.mean()),
+        'p95': float(np.percentile(values, 95))
+    }
@@ -0,0 +1,223 @@
+"""
+姿态基编码模块
+会议中的上身姿态集中在一个低维子空间里，逐点传输浪费了点与点之间的相关性。
+这里从录制的关键点序列离线拟合 PCA 姿态基，作为带版本号的文件两端各自加载；
+每帧只传输前 k 个主成分系数的量化值，k 按带宽预算选取。
+每帧独立解码，不依赖参考帧，丢包后下一帧即可恢复
+
+数据包格式：
+  头部 16 位与 EnhancedCompressor 相同，帧类型为 PCA_FRAME；
+    不使用的字典压缩标志和质量等级字段(共 4 位)存放姿态基标识，不占用系数的位数
+  系数个数 k(6) | k 个系数，各 coefficient_bits 位，量化范围为 ±COEFFICIENT_RANGE 倍标准差
+  姿态基标识由版本号和姿态基内容计算，与解码端加载的姿态基不一致时拒绝解码
+"""
+
+import struct
+import zlib
+import numpy as np
+from .bitstream import BitWriter, BitReader
+from .compression_enhanced import (EnhancedCompressor, FORMAT_VERSION, HEADER_BITS, FRAME_BITS,
+                                   PCA_FRAME, read_header)
+from .landmarks import POSE_LANDMARKS
+
+BASIS_MAGIC = b'MSPCA'
+HEADER_FORMAT = '>5sHHHI'  # 魔数 | 姿态基版本 | 点数 P | 主成分数 K | 数据的 CRC32
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+COMPONENT_BITS = 6
+TAG_BITS = HEADER_BITS[1] + HEADER_BITS[3]
+MAX_COMPONENTS = (1 << COMPONENT_BITS) - 1
+
+# 系数量化范围(标准差的倍数)，超出的系数截断
+COEFFICIENT_RANGE = 4.0
+
+
+class PoseBasis:
+    """PCA 姿态基：indices 指定的点的 (x, y) 展平为 2P 维向量
+
+    mean 为 (2P,) 均值，components 为 (K, 2P) 按方差从大到小排列的主成分，
+    scales 为 (K,) 各主成分系数的标准差
+    """
+
+    def __init__(self, indices, mean, components, scales, version=1):
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+        self.scales = np.asarray(scales, dtype=np.float32)
+        self.version = version
+        # 数据包中的姿态基标识：版本号和按文件格式序列化的内容的 CRC32 低 TAG_BITS 位
+        content = b''.join([self.indices.astype(np.uint8).tobytes()] +
+                           [values.astype('>f4').tobytes() for values in (self.mean, self.components, self.scales)])
+        self.tag = zlib.crc32(struct.pack('>H', version), zlib.crc32(content)) & ((1 << TAG_BITS) - 1)
+
+    def __len__(self):
+        return len(self.components)
+
+    def project(self, coords):
+        """(..., P, 2) 坐标投影为 (..., K) 系数"""
+        flat = np.asarray(coords, dtype=np.float32).reshape(coords.shape[:-2] + (-1,))
+        return (flat - self.mean) @ self.components.T
+
+    def reconstruct(self, coefficients):
+        """用前 len(coefficients) 个主成分还原 (P, 2) 坐标"""
+        k = coefficients.shape[-1]
+        flat = self.mean + coefficients @ self.components[:k]
+        return flat.reshape(coefficients.shape[:-1] + (len(self.indices), 2))
+
+
+def train_basis(frames, indices, components=16, version=1):
+    """从 (T, 33, 4) 关键点序列拟合姿态基，indices 中任一点含 NaN 的帧跳过"""
+    indices = np.asarray(indices, dtype=np.int64)
+    coords = np.asarray(frames, dtype=np.float32)[:, indices, :2]
+    coords = coords[~np.isnan(coords).any(axis=(1, 2))]
+    if len(coords) < 2:
+        raise ValueError("有效帧不足，无法拟合姿态基")
+
+    data = coords.reshape(len(coords), -1).astype(np.float64)
+    mean = data.mean(axis=0)
+    _, singular, vt = np.linalg.svd(data - mean, full_matrices=False)
+    components = min(components, len(singular), MAX_COMPONENTS)
+    scales = singular[:components] / np.sqrt(len(data))
+    return PoseBasis(indices, mean, vt[:components], scales, version)
+
+
+def save_basis(path, basis):
+    body = b''.join([
+        basis.indices.astype(np.uint8).tobytes(),
+        basis.mean.astype('>f4').tobytes(),
+        basis.components.astype('>f4').tobytes(),
+        basis.scales.astype('>f4').tobytes()
+    ])
+    with open(path, 'wb') as f:
+        f.write(struct.pack(HEADER_FORMAT, BASIS_MAGIC, basis.version, len(basis.indices),
+                            len(basis), zlib.crc32(body)))
+        f.write(body)
+
+
+def load_basis(path):
+    """读取姿态基文件，返回 PoseBasis"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    if len(content) < HEADER_SIZE:
+        raise ValueError(f"姿态基文件不完整: {path}")
+    magic, version, num_points, components, checksum = struct.unpack(HEADER_FORMAT, content[:HEADER_SIZE])
+    body = content[HEADER_SIZE:]
+    if magic != BASIS_MAGIC:
+        raise ValueError(f"不是姿态基文件: {path}")
+    dims = num_points * 2
+    if len(body) != num_points + 4 * (dims + components * dims + components) or zlib.crc32(body) != checksum:
+        raise ValueError(f"姿态基文件校验失败: {path}")
+
+    indices = np.frombuffer(body, dtype=np.uint8, count=num_points)
+    values = np.frombuffer(body, dtype='>f4', offset=num_points).astype(np.float32)
+    mean = values[:dims]
+    basis = values[dims:dims + components * dims].reshape(components, dims)
+    scales = values[dims + components * dims:]
+    return PoseBasis(indices, mean, basis, scales, version)
+
+
+class PCACodec:
+    """按姿态基编码单帧关键点，接口与 EnhancedCompressor 的 compress/decompress 相同
+
+    两端必须加载同一版本的姿态基。fps 用于把带宽预算(Kbps)换算为每帧位数
+    """
+
+    def __init__(self, basis, coefficient_bits=6, fps=5):
+        self.basis = basis
+        self.coefficient_bits = coefficient_bits
+        self.fps = fps
+        self.bandwidth_budget = 0.2
+        self.components = len(basis)
+        self.frame_count = 0
+
+        # 各主成分的量化步长，量化值为 [0, 2^bits - 1] 的无符号整数
+        self.levels = (1 << coefficient_bits) - 1
+        self.limits = COEFFICIENT_RANGE * np.maximum(self.basis.scales, 1e-6)
+        self.steps = 2 * self.limits / self.levels
+
+    def compress(self, keypoints, bandwidth=None):
+        """返回二进制数据包，姿态基覆盖的点缺失(NaN)时返回 None"""
+        if keypoints is None:
+            return None
+        coords = np.asarray(keypoints, dtype=np.float32)[self.basis.indices, :2]
+        if np.isnan(coords).any():
+            return None
+
+        if bandwidth:
+            self.bandwidth_budget = bandwidth
+            self.components = self.components_for_budget(bandwidth)
+        self.frame_count += 1
+
+        k = self.components
+        coefficients = self.basis.project(coords)[:k]
+        quantized = np.clip(np.round((coefficients + self.limits[:k]) / self.steps[:k]), 0, self.levels)
+
+        writer = BitWriter()
+        tag_high, tag_low = divmod(self.basis.tag, 1 << HEADER_BITS[3])
+        frame = self.frame_count & ((1 << FRAME_BITS) - 1)
+        writer.write_array([FORMAT_VERSION, tag_high, PCA_FRAME, tag_low, frame], HEADER_BITS)
+        writer.write(k, COMPONENT_BITS)
+        writer.write_array(quantized.astype(np.int64), self.coefficient_bits)
+        return writer.to_bytes()
+
+    def decompress(self, compressed_data):
+        """解压数据包，返回 (33, 4) 关键点，姿态基以外的点为 NaN，覆盖的点按可见处理；无法解码时返回 None"""
+        try:
+            version, tag_high, frame_type, tag_low, _ = read_header(compressed_data)
+            if version != FORMAT_VERSION or frame_type != PCA_FRAME:
+                raise ValueError(f"不是姿态基数据包: 版本 {version}, 帧类型 {frame_type}")
+            if (tag_high << HEADER_BITS[3]) | tag_low != self.basis.tag:
+                raise ValueError("数据包的姿态基与本端加载的姿态基版本不一致")
+
+            reader = BitReader(compressed_data)
+            reader.position = sum(HEADER_BITS)
+            k = reader.read(COMPONENT_BITS)
+            if k > len(self.basis):
+                raise ValueError(f"系数个数 {k} 超出姿态基的主成分数 {len(self.basis)}")
+            quantized = reader.read_array(k, self.coefficient_bits)
+            coefficients = quantized * self.steps[:k] - self.limits[:k]
+
+            keypoints = np.full((POSE_LANDMARKS, 4), np.nan, dtype=np.float32)
+            keypoints[self.basis.indices, :2] = self.basis.reconstruct(coefficients.astype(np.float32))
+            keypoints[self.basis.indices, 2] = 0.0
+            keypoints[self.basis.indices, 3] = 1.0
+            return keypoints
+
+        except Exception as e:
+            print(f"解压错误: {e}")
+            return None
+
+    def components_for_budget(self, bandwidth):
+        """带宽预算(Kbps)下每帧能传输的系数个数，至少 1 个"""
+        budget = int(bandwidth * 1000 / self.fps) // 8 * 8
+        available = (budget - sum(HEADER_BITS) - COMPONENT_BITS) // self.coefficient_bits
+        return int(np.clip(available, 1, len(self.basis)))
+
+
+def compare_with_pointwise(frames, basis, quality='medium', bandwidth=None, fps=5, coefficient_bits=6):
+    """在录制的 (T, 33, 4) 序列上比较姿态基编码与逐点编码的每帧位数和重建误差
+
+    逐点编码固定使用 quality 等级；误差为姿态基覆盖且逐点编码也传输的点上坐标的平均绝对误差
+    """
+    codec = PCACodec(basis, coefficient_bits, fps)
+    if bandwidth:
+        codec.components = codec.components_for_budget(bandwidth)
+    pointwise = EnhancedCompressor()
+    pointwise_decoder = EnhancedCompressor()
+    pointwise.current_quality = quality
+    common = np.intersect1d(basis.indices, pointwise.quality_indices[quality])
+
+    result = {'pca_bits': [], 'pca_error': [], 'pointwise_bits': [], 'pointwise_error': []}
+    for keypoints in frames:
+        if np.isnan(keypoints).any():
+            continue
+        for name, encoder, decoder in (('pca', codec, codec), ('pointwise', pointwise, pointwise_decoder)):
+            packet = encoder.compress(keypoints)
+            decoded = decoder.decompress(packet)
+            result[f'{name}_bits'].append(len(packet) * 8)
+            result[f'{name}_error'].append(np.abs(decoded[common, :2] - keypoints[common, :2]).mean())
+
+    summary = {key: float(np.mean(values)) if values else 0.0 for key, values in result.items()}
+    summary['frames'] = len(result['pca_bits'])
+    summary['components'] = codec.components
+    return summary
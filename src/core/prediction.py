@@ -0,0 +1,169 @@
+"""
+运动预测模块
+差分编码的预测器：输入每帧重建后的关键点坐标 (N, 2)，预测下一帧坐标。
+编码端和解码端各持有一个实例，只用重建值更新，两端的预测结果逐位一致。
+未传输的点以 NaN 表示，对应的滤波器会被重置，重新出现后从头初始化
+"""
+
+import numpy as np
+
+
+class MotionHistory:
+    """重建坐标的环形缓冲，保存最近 size 帧全部关键点的 (x, y)，未传输的点为 NaN"""
+
+    def __init__(self, size=10, points=None):
+        self.size = size
+        self.frames = None if points is None else np.full((size, points, 2), np.nan, dtype=np.float32)
+        self.count = 0
+        self.head = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, points):
+        if self.frames is None or self.frames.shape[1:] != points.shape:
+            self.frames = np.full((self.size,) + points.shape, np.nan, dtype=np.float32)
+            self.count = self.head = 0
+        self.frames[self.head] = points
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def clear(self):
+        self.count = 0
+
+    def recent(self, n):
+        """按时间顺序返回最近 n 帧 (n, points, 2)"""
+        n = min(n, self.count)
+        if n == 0:
+            return np.empty((0, 0, 2), dtype=np.float32)
+        return self.frames[(self.head - n + np.arange(n)) % self.size]
+
+
+class LinearPredictor:
+    """两帧线性外推"""
+
+    order = 2
+
+    def __init__(self):
+        self.history = MotionHistory(self.order)
+
+    def reset(self):
+        self.history.clear()
+
+    def update(self, points):
+        self.history.append(np.asarray(points, dtype=np.float32))
+
+    def predict(self):
+        """预测下一帧坐标，没有历史时返回 None"""
+        recent = self.history.recent(self.order)
+        if len(recent) == 0:
+            return None
+        if len(recent) == 1:
+            return recent[-1].copy()
+        return recent[-1] + (recent[-1] - recent[-2])
+
+
+class QuadraticPredictor(LinearPredictor):
+    """三帧二次外推，历史不足时退化为线性外推"""
+
+    order = 3
+
+    def predict(self):
+        recent = self.history.recent(self.order)
+        if len(recent) < 3:
+            return super().predict()
+        velocities = np.diff(recent, axis=0)
+        acceleration = velocities[-1] - velocities[-2]
+        return recent[-1] + velocities[-1] + 0.5 * acceleration
+
+
+class KalmanPredictor:
+    """每个关键点坐标一个卡尔曼滤波器，全部滤波器按数组批量更新
+
+    model='velocity' 为匀速模型，状态 [位置, 速度]；model='acceleration' 为匀加速模型，
+    状态 [位置, 速度, 加速度]。过程噪声按离散白噪声加速度模型取 q * G G^T。
+    measurement_noise 与 process_noise 为标准差（归一化坐标，单位时间为一帧）；
+    关键点抖动远大于真实运动时，滤波器会平滑抖动，避免二次外推把抖动放大成残差
+    """
+
+    def __init__(self, model='velocity', process_noise=0.002, measurement_noise=0.004):
+        if model == 'velocity':
+            self.F = np.array([[1.0, 1.0], [0.0, 1.0]])
+            G = np.array([0.5, 1.0])
+        elif model == 'acceleration':
+            self.F = np.array([[1.0, 1.0, 0.5], [0.0, 1.0, 1.0], [0.0, 0.0, 1.0]])
+            G = np.array([1.0 / 6, 0.5, 1.0])
+        else:
+            raise ValueError(f"未知的运动模型: {model}")
+        self.Q = np.outer(G, G) * process_noise ** 2
+        self.R = measurement_noise ** 2
+        self.state = None        # (n, k)
+        self.covariance = None   # (n, k, k)
+        self.active = None       # (n,) 已初始化的滤波器
+
+    def reset(self):
+        self.state = None
+
+    def update(self, points):
+        """用一帧重建坐标更新全部滤波器"""
+        points = np.asarray(points, dtype=np.float64)
+        shape = points.shape
+        z = points.reshape(-1)
+        if self.state is None or self.shape != shape:
+            self._allocate(shape)
+
+        measured = ~np.isnan(z)
+        active = self.active & measured
+        if active.any():
+            # 预测一步
+            x = self.state[active] @ self.F.T
+            P = self.F @ self.covariance[active] @ self.F.T + self.Q
+            # 用观测修正，观测矩阵 H = [1, 0, ...]
+            innovation = z[active] - x[:, 0]
+            gain = P[:, :, 0] / (P[:, 0, 0] + self.R)[:, None]
+            self.state[active] = x + gain * innovation[:, None]
+            self.covariance[active] = P - gain[:, :, None] * P[:, None, 0, :]
+
+        # 新出现的点从观测值开始，速度未知
+        starting = measured & ~self.active
+        if starting.any():
+            self.state[starting] = 0.0
+            self.state[starting, 0] = z[starting]
+            self.covariance[starting] = self._initial_covariance
+
+        self.active = measured
+
+    def predict(self):
+        """预测下一帧坐标 (N, 2)，未初始化的点为 NaN，没有任何数据时返回 None"""
+        if self.state is None:
+            return None
+        position = self.state @ self.F[0]
+        position[~self.active] = np.nan
+        return position.reshape(self.shape)
+
+    def _allocate(self, shape):
+        n = int(np.prod(shape))
+        k = len(self.F)
+        self.shape = shape
+        self.state = np.zeros((n, k))
+        self.covariance = np.zeros((n, k, k))
+        self.active = np.zeros(n, dtype=bool)
+        # 初始位置误差为观测噪声，速度、加速度未知，取较大的不确定度
+        self._initial_covariance = np.diag([self.R, 0.01 ** 2, 0.005 ** 2][:k])
+
+
+PREDICTORS = {
+    'linear': LinearPredictor,
+    'quadratic': QuadraticPredictor,
+    'kalman': KalmanPredictor,
+    'kalman_acceleration': lambda: KalmanPredictor(model='acceleration')
+}
+
+
+def make_predictor(spec):
+    """按名称或工厂函数创建预测器；编码端和解码端必须使用相同的配置"""
+    if callable(spec):
+        return spec()
+    if spec not in PREDICTORS:
+        raise ValueError(f"未知的预测器: {spec}")
+    return PREDICTORS[spec]()
@@ -0,0 +1,128 @@
+"""
+率失真码率控制模块
+固定带宽阈值选等级、按帧号取模发关键帧都不看实际花掉的位数，码率时高时低。
+这里每帧对候选方案(各质量等级的关键帧，以及当前等级的差分帧)逐一试编码，
+得到真实的位数和重建误差，在漏桶允许的位数内选 失真 + λ·位数 最小的方案。
+λ 按漏桶水位积分调节：水位高于目标时加大、低于目标时减小，长期平均码率收敛到链路速率
+"""
+
+import math
+import numpy as np
+
+# 分组权重：失真按权重加权，优先保证面部和肩部
+GROUP_WEIGHTS = {
+    'face_core': 1.0,
+    'face_detail': 0.6,
+    'upper_core': 0.8,
+    'upper_detail': 0.5,
+    'hands': 0.4,
+    'lower_body': 0.2
+}
+
+# 未传输的点按固定误差(归一化坐标)计入失真
+MISSING_ERROR = 0.05
+
+# 漏桶目标水位(占容量的比例)和 λ 的积分增益
+TARGET_FULLNESS = 0.5
+LAMBDA_GAIN = 0.5
+
+# log λ 的积分范围(抗饱和)：链路速率低于最小数据包时水位一直偏高，不设上限 λ 会无限增大直至溢出；
+# 速率很高时一直偏低，不设下限 λ 趋于 0，速率回落后要很多帧才能回到正常范围。
+# 上限处每位的代价已超过任何失真，下限处位数几乎不计代价
+LOG_LAMBDA_RANGE = (math.log(1e-9), math.log(1e2))
+
+
+class LeakyBucket:
+    """按帧结算的漏桶：每帧流出 rate 位，水位在 0 到容量之间，容量以外的位数会溢出链路缓冲"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = 0.0
+
+    @property
+    def fullness(self):
+        return self.level / self.capacity
+
+    def allowance(self):
+        """本帧最多还能发送的位数"""
+        return self.capacity - self.level + self.rate
+
+    def add(self, bits):
+        self.level = min(self.capacity, max(0.0, self.level + bits - self.rate))
+
+
+class RateController:
+    """为 EnhancedEncoder 逐帧选择质量等级和帧类型
+
+    rate 为链路速率(Kbps)，fps 为发送帧率，buffer_seconds 为漏桶容量(秒)。
+    关键帧间隔不超过质量等级的 keyframe_interval，保证丢包后能恢复
+    """
+
+    def __init__(self, rate=0.2, fps=5, buffer_seconds=2.0, group_weights=None):
+        self.fps = fps
+        self.buffer_seconds = buffer_seconds
+        self.group_weights = group_weights or GROUP_WEIGHTS
+        self.log_lambda = math.log(1e-6)
+        self.point_weights = None
+        self.bucket = None
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        """更新链路速率，保留当前水位"""
+        level = self.bucket.level if self.bucket else 0.0
+        per_frame = rate * 1000 / self.fps
+        self.bucket = LeakyBucket(per_frame, max(per_frame, per_frame * self.fps * self.buffer_seconds))
+        self.bucket.level = min(level, self.bucket.capacity)
+
+    @property
+    def lagrangian(self):
+        return math.exp(self.log_lambda)
+
+    def select(self, compressor, keypoints):
+        """试编码全部候选方案，返回 (质量等级, 帧类型, 位流, 重建后的关键点)"""
+        if self.point_weights is None:
+            self.point_weights = np.array([self.group_weights[name] for name in compressor.keypoints_priority])[
+                compressor.group_ids]
+
+        candidates = []
+        for quality in compressor.quality_levels:
+            frame_type, payload, reconstructed = compressor._encode_frame(keypoints, quality, True)
+            candidates.append((quality, frame_type, payload, reconstructed))
+            if not self._keyframe_due(compressor, quality):
+                frame_type, payload, reconstructed = compressor._encode_frame(keypoints, quality, False)
+                candidates.append((quality, frame_type, payload, reconstructed))
+
+        allowance = self.bucket.allowance()
+        lagrangian = self.lagrangian
+        best, best_cost = None, None
+        for candidate in candidates:
+            quality, frame_type, payload, reconstructed = candidate
+            bits = len(compressor._pack_data(frame_type, payload, quality)) * 8
+            # 超出漏桶的方案只在没有任何方案放得下时按位数最少选取
+            if bits > allowance:
+                cost = (1, bits)
+            else:
+                cost = (0, self.distortion(reconstructed, keypoints) + lagrangian * bits)
+            if best_cost is None or cost < best_cost:
+                best, best_cost, best_bits = candidate, cost, bits
+
+        self.bucket.add(best_bits)
+        self.log_lambda = min(max(self.log_lambda + LAMBDA_GAIN * (self.bucket.fullness - TARGET_FULLNESS),
+                                  LOG_LAMBDA_RANGE[0]), LOG_LAMBDA_RANGE[1])
+        return best
+
+    def distortion(self, reconstructed, keypoints):
+        """加权平方误差，未传输的点按 MISSING_ERROR 计"""
+        error = np.square(reconstructed[:, :2] - keypoints[:, :2]).sum(axis=1)
+        error = np.where(np.isnan(error), 2 * MISSING_ERROR ** 2, error)
+        return float(np.dot(self.point_weights, error))
+
+    @staticmethod
+    def _keyframe_due(compressor, quality):
+        """该等级是否只能发关键帧：没有参考帧、等级变化、解码端请求了关键帧或距上个关键帧已满间隔"""
+        if (compressor.last_reconstructed is None or quality != compressor.last_quality
+                or compressor.force_keyframe):
+            return True
+        interval = compressor.quality_levels[quality]['keyframe_interval']
+        return compressor.frame_count - compressor.keyframe_count >= interval
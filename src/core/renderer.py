@@ -0,0 +1,260 @@
+"""
+叠加层绘制模块
+关键点先转换为 NumPy 数组，连接关系预先去重为边索引数组，颜色按点预先查表，
+绘制时按颜色/线宽分组批量调用 cv2.polylines，关键点用数组运算一次性写入
+"""
+
+import cv2
+import numpy as np
+import mediapipe as mp
+
+VISIBILITY_THRESHOLD = 0.5
+
+# 定义上半身的连接关系
+POSE_CONNECTIONS = [
+    # 面部关键点
+    (0, 1), (1, 2), (2, 3), (3, 4),    # 左侧面部
+    (0, 4), (4, 5), (5, 6), (6, 7),    # 右侧面部
+    (8, 9), (9, 10),                    # 嘴部
+    (0, 5),                             # 眉心连接
+    (2, 5),                             # 鼻梁
+    (3, 6),                             # 眼睛连接
+
+    # 身体关键点
+    (11, 12),                           # 肩膀连接
+    (11, 13), (13, 15),                 # 左臂
+    (12, 14), (14, 16),                 # 右臂
+
+    # 手指连接
+    (15, 17), (17, 19), (19, 21),       # 左手
+    (16, 18), (18, 20), (20, 22),       # 右手
+
+    # 躯干
+    (11, 23), (12, 24), (23, 24)        # 上身躯干
+]
+
+# 更新关键点列表
+UPPER_BODY_POINTS = list(range(25))
+
+# 定义面部关键连接，更详细的版本
+FACE_CONNECTIONS = [
+    # 眉毛
+    [70, 63, 105, 66, 107, 55, 65],                     # 左眉
+    [336, 296, 334, 293, 300, 285, 295],                # 右眉
+
+    # 眼睛
+    [33, 246, 161, 160, 159, 158, 157, 173, 133],       # 左眼
+    [362, 398, 384, 385, 386, 387, 388, 466, 263],      # 右眼
+
+    # 鼻子
+    [168, 6, 197, 195, 5],                              # 鼻梁
+    [198, 209, 49, 48, 219],                            # 鼻翼左
+    [420, 432, 279, 278, 438],                          # 鼻翼右
+
+    # 嘴唇
+    [61, 185, 40, 39, 37, 0, 267, 269, 270, 409, 291],  # 上唇
+    [146, 91, 181, 84, 17, 314, 405, 321, 375, 291],    # 下唇
+
+    # 面部轮廓关键点
+    [10, 338, 297, 332, 284],                           # 左脸
+    [454, 323, 361, 288, 397],                          # 右脸
+    [152, 148, 176],                                    # 下巴
+]
+
+# 手指关键点组与指关节横向连接
+HAND_FINGERS = [
+    [4, 3, 2, 1],     # 拇指
+    [8, 7, 6, 5],     # 食指
+    [12, 11, 10, 9],  # 中指
+    [16, 15, 14, 13], # 无名指
+    [20, 19, 18, 17]  # 小指
+]
+HAND_KNUCKLES = [5, 9, 13, 17]
+
+HIGHLIGHT_COLOR = (0, 255, 255)  # 黄色
+MEDIAPIPE_WHITE = (224, 224, 224)
+FACE_MESH_POINTS = 468
+
+
+def _unique_edges(connections):
+    """去掉重复的连接，保持首次出现的顺序"""
+    edges = []
+    seen = set()
+    for a, b in connections:
+        key = (min(a, b), max(a, b))
+        if key not in seen:
+            seen.add(key)
+            edges.append((a, b))
+    return np.array(edges, dtype=np.intp).reshape(-1, 2)
+
+
+def _range_lut(size, ranges, default):
+    """按索引区间生成每个点的颜色查找表"""
+    lut = np.empty((size, 3), dtype=np.uint8)
+    lut[:] = default
+    for start, stop, color in ranges:
+        lut[start:stop] = color
+    return lut
+
+
+class OverlayRenderer:
+    """批量绘制姿态、手部和面部叠加层"""
+
+    def __init__(self):
+        self._disk_cache = {}
+
+        # 姿态：连接按颜色/线宽分组，关键点按半径分组
+        pose_edges = _unique_edges(POSE_CONNECTIONS)
+        self.pose_edge_groups = []
+        for color, thickness, mask in [
+            ((255, 0, 0), 1, pose_edges[:, 0] <= 10),                                  # 面部连接：蓝色
+            (HIGHLIGHT_COLOR, 1, (pose_edges[:, 0] >= 15) & (pose_edges[:, 0] <= 22)),  # 手指连接：黄色
+            ((0, 255, 0), 2, (pose_edges[:, 0] > 10) & ((pose_edges[:, 0] < 15) | (pose_edges[:, 0] > 22)))  # 其他：绿色
+        ]:
+            self.pose_edge_groups.append((pose_edges[mask], color, thickness))
+
+        points = np.array(UPPER_BODY_POINTS, dtype=np.intp)
+        self.pose_point_colors = _range_lut(33, [
+            (0, 11, (255, 0, 0)),      # 面部关键点：蓝色
+            (11, 17, (0, 0, 255)),     # 手臂关键点：红色
+            (17, 33, HIGHLIGHT_COLOR)  # 手部及躯干关键点：黄色
+        ], (255, 255, 0))
+        # 实心圆 + 外圈(半径+1) 等价于半径+1 的实心圆
+        self.pose_point_groups = [
+            (points[(points >= 11) & (points <= 16)], 4),
+            (points[(points < 11) | (points > 16)], 3)
+        ]
+
+        # 手部：沿用 MediaPipe 默认样式，换成边索引数组和颜色查找表
+        mp_hands = mp.solutions.hands
+        styles = mp.solutions.drawing_styles
+        connection_style = styles.get_default_hand_connections_style()
+        groups = {}
+        for a, b in _unique_edges(sorted(mp_hands.HAND_CONNECTIONS)):
+            spec = connection_style.get((a, b)) or connection_style.get((b, a))
+            groups.setdefault((tuple(spec.color), spec.thickness), []).append((a, b))
+        self.hand_edge_groups = [(np.array(edges, dtype=np.intp), color, thickness)
+                                 for (color, thickness), edges in groups.items()]
+
+        landmark_style = styles.get_default_hand_landmarks_style()
+        self.hand_point_colors = np.zeros((21, 3), dtype=np.uint8)
+        radius = 0
+        for idx, spec in landmark_style.items():
+            self.hand_point_colors[int(idx)] = spec.color
+            radius = spec.circle_radius
+        self.hand_point_radius = radius
+        self.hand_border_radius = max(radius + 1, int(radius * 1.2))
+
+        self.finger_edges = _unique_edges(
+            [(f[i], f[i + 1]) for f in HAND_FINGERS for i in range(len(f) - 1)])
+        self.finger_joints = np.unique(self.finger_edges)
+        self.knuckle_edges = _unique_edges(zip(HAND_KNUCKLES[:-1], HAND_KNUCKLES[1:]))
+
+        # 面部：所有网格点按区间查表，主要特征线按颜色分组
+        self.face_point_colors = _range_lut(FACE_MESH_POINTS, [
+            (0, 68, (200, 180, 130)),    # 轮廓点：淡金色
+            (68, 136, (180, 120, 90)),   # 眉毛点：深棕色
+            (136, 204, (120, 150, 230)), # 眼睛点：淡蓝色
+            (204, 272, (150, 200, 180))  # 鼻子点：青绿色
+        ], (140, 160, 210))              # 嘴唇和其他点：淡紫色
+        self.face_feature_colors = _range_lut(FACE_MESH_POINTS, [
+            (68, 136, (160, 140, 110)),  # 眉毛：深金色
+            (136, 204, (130, 160, 220)), # 眼睛：天蓝色
+            (204, 272, (140, 190, 170)), # 鼻子：青色
+            (273, FACE_MESH_POINTS, (170, 150, 200))  # 嘴唇：淡紫色
+        ], (190, 170, 120))              # 轮廓：金棕色
+
+        self.face_feature_points = np.unique(np.concatenate(FACE_CONNECTIONS))
+        groups = {}
+        for points in FACE_CONNECTIONS:
+            # 连接线颜色取该组最后一个点的特征颜色
+            color = tuple(int(c) for c in self.face_feature_colors[points[-1]])
+            groups.setdefault(color, []).append(np.array(points, dtype=np.intp))
+        self.face_line_groups = list(groups.items())
+
+    def draw(self, frame, pose=None, hands=(), faces=()):
+        """绘制一帧的全部叠加层，参数均为归一化坐标的 (N, 4) 数组"""
+        if pose is not None:
+            self.draw_pose(frame, pose)
+        for hand in hands:
+            self.draw_hand(frame, hand)
+        for face in faces:
+            self.draw_face(frame, face)
+        return frame
+
+    def draw_pose(self, frame, landmarks):
+        """绘制上半身姿态"""
+        xy = self._to_pixels(frame, landmarks)
+        visible = landmarks[:, 3] > VISIBILITY_THRESHOLD
+
+        for edges, color, thickness in self.pose_edge_groups:
+            edges = edges[visible[edges].all(axis=1)]
+            self._draw_segments(frame, xy, edges, color, thickness)
+
+        for points, radius in self.pose_point_groups:
+            points = points[visible[points]]
+            self._stamp_disks(frame, xy[points], self.pose_point_colors[points], radius)
+
+    def draw_hand(self, frame, landmarks):
+        """绘制手部：默认样式 + 手指高亮"""
+        xy = self._to_pixels(frame, landmarks)
+
+        for edges, color, thickness in self.hand_edge_groups:
+            self._draw_segments(frame, xy, edges, color, thickness)
+
+        white = np.broadcast_to(np.array(MEDIAPIPE_WHITE, dtype=np.uint8), (len(xy), 3))
+        self._stamp_disks(frame, xy, white, self.hand_border_radius)
+        self._stamp_disks(frame, xy, self.hand_point_colors, self.hand_point_radius)
+
+        # 自定义手指连接线和关节点
+        self._draw_segments(frame, xy, self.finger_edges, HIGHLIGHT_COLOR, 2)
+        highlight = np.broadcast_to(np.array(HIGHLIGHT_COLOR, dtype=np.uint8), (len(self.finger_joints), 3))
+        self._stamp_disks(frame, xy[self.finger_joints], highlight, 3)
+        self._draw_segments(frame, xy, self.knuckle_edges, HIGHLIGHT_COLOR, 1)
+
+    def draw_face(self, frame, landmarks):
+        """绘制面部网格点和主要特征线"""
+        xy = self._to_pixels(frame, landmarks[:FACE_MESH_POINTS])
+
+        self._stamp_disks(frame, xy, self.face_point_colors[:len(xy)], 1)
+
+        for color, polylines in self.face_line_groups:
+            cv2.polylines(frame, [xy[points] for points in polylines], False, color, 1)
+
+        points = self.face_feature_points
+        self._stamp_disks(frame, xy[points], self.face_feature_colors[points], 2)
+
+    @staticmethod
+    def _to_pixels(frame, landmarks):
+        h, w = frame.shape[:2]
+        return (landmarks[:, :2] * np.array([w, h], dtype=np.float32)).astype(np.int32)
+
+    @staticmethod
+    def _draw_segments(frame, xy, edges, color, thickness):
+        """一次调用绘制一组线段"""
+        if len(edges):
+            cv2.polylines(frame, xy[edges], False, color, thickness)
+
+    def _disk_offsets(self, radius):
+        offsets = self._disk_cache.get(radius)
+        if offsets is None:
+            r = np.arange(-radius, radius + 1)
+            dx, dy = np.meshgrid(r, r)
+            mask = dx * dx + dy * dy <= radius * radius
+            offsets = np.stack([dx[mask], dy[mask]], axis=1).astype(np.int32)
+            self._disk_cache[radius] = offsets
+        return offsets
+
+    def _stamp_disks(self, frame, xy, colors, radius):
+        """用数组运算一次性绘制一批实心圆点"""
+        if not len(xy):
+            return
+        offsets = self._disk_offsets(radius)
+        pixels = (xy[:, None, :] + offsets[None, :, :]).reshape(-1, 2)
+        colors = np.repeat(colors, len(offsets), axis=0)
+
+        h, w = frame.shape[:2]
+        x, y = pixels[:, 0], pixels[:, 1]
+        inside = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+        # 按行列下标写入：frame 可能是不连续的切片(ROI)，reshape 会得到副本而不是视图
+        frame[y[inside], x[inside]] = colors[inside]
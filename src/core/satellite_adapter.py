@@ -1,14 +1,30 @@
 import time
 import queue
-from threading import Thread, Lock
+import asyncio
+from threading import Thread, Lock, Condition
 from collections import deque
 import numpy as np
+from .fec import FECEncoder, FECDecoder
+from .inflight import InFlightTable
+from .link_emulator import EmulatedTransport, emulated_loopback
+from .transport import DATA, ACK, PARITY, pack_datagram, unpack_datagram
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 丢包率滑动平均的权重
+LOSS_SMOOTHING = 0.1
+
+# 未配置链路容量时按投递速率的倍数发送，多出的部分用来探测更高的可用带宽；
+# 发送速率不低于 MIN_PACING_RATE(位/秒)
+PACING_GAIN = 1.25
+MIN_PACING_RATE = 2000
+
+# 确认包载荷：数据包由前向纠错恢复
+RECOVERED = b'\x01'
+
 class SatelliteAdapter:
-    def __init__(self):
+    def __init__(self, transport=None, max_retries=3, fec=None, rate=None):
         # 卫星链路参数
         self.min_latency = 0.3  # 最小延迟300ms
         self.max_latency = 0.5  # 最大延迟500ms
@@ -18,73 +34,115 @@ class SatelliteAdapter:
         # 数据缓冲和重传
         self.send_buffer = queue.PriorityQueue()
         self.recv_buffer = deque(maxlen=300)  # 300帧缓冲
-        self.pending_acks = {}  # 等待确认的数据包
+        self.pending_acks = InFlightTable()  # 等待确认的数据包，按发送时刻排序，有容量上限
         self.sequence_number = 0
         self.last_received_seq = -1
+        self.max_retries = max_retries  # 每个数据包最多重传次数
+        self.retransmissions = 0
+        self.dropped_packets = 0  # 重传次数用尽仍未确认的数据包
+        self.received_seqs = deque(maxlen=1024)  # 最近收到的序号，用于丢弃重复数据包
+
+        # 前向纠错：fec 为 'xor'、'rs' 或 FECEncoder 实例，None 时不发校验包；接收端总能处理校验包
+        self.fec = FECEncoder(fec) if isinstance(fec, str) else fec
+        self.fec_decoder = FECDecoder()
         
         # 状态监控
         self.link_quality = 1.0
-        self.bandwidth_estimate = 4000  # 初始估计4Kbps
+        # rate 为配置的链路容量(位/秒)，发送线程按它限速，带宽估计不超过它；未配置时按确认测得的投递速率限速
+        self.link_rate = rate
+        self.bandwidth_estimate = rate or 4000  # 收到确认前的初始估计4Kbps
         self.latency_history = deque(maxlen=50)
         self.lock = Lock()
-        
-        # 启动监控线程
         self.running = True
-        self.monitor_thread = Thread(target=self._monitor_link_status)
-        self.monitor_thread.daemon = True
-        self.monitor_thread.start()
 
-    def _monitor_link_status(self):
-        """监控卫星链路状态"""
-        while self.running:
-            try:
-                # 计算平均延迟
-                if self.latency_history:
-                    avg_latency = np.mean(self.latency_history)
-                    # 根据延迟调整链路质量
-                    self.link_quality = max(0.1, min(1.0, 0.5 / avg_latency))
-                
-                # 检查丢包率
-                total_packets = len(self.pending_acks)
-                if total_packets > 0:
-                    loss_rate = len([p for p in self.pending_acks.values() 
-                                   if time.time() - p['time'] > 1.0]) / total_packets
-                    self.packet_loss_rate = loss_rate
-                
-                # 更新带宽估计
-                self._update_bandwidth_estimate()
-                
-                time.sleep(0.1)  # 每100ms更新一次
-                
-            except Exception as e:
-                logger.error(f"链路监控错误: {str(e)}")
+        # 接收缓冲有数据时唤醒等待的线程和协程；链路统计在收发事件中更新，不再轮询
+        self.recv_condition = Condition()
+        self.async_waiters = []  # (事件循环, future)
 
-    def _update_bandwidth_estimate(self):
-        """更新带宽估计"""
-        with self.lock:
-            # 基于最近的传输数据计算带宽
-            recent_data = sum(len(p['data']) for p in self.pending_acks.values() 
-                            if time.time() - p['time'] < 1.0)
-            self.bandwidth_estimate = max(2000, min(4000, recent_data * 8))  # 2-4Kbps范围内
+        # 传输层(transport.Transport)，设置后启动发送和接收线程
+        self.transport = transport
+        self.sender_thread = None
+        self.receiver_thread = None
+        if transport is not None:
+            self._start_threads()
+
+    def _start_threads(self, sender=True):
+        if sender:
+            self.sender_thread = Thread(target=self._send_loop, daemon=True)
+            self.sender_thread.start()
+        self.receiver_thread = Thread(target=self._receive_loop, daemon=True)
+        self.receiver_thread.start()
+
+    def simulate_network_conditions(self, bandwidth, packet_loss, latency, jitter=0, burst_length=1, seed=None):
+        """用仿真链路模拟卫星网络：bandwidth 单位 Kbps，latency、jitter 单位毫秒
+
+        已经接入仿真链路时只更新发送方向的参数；没有传输层时接入一条发往自身的仿真链路，
+        此时没有发送线程，send_data 直接发出并阻塞到数据离开链路，可用来测量限速。
+        bandwidth 同时作为配置的链路容量，是发送速率和带宽估计的上限
+        """
+        conditions = dict(bandwidth=bandwidth, latency=latency, jitter=jitter,
+                          packet_loss=packet_loss, burst_length=burst_length)
+        if isinstance(self.transport, EmulatedTransport):
+            if seed is not None:
+                conditions['seed'] = seed
+            self.transport.outgoing.configure(**conditions)
+        elif self.transport is None:
+            self.transport = emulated_loopback(seed=seed, **conditions)
+            self._start_threads(sender=False)
+        else:
+            raise ValueError("已接入真实传输层，无法模拟网络条件")
+
+        self.link_rate = bandwidth * 1000
+        self.bandwidth_estimate = self.link_rate
+        self.min_latency = max(0, latency - jitter) / 1000
+        self.max_latency = (latency + jitter) / 1000
+        self.packet_loss_rate = packet_loss
+
+    def _record_latency(self, latency):
+        """收到确认时更新往返时间和链路质量"""
+        self.latency_history.append(latency)
+        avg_latency = np.mean(self.latency_history)
+        # 根据延迟调整链路质量
+        self.link_quality = max(0.1, min(1.0, 0.5 / avg_latency))
+
+    def _record_delivery(self, lost):
+        """确认到达或重传次数用尽放弃时更新丢包率(指数滑动平均)，每个数据包只计一次"""
+        self.packet_loss_rate += LOSS_SMOOTHING * (float(lost) - self.packet_loss_rate)
+
+    def _update_bandwidth_estimate(self, now):
+        """收到确认后按投递速率更新带宽估计，调用方持有 self.lock"""
+        rate = self.pending_acks.delivery_rate(now)
+        if rate is not None:
+            # 配置了链路容量时估计不超过容量
+            self.bandwidth_estimate = min(rate, self.link_rate) if self.link_rate else rate
 
     def send_data(self, data, priority=0):
         """发送数据，支持优先级"""
         try:
-            seq = self.sequence_number
-            self.sequence_number += 1
+            with self.lock:
+                seq = self.sequence_number
+                self.sequence_number += 1
             
-            packet = {
-                'seq': seq,
-                'data': data,
-                'time': time.time(),
-                'retries': 0
-            }
+                packet = {
+                    'seq': seq,
+                    'data': data,
+                    'time': time.time(),
+                    'sent': None,
+                    'retries': 0,
+                    'priority': priority
+                }
             
-            # 存入待确认队列
-            self.pending_acks[seq] = packet
+                # 存入待确认队列，超出容量时最早的数据包被淘汰
+                evicted = self.pending_acks.add(packet)
+                self.dropped_packets += len(evicted)
             
-            # 加入发送队列
-            self.send_buffer.put((priority, packet))
+            if self.transport is not None and self.sender_thread is None:
+                # 没有发送线程时直接发出，调用方承担限速等待
+                self._transmit(seq, packet)
+                self._flush_fec(time.time())
+            else:
+                # 加入发送队列，同优先级按序号先后发送
+                self.send_buffer.put((priority, seq, packet))
             
             return seq
             
@@ -93,18 +151,260 @@ class SatelliteAdapter:
             return None
 
     def receive_data(self, timeout=0.5):
-        """接收数据，支持超时"""
-        try:
-            start_time = time.time()
-            while time.time() - start_time < timeout:
+        """接收数据，阻塞到有数据或超时；timeout 为 None 时一直等待，直到收到数据或适配器关闭"""
+        with self.recv_condition:
+            self.recv_condition.wait_for(lambda: self.recv_buffer or not self.running, timeout)
+            return self.recv_buffer.popleft() if self.recv_buffer else None
+
+    def receive_nowait(self):
+        """不等待，接收缓冲为空时返回 None"""
+        with self.recv_condition:
+            return self.recv_buffer.popleft() if self.recv_buffer else None
+
+    async def receive_async(self, timeout=None):
+        """在 asyncio 中等待数据，超时或适配器关闭时返回 None"""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            with self.recv_condition:
                 if self.recv_buffer:
                     return self.recv_buffer.popleft()
-                time.sleep(0.01)
-            return None
-            
-        except Exception as e:
-            logger.error(f"接收数据错误: {str(e)}")
+                if not self.running:
+                    return None
+                future = loop.create_future()
+                self.async_waiters.append((loop, future))
+
+            remaining = None if deadline is None else deadline - loop.time()
+            try:
+                await asyncio.wait_for(future, remaining)
+            except asyncio.TimeoutError:
+                return None
+            finally:
+                with self.recv_condition:
+                    if (loop, future) in self.async_waiters:
+                        self.async_waiters.remove((loop, future))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        """async for 逐个取出收到的数据，适配器关闭且缓冲为空时结束"""
+        payload = await self.receive_async()
+        if payload is None:
+            raise StopAsyncIteration
+        return payload
+
+    def _send_loop(self):
+        """按带宽估计的速率发送队列中的数据包，并重传超时未确认的数据包
+
+        没有在途数据包和未结束的纠错组时阻塞等待新数据，否则最多等到最早的重传或组结束时刻
+        """
+        next_send = time.time()
+        while self.running:
+            try:
+                self._retransmit_expired()
+                if self._fec_due(time.time()):
+                    # 超时结束的纠错组，其校验包与数据包一样占用发送速率
+                    next_send = self._paced_send(next_send, lambda: self._flush_fec(time.time()))
+                try:
+                    _, seq, packet = self.send_buffer.get(timeout=self._next_wakeup_delay())
+                except queue.Empty:
+                    continue
+                if packet is None:
+                    break  # close() 放入的结束标记
+                with self.lock:
+                    # 排队期间已被确认或放弃的数据包不再发送
+                    if seq not in self.pending_acks:
+                        continue
+
+                next_send = self._paced_send(next_send, lambda: self._transmit(seq, packet))
+
+            except Exception as e:
+                if self.running:
+                    logger.error(f"发送线程错误: {str(e)}")
+
+    def _paced_send(self, next_send, send):
+        """限速：等到 next_send 再调用 send()，按它返回的字节数占用 字节数 * 8 / 发送速率 秒，返回下一次可发送的时刻"""
+        now = time.time()
+        if next_send > now:
+            time.sleep(next_send - now)
+        size = send()
+        return max(now, next_send) + size * 8 / self._pacing_rate()
+
+    def _pacing_rate(self):
+        """发送速率(位/秒)：配置了链路容量时按容量发送，否则按投递速率加上探测余量"""
+        return self.link_rate or max(MIN_PACING_RATE, PACING_GAIN * self.bandwidth_estimate)
+
+    def _transmit(self, seq, packet):
+        """把数据包交给传输层，首次发出的数据包计入纠错组，返回数据报和随后校验包的总字节数"""
+        datagram = pack_datagram(DATA, seq, packet['data'])
+        # 先登记为在途再发出，对端的确认不会早于登记到达
+        now = time.time()
+        parities = []
+        with self.lock:
+            self.pending_acks.mark_sent(seq, now, len(datagram))
+            if self.fec is not None and packet['retries'] == 0:
+                self.fec.set_loss_rate(self.packet_loss_rate)
+                parities = self.fec.add(seq, packet['data'], now)
+        self.transport.send(datagram)
+        return len(datagram) + self._send_parities(parities)
+
+    def _fec_due(self, now):
+        """是否有未满的纠错组已到最大等待时间"""
+        if self.fec is None:
+            return False
+        with self.lock:
+            deadline = self.fec.deadline()
+        return deadline is not None and now >= deadline
+
+    def _flush_fec(self, now):
+        """未满的纠错组超过最大等待时间时结束该组并发出校验包"""
+        if self.fec is None:
+            return 0
+        with self.lock:
+            deadline = self.fec.deadline()
+            if deadline is None or now < deadline:
+                return 0
+            parities = self.fec.flush()
+        return self._send_parities(parities)
+
+    def _send_parities(self, parities):
+        size = 0
+        for base, body in parities:
+            datagram = pack_datagram(PARITY, base, body)
+            self.transport.send(datagram)
+            size += len(datagram)
+        return size
+
+    def _retransmit_expired(self):
+        """超时未确认的数据包重新排队，重传次数用尽后放弃"""
+        now = time.time()
+        timeout = self._retransmit_timeout()
+        expired = []
+        with self.lock:
+            for packet in self.pending_acks.expire(now, timeout):
+                # 超时不一定是丢包，确认可能只是晚到；重传后仍未确认、最终放弃时才计为丢包
+                if packet['retries'] >= self.max_retries:
+                    self._record_delivery(lost=True)
+                    self.pending_acks.discard(packet['seq'])
+                    self.dropped_packets += 1
+                    continue
+                packet['retries'] += 1
+                self.retransmissions += 1
+                expired.append(packet)
+        for packet in expired:
+            self.send_buffer.put((packet['priority'], packet['seq'], packet))
+
+    def _next_retransmit_delay(self):
+        """距最早一个在途数据包重传超时的秒数，没有在途数据包时返回 None"""
+        with self.lock:
+            deadline = self.pending_acks.next_deadline(self._retransmit_timeout())
+        if deadline is None:
             return None
+        return max(0.0, deadline - time.time())
+
+    def _next_wakeup_delay(self):
+        """发送线程最多等待的秒数：最早的重传时刻和纠错组结束时刻中较早者，都没有时返回 None"""
+        delay = self._next_retransmit_delay()
+        if self.fec is not None:
+            with self.lock:
+                deadline = self.fec.deadline()
+            if deadline is not None:
+                fec_delay = max(0.0, deadline - time.time())
+                delay = fec_delay if delay is None else min(delay, fec_delay)
+        return delay
+
+    def _retransmit_timeout(self):
+        """重传超时：平均往返时间的 2 倍，不低于卫星链路的最大延迟"""
+        if self.latency_history:
+            return max(self.max_latency, 2 * float(np.mean(self.latency_history)))
+        return 2 * self.max_latency
+
+    def _receive_loop(self):
+        """接收数据报：数据包回复确认后放入接收缓冲，校验包用于恢复丢失的数据包，确认包清除待确认记录"""
+        while self.running:
+            try:
+                # 一直阻塞到有数据报；close() 关闭传输层时返回 None
+                datagram = self.transport.receive()
+                if datagram is None:
+                    break
+                kind, seq, payload = unpack_datagram(datagram)
+
+                if kind == DATA:
+                    # 确认直接发出，不经过限速队列；重复的数据包也要确认，对端的确认可能丢了
+                    self.transport.send(pack_datagram(ACK, seq))
+                    if seq in self.received_seqs:
+                        continue
+                    self._accept(seq, payload)
+                    self._accept_recovered(self.fec_decoder.on_data(seq, payload))
+
+                elif kind == PARITY:
+                    self._accept_recovered(self.fec_decoder.on_parity(seq, payload))
+
+                elif kind == ACK:
+                    self._acknowledged(seq, payload)
+
+            except Exception as e:
+                if self.running:
+                    logger.error(f"接收线程错误: {str(e)}")
+
+    def _acknowledged(self, seq, payload):
+        """收到确认：清除待确认记录，更新带宽估计、丢包率和往返时间"""
+        now = time.time()
+        with self.lock:
+            packet = self.pending_acks.acknowledge(seq, now)
+            self._update_bandwidth_estimate(now)
+        if packet is not None:
+            # 由纠错恢复的数据包在信道上是丢了的，按丢包计入，纠错强度才不会因恢复成功而回落
+            self._record_delivery(lost=payload == RECOVERED)
+            if packet['sent'] is not None:
+                self._record_latency(now - packet['sent'])
+
+    def _accept(self, seq, payload):
+        self.received_seqs.append(seq)
+        self.last_received_seq = max(self.last_received_seq, seq)
+        self._push_received(payload)
+
+    def _accept_recovered(self, recovered):
+        """纠错恢复的数据包：确认后放入接收缓冲，之后到达的重传按重复包处理"""
+        for seq, payload in recovered:
+            if seq in self.received_seqs:
+                continue
+            self.transport.send(pack_datagram(ACK, seq, RECOVERED))
+            self._accept(seq, payload)
+
+    def _push_received(self, payload):
+        """放入接收缓冲并唤醒一个等待者"""
+        with self.recv_condition:
+            self.recv_buffer.append(payload)
+            self.recv_condition.notify()
+            self._wake_async_waiter()
+
+    def _wake_async_waiter(self, wake_all=False):
+        """在调用方持有 recv_condition 时唤醒等待中的协程"""
+        while self.async_waiters:
+            loop, future = self.async_waiters.pop(0)
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                continue  # 事件循环已关闭
+            if not wake_all:
+                break
+
+    def close(self):
+        """停止所有线程并关闭传输层"""
+        self.running = False
+        self.send_buffer.put((-1, -1, None))
+        with self.recv_condition:
+            self.recv_condition.notify_all()
+            self._wake_async_waiter(wake_all=True)
+        if self.sender_thread is not None:
+            self.sender_thread.join(timeout=1.0)
+        # 接收线程阻塞在 transport.receive 中，关闭传输层才能唤醒它
+        if self.transport is not None:
+            self.transport.close()
+        if self.receiver_thread is not None:
+            self.receiver_thread.join(timeout=1.0)
 
     def get_link_status(self):
         """获取链路状态"""
@@ -113,15 +413,33 @@ class SatelliteAdapter:
             'bandwidth': self.bandwidth_estimate,
             'latency': np.mean(self.latency_history) if self.latency_history else 0,
             'packet_loss': self.packet_loss_rate,
-            'signal_strength': self.signal_strength
+            'signal_strength': self.signal_strength,
+            'retransmissions': self.retransmissions,
+            'dropped_packets': self.dropped_packets,
+            # 校验包字节数占数据字节数的比例、当前每组校验包数、本端恢复的数据包数
+            'fec_overhead': self.fec.overhead if self.fec is not None else 0.0,
+            'fec_parity': self.fec.parity if self.fec is not None else 0,
+            'fec_recovered': self.fec_decoder.recovered
         }
 
     def emergency_mode(self):
         """进入紧急模式"""
         # 清空所有缓冲
-        with self.lock:
-            self.send_buffer.queue.clear()
+        with self.recv_condition:
             self.recv_buffer.clear()
+        # 发送线程可能正阻塞在 send_buffer.get() 中，经队列自身的接口取空，保持其内部计数一致
+        while True:
+            try:
+                self.send_buffer.get_nowait()
+            except queue.Empty:
+                break
+            self.send_buffer.task_done()
+        with self.lock:
             self.pending_acks.clear()
             # 重置带宽估计到最低值
-            self.bandwidth_estimate = 2000 
\ No newline at end of file
+            self.bandwidth_estimate = MIN_PACING_RATE
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
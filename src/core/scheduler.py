@@ -0,0 +1,204 @@
+"""
+推理调度模块
+会议场景大部分时间画面静止，没必要每帧都跑完整模型：
+每隔 N 帧或画面变化超过阈值时才推理，中间帧用运动预测合成关键点，
+N 根据实测推理耗时和 CPU 预算自动调整
+"""
+
+import math
+from collections import deque
+import cv2
+import numpy as np
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class InferenceScheduler:
+    """关键帧推理调度器
+
+    cpu_budget 为推理允许占用的帧时间比例，例如 0.5 表示平均每帧最多花半个帧间隔做推理。
+    """
+
+    def __init__(self, target_fps=30, cpu_budget=0.5, min_interval=1, max_interval=10,
+                 motion_threshold=6.0, max_extrapolation=0.5):
+        self.frame_period = 1.0 / target_fps
+        self.cpu_budget = cpu_budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.motion_threshold = motion_threshold    # 缩略图灰度平均绝对差(0-255)
+        self.max_extrapolation = max_extrapolation  # 最长外推时间(秒)，超过后保持不动
+
+        self.thumbnail_size = (64, 48)
+        self.last_thumbnail = None
+        self.frames_since_inference = 0
+        self.inference_latency = None  # 推理耗时的指数滑动平均(秒)
+
+        # 最近几次实测关键点 (timestamp, keypoints)
+        self.measurements = deque(maxlen=3)
+        self.stats = {'measured': 0, 'predicted': 0}
+
+    def should_infer(self, frame):
+        """根据帧间隔和画面变化决定当前帧是否运行完整推理"""
+        self.frames_since_inference += 1
+        thumbnail = self._thumbnail(frame)
+
+        # 画面里没有人时同样按间隔和画面变化调度：空房间正是最需要省下推理的静止场景
+        if self.last_thumbnail is None:
+            return self._schedule(thumbnail)
+
+        if self.frames_since_inference >= self.interval:
+            return self._schedule(thumbnail)
+
+        # 与上次推理帧比较，缓慢累积的变化同样会触发
+        motion = cv2.absdiff(thumbnail, self.last_thumbnail).mean()
+        if motion > self.motion_threshold:
+            return self._schedule(thumbnail)
+
+        return False
+
+    def record_inference(self, latency, keypoints, timestamp):
+        """记录一次实测结果，并根据耗时调整推理间隔"""
+        self.stats['measured'] += 1
+        if self.inference_latency is None:
+            self.inference_latency = latency
+        else:
+            self.inference_latency = 0.8 * self.inference_latency + 0.2 * latency
+
+        # 平均每帧推理开销 = latency / N，不超过 cpu_budget * 帧间隔
+        budget = self.cpu_budget * self.frame_period
+        interval = math.ceil(self.inference_latency / budget) if budget > 0 else self.max_interval
+        self.interval = max(self.min_interval, min(self.max_interval, interval))
+
+        if keypoints is None:
+            self.measurements.clear()
+        else:
+            self.measurements.append((timestamp, np.array(keypoints, dtype=np.float32)))
+
+    def predict(self, timestamp):
+        """用最近的实测关键点外推当前时刻的关键点，没有实测数据时返回 None"""
+        if not self.measurements:
+            return None
+        self.stats['predicted'] += 1
+
+        t2, p2 = self.measurements[-1]
+        if len(self.measurements) < 2:
+            return p2.copy()
+
+        dt = min(timestamp - t2, self.max_extrapolation)
+        t1, p1 = self.measurements[-2]
+        velocity = (p2[:, :3] - p1[:, :3]) / max(t2 - t1, 1e-3)
+
+        predicted = p2.copy()
+        if len(self.measurements) >= 3:
+            # 二次运动预测
+            t0, p0 = self.measurements[-3]
+            previous_velocity = (p1[:, :3] - p0[:, :3]) / max(t1 - t0, 1e-3)
+            acceleration = (velocity - previous_velocity) / max(t2 - t0, 1e-3) * 2
+            predicted[:, :3] += velocity * dt + 0.5 * acceleration * dt * dt
+        else:
+            # 线性预测
+            predicted[:, :3] += velocity * dt
+        return predicted
+
+    def get_stats(self):
+        """获取调度统计"""
+        return {
+            'interval': self.interval,
+            'inference_latency': self.inference_latency or 0.0,
+            'measured_frames': self.stats['measured'],
+            'predicted_frames': self.stats['predicted']
+        }
+
+    def _schedule(self, thumbnail):
+        self.frames_since_inference = 0
+        self.last_thumbnail = thumbnail
+        return True
+
+    def _thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.resize(gray, self.thumbnail_size, interpolation=cv2.INTER_AREA)
+
+
+# 推理分辨率阶梯，从高到低
+DEFAULT_RESOLUTION_LADDER = [(640, 480), (480, 360), (320, 240), (256, 192)]
+
+
+class ResolutionLadder:
+    """推理分辨率阶梯
+
+    帧在送入模型前按当前档位等比缩小一次；实测每帧延迟持续超过目标时降一档，
+    持续低于目标的 upgrade_ratio 时升一档，从而在主机负载高时先降分辨率而不是丢帧。
+    MediaPipe 输出的是相对输入图像的归一化坐标，等比缩放不改变归一化坐标，关键点无需逐档修正。
+
+    与 PoseModelManager 同时使用时两者看到的是同一个延迟信号，传入 model_manager 后
+    只在模型复杂度已降到最低时才降分辨率；模型管理器反过来只在分辨率回到最高档后才升复杂度
+    (其 can_upgrade 参数传入 at_full_resolution)，负载上升时先降复杂度再降分辨率，回落时按相反顺序恢复。
+    一方切换后另一方至少等待一个 cooldown，保证同一段延迟只让一个控制器换档。
+    """
+
+    def __init__(self, rungs=None, target_latency=1.0 / 30, window=15,
+                 upgrade_ratio=0.6, cooldown=30, model_manager=None):
+        self.rungs = list(rungs or DEFAULT_RESOLUTION_LADDER)
+        self.level = 0
+        self.target_latency = target_latency
+        self.upgrade_ratio = upgrade_ratio
+        self.cooldown = cooldown  # 换档后至少间隔的帧数，避免来回抖动
+        self.latency_history = deque(maxlen=window)
+        self.frames_since_change = 0
+        self.model_manager = model_manager
+
+    @property
+    def size(self):
+        return self.rungs[self.level]
+
+    def prepare(self, frame):
+        """按当前档位等比缩小帧，返回用于推理的图像"""
+        h, w = frame.shape[:2]
+        max_w, max_h = self.size
+        scale = min(max_w / w, max_h / h)
+        if scale >= 1.0:
+            return frame
+        size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+    def record_latency(self, latency):
+        """记录一帧的推理延迟(秒)，必要时切换档位，返回当前档位"""
+        self.latency_history.append(latency)
+        self.frames_since_change += 1
+        if (len(self.latency_history) < self.latency_history.maxlen
+                or self.frames_since_change < self.cooldown):
+            return self.level
+
+        mean_latency = float(np.mean(self.latency_history))
+        if (mean_latency > self.target_latency and self.level < len(self.rungs) - 1
+                and self._model_at_lowest()):
+            self._switch(self.level + 1, mean_latency)
+        elif mean_latency < self.target_latency * self.upgrade_ratio and self.level > 0:
+            self._switch(self.level - 1, mean_latency)
+        return self.level
+
+    def at_full_resolution(self):
+        """已回到最高档且停留满 cooldown 帧，供模型管理器判断能否升复杂度"""
+        return self.level == 0 and self.frames_since_change >= self.cooldown
+
+    def _model_at_lowest(self):
+        """模型复杂度已降到最低且停留满 cooldown 帧(或未关联模型管理器)时才允许降分辨率"""
+        manager = self.model_manager
+        return manager is None or (manager.current_level == manager.levels[0]
+                                   and manager.frames_since_switch >= self.cooldown)
+
+    def get_stats(self):
+        """获取当前档位信息"""
+        return {
+            'level': self.level,
+            'size': self.size,
+            'mean_latency': float(np.mean(self.latency_history)) if self.latency_history else 0.0
+        }
+
+    def _switch(self, level, mean_latency):
+        logger.info(f"推理分辨率 {self.size} -> {self.rungs[level]}，平均延迟 {mean_latency * 1000:.1f}ms")
+        self.level = level
+        self.latency_history.clear()
+        self.frames_since_change = 0
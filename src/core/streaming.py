@@ -0,0 +1,192 @@
+"""
+MJPEG 推流模块
+生产端每帧只编码一次并生成一次 bytes，所有客户端共享；
+推流时分别输出 multipart 头、JPEG 数据和结尾，不再拼接整帧。
+JPEG 质量和分辨率根据客户端实测吞吐自适应调整
+"""
+
+import time
+from collections import deque
+from threading import Lock
+import cv2
+import numpy as np
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MJPEG_MIMETYPE = 'multipart/x-mixed-replace; boundary=frame'
+PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n'
+PART_TRAILER = b'\r\n'
+
+
+class EncodedFrame:
+    """一帧已编码的 JPEG 及其 multipart 头"""
+
+    __slots__ = ('header', 'data', 'quality', 'scale')
+
+    def __init__(self, data, quality, scale):
+        self.header = PART_HEADER % len(data)
+        self.data = data
+        self.quality = quality
+        self.scale = scale
+
+
+class AdaptiveJPEGEncoder:
+    """根据客户端吞吐自适应调整 JPEG 质量和分辨率
+
+    客户端上报的是实际送达的字节/秒，没有积压的客户端只能收到生产端产出的帧，
+    所以用 吞吐/(平均帧大小*帧率) 估算最慢客户端收到的帧比例，帧率取生产端实测帧率和目标帧率的较小值：
+    比例低于 keep_up_ratio 时先降质量，质量到下限后再降分辨率；
+    客户端跟得上时逐级探测，先恢复分辨率，再提高质量。
+    """
+
+    def __init__(self, quality=80, min_quality=30, max_quality=90, quality_step=5,
+                 scales=(1.0, 0.75, 0.5), target_fps=15, keep_up_ratio=0.9, adapt_interval=10):
+        self.quality = quality
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.quality_step = quality_step
+        self.scales = list(scales)
+        self.scale_index = 0
+        self.target_fps = target_fps
+        self.keep_up_ratio = keep_up_ratio
+        self.adapt_interval = adapt_interval
+
+        self.client_throughput = {}  # 客户端 -> 字节/秒
+        self.frame_sizes = deque(maxlen=adapt_interval)
+        self.frame_times = deque(maxlen=adapt_interval + 1)
+        self.frames_since_adapt = 0
+        self.lock = Lock()
+
+        # 复用缩放输出缓冲
+        self._resize_buffer = None
+
+    @property
+    def scale(self):
+        return self.scales[self.scale_index]
+
+    @property
+    def frame_rate(self):
+        """生产端实测帧率，样本不足时按目标帧率计"""
+        if len(self.frame_times) < 2:
+            return self.target_fps
+        elapsed = self.frame_times[-1] - self.frame_times[0]
+        if elapsed <= 0:
+            return self.target_fps
+        return min(self.target_fps, (len(self.frame_times) - 1) / elapsed)
+
+    def encode(self, frame):
+        """编码一帧，返回 EncodedFrame，失败时返回 None"""
+        scale = self.scale
+        if scale < 1.0:
+            frame = self._resize(frame, scale)
+
+        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ret:
+            return None
+
+        # 每帧只生成一次 bytes，所有客户端共享
+        encoded = EncodedFrame(buffer.tobytes(), self.quality, scale)
+        self.frame_sizes.append(len(encoded.data))
+        self.frame_times.append(time.perf_counter())
+        self.frames_since_adapt += 1
+        if self.frames_since_adapt >= self.adapt_interval:
+            self._adapt()
+        return encoded
+
+    def report_throughput(self, client, bytes_per_second):
+        """客户端上报实测吞吐"""
+        with self.lock:
+            self.client_throughput[client] = bytes_per_second
+
+    def remove_client(self, client):
+        with self.lock:
+            self.client_throughput.pop(client, None)
+
+    def get_stats(self):
+        with self.lock:
+            throughput = min(self.client_throughput.values()) if self.client_throughput else None
+        return {
+            'quality': self.quality,
+            'scale': self.scale,
+            'mean_frame_bytes': float(np.mean(self.frame_sizes)) if self.frame_sizes else 0.0,
+            'min_client_throughput': throughput
+        }
+
+    def _resize(self, frame, scale):
+        h, w = frame.shape[:2]
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        if self._resize_buffer is None or self._resize_buffer.shape[:2] != (size[1], size[0]) \
+                or self._resize_buffer.shape[2:] != frame.shape[2:]:
+            self._resize_buffer = np.empty((size[1], size[0]) + frame.shape[2:], dtype=frame.dtype)
+        return cv2.resize(frame, size, dst=self._resize_buffer, interpolation=cv2.INTER_AREA)
+
+    def _adapt(self):
+        self.frames_since_adapt = 0
+        with self.lock:
+            if not self.client_throughput:
+                return
+            throughput = min(self.client_throughput.values())
+
+        frame_size = float(np.mean(self.frame_sizes))
+        delivered = throughput / (frame_size * self.frame_rate)
+        quality, scale_index = self.quality, self.scale_index
+
+        if delivered < self.keep_up_ratio:
+            if self.quality > self.min_quality:
+                self.quality = max(self.min_quality, self.quality - self.quality_step)
+            elif self.scale_index < len(self.scales) - 1:
+                self.scale_index += 1
+        else:
+            if self.scale_index > 0:
+                self.scale_index -= 1
+            elif self.quality < self.max_quality:
+                self.quality = min(self.max_quality, self.quality + self.quality_step)
+
+        if (quality, scale_index) != (self.quality, self.scale_index):
+            self.frame_sizes.clear()
+            logger.debug(f"JPEG 质量 {self.quality}, 缩放 {self.scale}, 吞吐 {throughput / 1000:.1f}KB/s")
+
+
+class MJPEGStreamWriter:
+    """把广播中心的 EncodedFrame 写成 multipart 流
+
+    每帧依次输出头、JPEG 数据和结尾三段：共享的 JPEG bytes 不再复制或拼接。
+    WSGI 要求输出 bytes，所以 JPEG 数据以 bytes 而非 memoryview 形式输出。
+    """
+
+    def __init__(self, broadcaster, encoder=None, throughput_window=10):
+        self.broadcaster = broadcaster
+        self.encoder = encoder
+        self.throughput_window = throughput_window
+
+    def stream(self, timeout=1.0):
+        """供 Flask Response 使用的生成器
+
+        每帧的结尾被取走时记录送达时刻，窗口内送达的字节数除以首尾帧之间的墙钟时间即为该客户端的实测吞吐。
+        只计 yield 的耗时只能反映 socket 背压，没有积压的客户端会被估成近乎无限的吞吐。
+        """
+        subscription = self.broadcaster.subscribe()
+        samples = deque(maxlen=self.throughput_window)  # (字节数, 送达时刻)
+        try:
+            while True:
+                frame = subscription.get(timeout)
+                if frame is None:
+                    continue
+
+                yield frame.header
+                yield frame.data
+                yield PART_TRAILER
+                # 生成器恢复执行时服务器已把整帧交给 socket
+                samples.append((len(frame.header) + len(frame.data) + len(PART_TRAILER), time.perf_counter()))
+
+                if self.encoder is not None and len(samples) == samples.maxlen:
+                    # 第一帧只作为计时起点，它的字节在起点之前已送达
+                    elapsed = samples[-1][1] - samples[0][1]
+                    if elapsed > 0:
+                        total_bytes = sum(size for size, _ in samples) - samples[0][0]
+                        self.encoder.report_throughput(subscription, total_bytes / elapsed)
+        finally:
+            self.broadcaster.unsubscribe(subscription)
+            if self.encoder is not None:
+                self.encoder.remove_client(subscription)
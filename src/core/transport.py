@@ -0,0 +1,95 @@
+"""
+传输层模块
+SatelliteAdapter 通过 Transport 收发数据报，负责排队、限速、确认和重传；
+Transport 只负责把一个字节串原样送到对端，可替换为 UDP、链路仿真或其他实现
+
+数据报格式：类型(1 字节) | 序号(uint32) | 载荷
+校验包(PARITY)的序号字段为所属组的首个数据包序号，载荷格式见 fec 模块；
+确认包载荷为 1 字节 1 时表示该数据包由前向纠错恢复，而非直接收到
+"""
+
+import socket
+import struct
+
+DATAGRAM_HEADER = '>BI'
+DATAGRAM_HEADER_SIZE = struct.calcsize(DATAGRAM_HEADER)
+DATA = 0
+ACK = 1
+PARITY = 2
+
+# UDP 单个数据报的最大载荷
+MAX_DATAGRAM_SIZE = 65507
+
+
+def pack_datagram(kind, seq, payload=b''):
+    return struct.pack(DATAGRAM_HEADER, kind, seq & 0xFFFFFFFF) + payload
+
+
+def unpack_datagram(datagram):
+    """返回 (类型, 序号, 载荷)，长度不足时抛出 ValueError"""
+    if len(datagram) < DATAGRAM_HEADER_SIZE:
+        raise ValueError(f"数据报过短: {len(datagram)} 字节")
+    kind, seq = struct.unpack(DATAGRAM_HEADER, datagram[:DATAGRAM_HEADER_SIZE])
+    return kind, seq, datagram[DATAGRAM_HEADER_SIZE:]
+
+
+class Transport:
+    """不可靠数据报传输的接口"""
+
+    def send(self, datagram):
+        raise NotImplementedError
+
+    def receive(self, timeout=None):
+        """等待一个数据报，timeout 为 None 时一直阻塞；超时或传输层已关闭时返回 None"""
+        raise NotImplementedError
+
+    def close(self):
+        """关闭传输层，并唤醒阻塞在 receive 中的线程"""
+        pass
+
+
+class UDPTransport(Transport):
+    """UDP 实现：绑定本地地址，发往固定的对端地址
+
+    remote 可以在创建后通过 connect 设置，便于两端先各自绑定端口再互相告知
+    """
+
+    def __init__(self, local=('127.0.0.1', 0), remote=None):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(local)
+        self.remote = remote
+        self.closed = False
+
+    @property
+    def address(self):
+        return self.sock.getsockname()
+
+    def connect(self, remote):
+        self.remote = remote
+
+    def send(self, datagram):
+        if self.remote is None:
+            raise ValueError("未设置对端地址")
+        self.sock.sendto(datagram, self.remote)
+
+    def receive(self, timeout=None):
+        try:
+            self.sock.settimeout(timeout)
+            datagram, _ = self.sock.recvfrom(MAX_DATAGRAM_SIZE)
+        except socket.timeout:
+            return None
+        except OSError:
+            if self.closed:
+                return None
+            raise
+        # shutdown 唤醒的 recvfrom 返回空数据
+        return None if self.closed else datagram
+
+    def close(self):
+        self.closed = True
+        try:
+            # 未连接的 UDP 套接字 shutdown 会报 ENOTCONN，但仍会唤醒阻塞的 recvfrom
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
@@ -1,12 +1,15 @@
 import cv2
-import mediapipe as mp
 import logging
 import numpy as np
 import time
-import math
 from collections import deque
+from threading import Thread, Lock, Condition, current_thread
 from ..utils.logger import get_logger
 from ..core.satellite_adapter import SatelliteAdapter
+from .landmarks import LandmarkExtractor
+from .scheduler import InferenceScheduler, ResolutionLadder
+from .model_manager import PoseModelManager
+from ..utils.bandwidth_monitor import BandwidthMonitor
 
 # Configure logging
 logger = get_logger(__name__)
@@ -18,29 +21,151 @@ handler.setFormatter(formatter)
 logger.addHandler(handler)
 
 class CaptureManager:
-    def __init__(self):
-        # 初始化摄像头等
-        pass
+    """独立采集线程 + 最新帧环形缓冲
+
+    采集线程持续读取摄像头，只在小环形缓冲中保留最新的几帧（附带采集时间戳），
+    推理端总是取最新帧，过期帧直接丢弃，避免推理变慢时帧在驱动缓冲中堆积。
+    """
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.device = config.get('device', 0)
+        self.frame_size = (config.get('width', 640), config.get('height', 480))
+        self.fps = config.get('fps', 30)
+        self.max_frame_age = config.get('max_frame_age', 0.5)  # 超过该时长(秒)的帧视为过期
+
+        # 环形缓冲：元素为 (frame_id, timestamp, frame)
+        self.frames = deque(maxlen=config.get('buffer_size', 2))
+        self.lock = Lock()
+        self.frame_ready = Condition(self.lock)
+
+        self.camera = None
+        self.capture_thread = None
+        self.running = False
+        self.frame_id = 0
+        self.last_consumed_id = -1
+        self.dropped_frames = 0
 
     def start_capture(self):
-        # 启动摄像头
-        pass
+        """启动摄像头和采集线程"""
+        if self.is_running():
+            return True
+
+        self.release_capture()
+        camera = cv2.VideoCapture(self.device)
+        if not camera.isOpened():
+            logger.error(f"无法打开摄像头: {self.device}")
+            return False
+
+        camera.set(cv2.CAP_PROP_FRAME_WIDTH, self.frame_size[0])
+        camera.set(cv2.CAP_PROP_FRAME_HEIGHT, self.frame_size[1])
+        camera.set(cv2.CAP_PROP_FPS, self.fps)
+        # 驱动端只保留1帧，降低排队延迟（部分后端不支持，忽略返回值）
+        camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        self.camera = camera
+        self.running = True
+        self.capture_thread = Thread(target=self._capture_loop)
+        self.capture_thread.daemon = True
+        self.capture_thread.start()
+        logger.info("采集线程已启动")
+        return True
 
     def release_capture(self):
-        # 释放摄像头
-        pass
+        """停止采集线程并释放摄像头"""
+        with self.lock:
+            self.running = False
+            self.frame_ready.notify_all()
+
+        if self.capture_thread is not None and self.capture_thread is not current_thread():
+            self.capture_thread.join(timeout=1.0)
+        self.capture_thread = None
+
+        if self.camera is not None:
+            self.camera.release()
+            self.camera = None
+
+        with self.lock:
+            self.frames.clear()
+
+    def is_running(self):
+        """采集线程是否在运行"""
+        return self.running and self.camera is not None and self.camera.isOpened()
+
+    def _capture_loop(self):
+        """采集线程主循环"""
+        while self.running:
+            try:
+                success, frame = self.camera.read()
+                if not success or frame is None:
+                    time.sleep(0.01)
+                    continue
+
+                timestamp = time.time()
+                with self.lock:
+                    self.frame_id += 1
+                    self.frames.append((self.frame_id, timestamp, frame))
+                    self.frame_ready.notify_all()
+
+            except Exception as e:
+                logger.error(f"采集线程错误: {str(e)}")
+                time.sleep(0.01)
+
+    def get_latest_frame(self, timeout=0.1):
+        """获取最新一帧
+
+        返回 (frame_id, timestamp, frame)，没有新帧或帧已过期时返回 None。
+        两次调用之间被覆盖的旧帧计入 dropped_frames。
+        """
+        with self.lock:
+            if not self.frame_ready.wait_for(
+                    lambda: not self.running or (self.frames and self.frames[-1][0] > self.last_consumed_id),
+                    timeout):
+                return None
+            if not self.frames or self.frames[-1][0] <= self.last_consumed_id:
+                return None
+
+            frame_id, timestamp, frame = self.frames[-1]
+            if self.last_consumed_id >= 0:
+                self.dropped_frames += frame_id - self.last_consumed_id - 1
+            self.last_consumed_id = frame_id
+
+        if time.time() - timestamp > self.max_frame_age:
+            self.dropped_frames += 1
+            return None
+        return frame_id, timestamp, frame
+
+    def get_stats(self):
+        """获取采集统计"""
+        with self.lock:
+            latest = self.frames[-1][1] if self.frames else None
+        return {
+            'running': self.is_running(),
+            'captured_frames': self.frame_id,
+            'dropped_frames': self.dropped_frames,
+            'frame_age': time.time() - latest if latest is not None else None
+        }
 
 class VideoProcessor:
-    def __init__(self, capture_manager):
+    def __init__(self, capture_manager, model_complexity=1):
         self.capture_manager = capture_manager
-        self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(
-            static_image_mode=False,
-            model_complexity=1,
-            smooth_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
+        # 预热 0/1/2 三个复杂度的姿态模型，按推理延迟自动切换；
+        # 与推理分辨率阶梯共用同一延迟信号：先降复杂度再降分辨率，恢复时先升分辨率再升复杂度
+        self.pose_manager = PoseModelManager(
+            levels=(0, 1, 2),
+            initial=model_complexity,
+            target_frame_time=1.0 / 30,
+            can_upgrade=lambda: self.resolution_ladder.at_full_resolution()
         )
+        self.landmark_extractor = LandmarkExtractor(max_hands=0, max_faces=0)
+
+        # 关键帧推理调度：静止画面中跳过推理，用运动预测填补中间帧
+        self.inference_scheduler = InferenceScheduler(target_fps=30, cpu_budget=0.5)
+        self.last_keypoints_measured = False
+
+        # 推理分辨率阶梯：负载高时先降分辨率
+        self.resolution_ladder = ResolutionLadder(target_latency=1.0 / 30, model_manager=self.pose_manager)
+
         # 带宽和帧率控制
         self.min_bandwidth = 2000  # 2Kbps
         self.max_bandwidth = 4000  # 4Kbps
@@ -57,6 +182,9 @@ class VideoProcessor:
         self.emergency_mode_active = False
         self.last_keyframe_time = time.time()
         self.keyframe_interval = 2.0  # 关键帧间隔
+
+        # 带宽统计
+        self.bandwidth_monitor = BandwidthMonitor()
         
     def adaptive_frame_rate(self, current_bandwidth, motion_level):
         """根据带宽和动作幅度动态调整帧率"""
@@ -77,23 +205,46 @@ class VideoProcessor:
         return round(self.current_fps)
 
     def calculate_motion_level(self, current_points):
-        """计算动作幅度"""
-        if self.last_keypoints is None:
-            self.last_keypoints = current_points
+        """计算动作幅度，current_points 为提取层输出的 (N, 4) 数组"""
+        if current_points is None or len(current_points) == 0:
             return 0
-        
-        if not current_points:
+
+        current_points = np.asarray(current_points, dtype=np.float32)
+        if self.last_keypoints is None:
+            self.last_keypoints = current_points.copy()
             return 0
-            
-        motion = 0
-        for i, point in enumerate(current_points):
-            if i < len(self.last_keypoints):
-                dx = point[0] - self.last_keypoints[i][0]
-                dy = point[1] - self.last_keypoints[i][1]
-                motion += math.sqrt(dx*dx + dy*dy)
-                
-        self.last_keypoints = current_points
-        return motion / len(current_points)
+
+        count = min(len(current_points), len(self.last_keypoints))
+        motion = np.linalg.norm(current_points[:count, :2] - self.last_keypoints[:count, :2], axis=1).sum()
+
+        # 提取层的数组会被下一帧复用，保存副本
+        self.last_keypoints = current_points.copy()
+        return float(motion / len(current_points))
+
+    def extract_keypoints(self, frame, timestamp=None):
+        """按调度运行姿态推理或预测关键点
+
+        返回 (keypoints, measured)：measured 为 True 表示来自模型实测，False 表示运动预测合成；
+        没有可用关键点时 keypoints 为 None
+        """
+        timestamp = timestamp if timestamp is not None else time.time()
+
+        if not self.inference_scheduler.should_infer(frame):
+            self.last_keypoints_measured = False
+            return self.inference_scheduler.predict(timestamp), False
+
+        start = time.perf_counter()
+        frame_rgb = cv2.cvtColor(self.resolution_ladder.prepare(frame), cv2.COLOR_BGR2RGB)
+        frame_rgb.flags.writeable = False
+        results = self.pose_manager.process(frame_rgb)
+        latency = time.perf_counter() - start
+        self.resolution_ladder.record_latency(latency)
+
+        landmarks = self.landmark_extractor.extract(-1, pose_results=results)
+        keypoints = landmarks.pose if landmarks.has_pose else None
+        self.inference_scheduler.record_inference(latency, keypoints, timestamp)
+        self.last_keypoints_measured = True
+        return keypoints, True
 
     def should_process_frame(self):
         """决定是否处理当前帧"""
@@ -106,8 +257,8 @@ class VideoProcessor:
         return False
 
     def compress_keypoints(self, keypoints, current_bandwidth):
-        """根据带宽压缩关键点数据"""
-        if not keypoints:
+        """根据带宽压缩关键点数据，keypoints 为提取层输出的 (N, 4) 数组"""
+        if keypoints is None or len(keypoints) == 0:
             return []
             
         # 检查是否超出带宽限制
@@ -128,8 +279,8 @@ class VideoProcessor:
         for i in selected_points:
             if i < len(keypoints):
                 point = keypoints[i]
-                x = round(point[0], precision)
-                y = round(point[1], precision)
+                x = round(float(point[0]), precision)
+                y = round(float(point[1]), precision)
                 compressed.append([x, y])
                 
         return compressed
@@ -143,7 +294,7 @@ class VideoProcessor:
             # 更新带宽统计
             if processed_data:
                 data_size = len(processed_data)
-                bandwidth_monitor.update(data_size)
+                self.bandwidth_monitor.update(data_size)
                 
             return processed_data
             
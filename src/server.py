@@ -1,12 +1,18 @@
 from flask import Flask, Response, jsonify, request, send_from_directory, render_template
 import cv2
 import numpy as np
-import mediapipe as mp
 import os
 from werkzeug.utils import secure_filename
 import time
 import logging
 from collections import deque
+from .core.video_processor import CaptureManager, VideoProcessor
+from .core.broadcast import FrameBroadcaster
+from .core.streaming import AdaptiveJPEGEncoder, MJPEGStreamWriter, MJPEG_MIMETYPE
+from .core.landmarks import LandmarkExtractor
+from .utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 # 获取项目根目录的绝对路径
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -30,33 +36,24 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max-limit
 for folder in [UPLOAD_FOLDER, MODEL_FOLDER, BACKGROUND_FOLDER]:
     os.makedirs(folder, exist_ok=True)
 
-# MediaPipe 初始化
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(
-    static_image_mode=False,
-    model_complexity=2,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
+landmark_extractor = LandmarkExtractor()
 
 # 全局变量
-camera = None
+capture_manager = CaptureManager()
+video_processor = VideoProcessor(capture_manager, model_complexity=2)
+
+# 姿态模型由 VideoProcessor 统一管理，model_complexity 按推理延迟自动切换
+pose = video_processor.pose_manager
+current_frame = None
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def init_camera():
     """简化的摄像头初始化"""
-    global camera
     try:
-        if camera is not None:
-            camera.release()
-            
-        camera = cv2.VideoCapture(0)
-        if not camera.isOpened():
-            return False
-            
-        return True
+        capture_manager.release_capture()
+        return capture_manager.start_capture()
     except Exception as e:
         logger.error(f"摄像头初始化错误: {str(e)}")
         return False
@@ -64,10 +61,8 @@ def init_camera():
 @app.route('/start_capture', methods=['POST'])
 def start_capture():
     """简化的摄像头启动逻辑"""
-    global camera
-    
     # 如果摄像头已经在运行，直接返回成功
-    if camera is not None and camera.isOpened():
+    if capture_manager.is_running():
         return jsonify({"status": "success"}), 200
         
     # 尝试初始化摄像头
@@ -79,13 +74,9 @@ def start_capture():
 @app.route('/camera_status')
 def camera_status():
     """获取摄像头状态"""
-    global camera
-    
     try:
-        is_running = False
-        if camera is not None:
-            # 只进行基本检查，不读取帧
-            is_running = camera.isOpened()
+        # 只进行基本检查，不读取帧
+        is_running = capture_manager.is_running()
             
         return jsonify({
             "isRunning": is_running,
@@ -102,69 +93,50 @@ def camera_status():
 @app.route('/stop_capture', methods=['POST'])
 def stop_capture():
     """停止摄像头"""
-    global camera
-    if camera is not None:
-        camera.release()
-        camera = None
+    capture_manager.release_capture()
     return jsonify({"status": "success"}), 200
 
-def generate_frames():
-    global current_frame, current_pose
-    while True:
-        if camera is None or not camera.isOpened():
-            break
-            
-        success, frame = camera.read()
-        if not success:
-            break
-            
-        # 处理帧
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = pose.process(frame_rgb)
+def produce_frame():
+    """采集最新帧、推理、绘制并编码，返回 EncodedFrame
+
+    由帧广播中心的生产线程调用，所有 /video_feed 客户端共享结果。
+    """
+    global current_frame
+    if not capture_manager.is_running():
+        if not init_camera():
+            time.sleep(1)
+            return None
+
+    latest = capture_manager.get_latest_frame()
+    if latest is None:
+        return None
+    frame_id, _, frame = latest
         
-        # 存储当前姿态数据
-        if results.pose_landmarks:
-            current_pose = [[lm.x, lm.y, lm.z] for lm in results.pose_landmarks.landmark]
-            
+    # 处理帧
+    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    results = pose.process(frame_rgb)
+    landmarks = landmark_extractor.extract(frame_id, pose_results=results)
+    
+    if landmarks.has_pose:
         # 绘制姿态标记点
-        if results.pose_landmarks:
-            for landmark in results.pose_landmarks.landmark:
-                h, w, c = frame.shape
-                cx, cy = int(landmark.x * w), int(landmark.y * h)
-                cv2.circle(frame, (cx, cy), 5, (0, 255, 0), -1)
-                
-        current_frame = frame
-        
-        # 转换帧格式用于流式传输
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame = buffer.tobytes()
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+        h, w = frame.shape[:2]
+        for cx, cy in (landmarks.pose[:, :2] * (w, h)).astype(int):
+            cv2.circle(frame, (int(cx), int(cy)), 5, (0, 255, 0), -1)
+            
+    current_frame = frame
+    
+    # 转换帧格式用于流式传输
+    return jpeg_encoder.encode(frame)
+
+# 单生产者广播中心：所有客户端共享同一次推理和编码
+jpeg_encoder = AdaptiveJPEGEncoder(quality=80, target_fps=30)
+frame_broadcaster = FrameBroadcaster(produce_frame, queue_size=2)
+mjpeg_writer = MJPEGStreamWriter(frame_broadcaster, jpeg_encoder)
 
 @app.route('/video_feed')
 def video_feed():
     """视频流处理"""
-    def generate():
-        global camera
-        while True:
-            if camera is None or not camera.isOpened():
-                if not init_camera():
-                    time.sleep(1)
-                    continue
-                    
-            success, frame = camera.read()
-            if not success:
-                continue
-                
-            ret, buffer = cv2.imencode('.jpg', frame)
-            if not ret:
-                continue
-                
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-                   
-    return Response(generate(),
-                   mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(mjpeg_writer.stream(), mimetype=MJPEG_MIMETYPE)
 
 @app.route('/pose')
 def get_pose():
@@ -238,15 +210,21 @@ def bandwidth_status():
     try:
         current_bandwidth = video_processor.bandwidth_monitor.get_bandwidth()
         current_fps = video_processor.current_fps
-        points_count = len(video_processor.last_keypoints) if video_processor.last_keypoints else 0
+        points_count = len(video_processor.last_keypoints) if video_processor.last_keypoints is not None else 0
         
         # 添加详细日志
         logger.info(f"带宽状态 - 带宽: {current_bandwidth/1000:.2f}Kbps, FPS: {current_fps}, 点数: {points_count}")
         
+        # 姿态模型复杂度，降到最低仍超时说明主机已饱和
+        model_status = video_processor.pose_manager.get_status()
+        
         response_data = {
             'current_bandwidth': float(current_bandwidth),  # 确保数据类型正确
             'current_fps': int(current_fps),
             'points_count': points_count,
+            'model_complexity': model_status['model_complexity'],
+            'inference_p95_ms': model_status['p95_latency_ms'],
+            'saturated': model_status['saturated'],
             'status': 'success'
         }
         
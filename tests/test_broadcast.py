@@ -0,0 +1,101 @@
+import itertools
+import time
+from src.core.broadcast import FrameBroadcaster, Subscription
+
+def test_subscription_drops_oldest():
+    subscription = Subscription(queue_size=2)
+    for i in range(4):
+        subscription.push(i)
+    assert subscription.dropped_frames == 2
+    assert subscription.get(timeout=0) == 2
+    assert subscription.get(timeout=0) == 3
+
+def test_single_producer_shared_by_subscribers():
+    counter = itertools.count()
+    calls = []
+
+    def produce_frame():
+        time.sleep(0.005)
+        calls.append(1)
+        return b'frame-%d' % next(counter)
+
+    broadcaster = FrameBroadcaster(produce_frame, queue_size=4)
+    first = broadcaster.subscribe()
+    second = broadcaster.subscribe()
+    frames_a = [first.get() for _ in range(3)]
+    frames_b = [second.get() for _ in range(3)]
+    broadcaster.unsubscribe(first)
+    broadcaster.unsubscribe(second)
+
+    # 两个客户端收到的是同一个生产者的输出，而不是各自推理
+    assert set(frames_a) & set(frames_b)
+    assert broadcaster.get_stats()['subscribers'] == 0
+
+def test_mjpeg_writer_yields_parts_without_concatenation():
+    import numpy as np
+    from src.core.streaming import AdaptiveJPEGEncoder, MJPEGStreamWriter, PART_TRAILER
+
+    encoder = AdaptiveJPEGEncoder(quality=80, adapt_interval=1, target_fps=10)
+    frame = (np.random.rand(120, 160, 3) * 255).astype(np.uint8)
+    broadcaster = FrameBroadcaster(lambda: encoder.encode(frame))
+    stream = MJPEGStreamWriter(broadcaster, encoder).stream()
+
+    header, data, trailer = next(stream), next(stream), next(stream)
+    stream.close()
+    assert header.startswith(b'--frame\r\n') and b'Content-Length: %d' % len(data) in header
+    assert data[:2] == b'\xff\xd8'
+    assert trailer == PART_TRAILER
+
+def test_jpeg_encoder_degrades_for_slow_clients():
+    import numpy as np
+    from src.core.streaming import AdaptiveJPEGEncoder
+
+    encoder = AdaptiveJPEGEncoder(quality=40, min_quality=30, adapt_interval=1, target_fps=10)
+    encoder.report_throughput('client', 100)  # 每帧预算10字节
+    frame = (np.random.rand(120, 160, 3) * 255).astype(np.uint8)
+    for _ in range(4):
+        encoder.encode(frame)
+    assert encoder.quality == 30
+    assert encoder.scale < 1.0
+
+def test_mjpeg_writer_reports_delivered_throughput():
+    from src.core.streaming import EncodedFrame, MJPEGStreamWriter
+
+    class Recorder:
+        def __init__(self):
+            self.reports = []
+
+        def report_throughput(self, client, bytes_per_second):
+            self.reports.append(bytes_per_second)
+
+        def remove_client(self, client):
+            pass
+
+    frame = EncodedFrame(b'\xff\xd8' + b'x' * 998, 80, 1.0)
+    broadcaster = FrameBroadcaster(lambda: frame, queue_size=2)
+    recorder = Recorder()
+    stream = MJPEGStreamWriter(broadcaster, recorder, throughput_window=5).stream()
+
+    # 客户端每 20ms 才取走一帧：即使每次 yield 立即返回，吞吐也按帧间墙钟时间计算
+    for _ in range(3 * 6):
+        next(stream)
+        time.sleep(0.02 / 3)
+    stream.close()
+
+    frame_bytes = len(frame.header) + len(frame.data) + 2
+    assert recorder.reports
+    assert all(frame_bytes * 25 < rate < frame_bytes * 60 for rate in recorder.reports)
+
+def test_jpeg_encoder_recovers_when_clients_keep_up():
+    import numpy as np
+    from src.core.streaming import AdaptiveJPEGEncoder
+
+    encoder = AdaptiveJPEGEncoder(quality=30, adapt_interval=1, target_fps=10)
+    encoder.scale_index = 1
+    frame = (np.random.rand(120, 160, 3) * 255).astype(np.uint8)
+    # 客户端收到了生产端产出的全部帧：先恢复分辨率，再提高质量
+    encoder.report_throughput('client', 10 ** 9)
+    encoder.encode(frame)
+    assert encoder.scale == 1.0 and encoder.quality == 30
+    encoder.encode(frame)
+    assert encoder.quality == 35
@@ -1,5 +1,7 @@
+import time
+import numpy as np
 import pytest
-from src.core.capture import CaptureManager
+from src.core.video_processor import CaptureManager
 
 def test_capture_manager_init():
     config = {
@@ -10,4 +12,82 @@ def test_capture_manager_init():
     }
     manager = CaptureManager(config)
     assert manager.device == 0
-    assert manager.frame_size == (1280, 720) 
\ No newline at end of file
+    assert manager.frame_size == (1280, 720) 
+
+def test_capture_manager_latest_frame():
+    manager = CaptureManager({"buffer_size": 2})
+    now = time.time()
+    for frame_id in range(1, 5):
+        manager.frames.append((frame_id, now, np.zeros((4, 4, 3), dtype=np.uint8)))
+
+    frame_id, _, _ = manager.get_latest_frame(timeout=0)
+    assert frame_id == 4
+    assert manager.dropped_frames == 0
+    # 没有新帧时不重复返回旧帧
+    assert manager.get_latest_frame(timeout=0) is None
+
+    manager.frames.append((7, now, np.zeros((4, 4, 3), dtype=np.uint8)))
+    frame_id, _, _ = manager.get_latest_frame(timeout=0)
+    assert frame_id == 7
+    assert manager.dropped_frames == 2
+
+
+def test_landmark_extractor_fills_arrays():
+    from types import SimpleNamespace
+    from mediapipe.framework.formats import landmark_pb2
+    from src.core.landmarks import LandmarkExtractor
+
+    pose_landmarks = landmark_pb2.NormalizedLandmarkList()
+    for i in range(33):
+        pose_landmarks.landmark.add(x=i / 33, y=0.5, z=0.0, visibility=0.9)
+
+    extractor = LandmarkExtractor(max_hands=2, max_faces=1)
+    landmarks = extractor.extract(
+        1, SimpleNamespace(pose_landmarks=pose_landmarks), SimpleNamespace(multi_hand_landmarks=None))
+
+    assert landmarks.has_pose
+    assert landmarks.pose.dtype == np.float32
+    assert landmarks.pose.shape == (33, 4)
+    assert abs(landmarks.pose[3, 0] - 3 / 33) < 1e-6
+    assert landmarks.num_hands == 0
+    assert landmarks.selected_pose().shape == (21, 4)
+
+    # 新的一帧写入另一块缓冲，上一帧的数组保持不变
+    previous = landmarks.pose.copy()
+    extractor.extract(2)
+    assert np.array_equal(landmarks.pose, previous)
+
+
+def test_overlay_renderer_draws_on_frames_and_views():
+    """测试叠加层写入帧和不连续的 ROI 视图，画面外的关键点不报错"""
+    from src.core.renderer import OverlayRenderer
+    renderer = OverlayRenderer()
+    rng = np.random.default_rng(0)
+    pose = np.ones((33, 4), dtype=np.float32)
+    pose[:, :2] = rng.uniform(0.2, 0.8, (33, 2))
+    hand = np.ones((21, 4), dtype=np.float32)
+    hand[:, :2] = rng.uniform(0.2, 0.8, (21, 2))
+    face = np.ones((478, 4), dtype=np.float32)
+    face[:, :2] = rng.uniform(0.3, 0.7, (478, 2))
+
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    renderer.draw(frame, pose=pose, hands=[hand], faces=[face])
+    assert frame.any()
+
+    # 右半边的 ROI 视图不连续，圆点也要写回原帧；只有一个点可见，不画连线
+    canvas = np.zeros((120, 320, 3), dtype=np.uint8)
+    roi = canvas[:, 160:]
+    assert not roi.flags['C_CONTIGUOUS']
+    single = pose.copy()
+    single[:, 3] = 0.0
+    single[11, 3] = 1.0
+    renderer.draw_pose(roi, single)
+    assert canvas[:, 160:].any() and not canvas[:, :160].any()
+    x, y = renderer._to_pixels(roi, single)[11]
+    assert canvas[y, 160 + x].any()
+
+    # 画面外和负坐标的关键点被裁掉
+    outside = pose.copy()
+    outside[:, :2] = rng.choice([-0.5, 1.5], (33, 2))
+    blank = np.zeros((120, 160, 3), dtype=np.uint8)
+    renderer.draw(blank, pose=outside, hands=[outside[:21]], faces=[])
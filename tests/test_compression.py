@@ -8,29 +8,377 @@ class TestCompression(unittest.TestCase):
         
     def test_minimal_bandwidth(self):
         """测试0.2Kbps极限带宽"""
-        # 生成模拟关键点数据
-        mock_keypoints = np.random.rand(33, 4)  # 33个关键点，每个4维
+        # 模拟静止的参会者，5fps 持续 5 秒
+        mock_keypoints = np.random.rand(33, 4)
         
         # 压缩数据
-        compressed = self.compressor.compress(mock_keypoints, bandwidth=0.2)
+        packets = [self.compressor.compress(mock_keypoints, bandwidth=0.2) for _ in range(25)]
         
         # 验证数据大小
-        data_size = len(str(compressed).encode('utf-8'))
+        data_size = sum(len(packet) for packet in packets) / len(packets)
         bits_per_second = (data_size * 8 * 5)  # 5fps
         kbps = bits_per_second / 1000
         
         self.assertLessEqual(kbps, 0.2)
+
+    def test_binary_roundtrip(self):
+        """测试二进制数据包编解码一致"""
+        decoder = EnhancedCompressor()
+        rng = np.random.default_rng(0)
+        base = rng.random((33, 4)).astype(np.float32)
+        
+        for t in range(60):
+            keypoints = base.copy()
+            keypoints[:, :2] += 0.02 * np.sin(t / 5) + rng.normal(0, 0.002, (33, 2))
+            packet = self.compressor.compress(keypoints, bandwidth=0.2 if t < 30 else 0.4)
+            self.assertIsInstance(packet, bytes)
+            
+            decoded = decoder.decompress(packet)
+            sent = ~np.isnan(decoded[:, 0])
+            # 解码结果与编码端重建值逐位一致
+            np.testing.assert_array_equal(decoded[sent], self.compressor.last_reconstructed[sent])
+        
+        precision = self.compressor.quality_levels[self.compressor.current_quality]['precision']
+        error = np.abs(decoded[sent, :2] - keypoints[sent, :2]).max()
+        self.assertLess(error, 2.0 / (1 << precision))
         
     def test_quality_levels(self):
-        """测试不同带宽等级"""
+        """测试不同带宽等级：解码后传输的关键点数与质量等级一致"""
+        from src.core.compression_enhanced import read_header
         mock_keypoints = np.random.rand(33, 4)
+        decoder = EnhancedCompressor()
         
-        for bandwidth, expected_points in [
-            (0.2, 5),   # minimal模式，5个关键点
-            (0.3, 7),   # ultra_low模式，7个关键点
-            (0.4, 11),  # low模式，11个关键点
-            (0.5, 15),  # medium模式，15个关键点
+        for bandwidth, expected_quality, expected_points in [
+            (0.1, 'ultra_low', 7),   # 核心面部 + 核心上身
+            (0.2, 'low', 13),        # 加上次要面部特征
+            (0.3, 'medium', 17),     # 加上次要上身点
+            (0.5, 'high', 25),       # 加上手部
         ]:
             compressed = self.compressor.compress(mock_keypoints, bandwidth=bandwidth)
-            points_count = len(compressed['data']['points'])
-            self.assertEqual(points_count, expected_points) 
\ No newline at end of file
+            _, _, _, quality_index, _ = read_header(compressed)
+            self.assertEqual(decoder.quality_names[quality_index], expected_quality)
+            
+            decoded = decoder.decompress(compressed)
+            points_count = int((~np.isnan(decoded[:, 0])).sum())
+            self.assertEqual(points_count, expected_points)
+
+
+def test_residual_coder_roundtrip():
+    """测试算术编码残差可以逐值还原"""
+    from src.core.bitstream import BitWriter, BitReader
+    from src.core.entropy import ResidualCoder
+
+    rng = np.random.default_rng(1)
+    coder = ResidualCoder([0.002, 0.01])
+    for max_value, steps in [(1, 15), (7, 63), (127, 1023)]:
+        groups = rng.integers(0, 2, 20)
+        residuals = np.clip(np.round(rng.laplace(0, 2, (20, 2))), -max_value, max_value).astype(np.int64)
+
+        writer = BitWriter()
+        writer.write(5, 3)
+        coder.encode(writer, residuals, groups, max_value, steps)
+        reader = BitReader(writer.to_bytes())
+        assert reader.read(3) == 5
+        np.testing.assert_array_equal(coder.decode(reader, groups, max_value, steps), residuals)
+
+
+def test_entropy_coding_reduces_delta_bits():
+    """测试熵编码的差分帧不大于定长差分帧"""
+    from src.core.compression_enhanced import measure_bitrate
+
+    rng = np.random.default_rng(2)
+    base = rng.random((33, 4)).astype(np.float32)
+    frames = np.repeat(base[None], 120, axis=0)
+    frames[..., :2] += rng.normal(0, 0.003, (120, 33, 2)).cumsum(axis=0) * 0.3
+
+    fixed = measure_bitrate(frames, 'medium', entropy_coding=False)
+    coded = measure_bitrate(frames, 'medium', entropy_coding=True)
+    assert coded['delta_bits'] < fixed['delta_bits']
+
+
+def test_dictionary_roundtrip(tmp_path):
+    """测试预置字典压缩的数据包可以独立解码"""
+    from src.core.compression_enhanced import measure_bitrate, training_payloads, read_header
+    from src.core.dictionary import train_dictionary, save_dictionary, load_dictionary
+
+    rng = np.random.default_rng(3)
+    frames = np.repeat(rng.random((1, 33, 4)).astype(np.float32), 90, axis=0)
+
+    path = tmp_path / 'keypoints.dict'
+    save_dictionary(path, train_dictionary(training_payloads(frames, 'high')), version=2)
+    dictionary = load_dictionary(path)
+    assert dictionary.version == 2
+
+    # 静止画面的关键帧与训练样本相同，应当改用字典压缩
+    stats = measure_bitrate(frames, 'high', dictionary=dictionary)
+    assert stats['deflated_frames'] > 0
+    assert stats['keyframe_bits'] < measure_bitrate(frames, 'high')['keyframe_bits']
+
+    encoder = EnhancedCompressor(dictionary=dictionary)
+    decoder = EnhancedCompressor(dictionary=dictionary)
+    encoder.current_quality = 'high'
+    for keypoints in frames[:20]:
+        decoded = decoder.decompress(encoder.compress(keypoints))
+        sent = ~np.isnan(decoded[:, 0])
+        np.testing.assert_array_equal(decoded[sent], encoder.last_reconstructed[sent])
+
+    # 两端字典版本不一致时拒绝解码，不输出错误坐标
+    from src.core.dictionary import PacketDictionary
+    mismatched = EnhancedCompressor(dictionary=PacketDictionary(dictionary.data, version=3))
+    encoder = EnhancedCompressor(dictionary=dictionary)
+    encoder.current_quality = 'high'
+    packet = encoder.compress(frames[0])
+    assert read_header(packet)[1] == 1
+    assert mismatched.decompress(packet) is None
+
+
+def test_batch_roundtrip():
+    """测试帧组整体编码：逐点量化误差以内，无效帧保持为 NaN，可按帧范围解码"""
+    rng = np.random.default_rng(4)
+    frames = np.repeat(rng.random((1, 33, 4)).astype(np.float32), 100, axis=0)
+    frames[..., :2] += rng.normal(0, 0.002, (100, 33, 2)).cumsum(axis=0)
+    frames[..., :2] = np.clip(frames[..., :2], 0, 1)
+    frames[40:45] = np.nan
+
+    compressor = EnhancedCompressor()
+    compressor.current_quality = 'high'
+    data = compressor.compress_batch(frames, gop_size=16)
+    decoded = compressor.decompress_batch(data)
+
+    indices = compressor.quality_indices['high']
+    valid = ~np.isnan(frames).any(axis=(1, 2))
+    assert np.isnan(decoded[~valid]).all()
+    error = np.abs(decoded[valid][:, indices, :2] - frames[valid][:, indices, :2]).max()
+    assert error <= 0.5 / 1023 + 1e-6
+
+    part = compressor.decompress_batch(data, slice(30, 50))
+    np.testing.assert_array_equal(part, decoded[30:50])
+
+
+def test_kalman_predictor_reduces_bits_on_noisy_input():
+    """测试卡尔曼预测在抖动输入上比二次外推产生更少的位数"""
+    rng = np.random.default_rng(5)
+    frames = np.repeat(rng.random((1, 33, 4)).astype(np.float32) * 0.6 + 0.2, 300, axis=0)
+    frames[..., :2] += 0.05 * np.sin(np.arange(300) / 45)[:, None, None]
+    frames[..., :2] += rng.normal(0, 0.004, (300, 33, 2))
+
+    bits = {}
+    for predictor in ('quadratic', 'kalman'):
+        encoder = EnhancedCompressor(predictor=predictor)
+        decoder = EnhancedCompressor(predictor=predictor)
+        encoder.current_quality = 'high'
+        bits[predictor] = 0
+        for keypoints in frames:
+            packet = encoder.compress(keypoints)
+            bits[predictor] += len(packet) * 8
+            decoded = decoder.decompress(packet)
+            sent = ~np.isnan(decoded[:, 0])
+            np.testing.assert_array_equal(decoded[sent], encoder.last_reconstructed[sent])
+    assert bits['kalman'] < bits['quadratic']
+
+
+def test_kinematic_keyframe_saves_bits():
+    """测试骨骼树相对编码的关键帧位数更少，重建结果与逐点绝对编码相同"""
+    from src.core.kinematics import POSE_PARENTS, BONE_RANGES
+    rng = np.random.default_rng(3)
+    keypoints = np.zeros((33, 4), dtype=np.float32)
+    keypoints[:, 3] = 1.0
+    for i, parent in enumerate(POSE_PARENTS):
+        if parent < 0:
+            keypoints[i, :2] = rng.uniform(0.3, 0.7, 2)
+        else:
+            keypoints[i, :2] = keypoints[parent, :2] + rng.uniform(-0.5, 0.5, 2) * BONE_RANGES[i]
+
+    packets, decoded = {}, {}
+    for kinematic in (False, True):
+        encoder = EnhancedCompressor(kinematic=kinematic)
+        decoder = EnhancedCompressor(kinematic=kinematic)
+        encoder.current_quality = 'high'
+        packets[kinematic] = encoder.compress(keypoints)
+        decoded[kinematic] = decoder.decompress(packets[kinematic])
+    assert len(packets[True]) < len(packets[False])
+    np.testing.assert_array_equal(decoded[True], decoded[False])
+
+
+def test_pca_codec_roundtrip(tmp_path):
+    """测试姿态基的保存加载，以及系数个数按带宽预算选取"""
+    from src.core.pca_codec import PCACodec, train_basis, save_basis, load_basis, compare_with_pointwise
+    rng = np.random.default_rng(11)
+    frames = np.repeat(rng.uniform(0.3, 0.7, (1, 33, 4)).astype(np.float32), 400, axis=0)
+    frames[..., 3] = 1.0
+    latent = np.stack([np.sin(np.arange(400) / period) for period in (20, 33, 7)], axis=1)
+    frames[..., :2] += (latent @ rng.normal(0, 0.01, (3, 66))).reshape(400, 33, 2)
+    indices = EnhancedCompressor().quality_indices['medium']
+
+    basis = train_basis(frames[:300], indices, components=8, version=2)
+    path = tmp_path / 'pose.basis'
+    save_basis(path, basis)
+    loaded = load_basis(path)
+    assert loaded.version == 2
+    np.testing.assert_array_equal(loaded.components, basis.components)
+
+    encoder, decoder = PCACodec(basis), PCACodec(loaded)
+    for keypoints in frames[300:]:
+        packet = encoder.compress(keypoints, bandwidth=0.2)
+        assert len(packet) * 8 <= 0.2 * 1000 / 5
+        decoded = decoder.decompress(packet)
+        assert np.abs(decoded[indices, :2] - keypoints[indices, :2]).max() < 0.01
+        assert np.isnan(decoded[25:, 0]).all()
+
+    # 两端姿态基版本不一致或不是姿态基数据包时拒绝解码，与 EnhancedCompressor 一样返回 None
+    from src.core.pca_codec import PoseBasis
+    other = PoseBasis(basis.indices, basis.mean, basis.components, basis.scales, version=3)
+    assert other.tag != basis.tag
+    assert PCACodec(other).decompress(packet) is None
+    assert decoder.decompress(EnhancedCompressor().compress(frames[0])) is None
+
+    report = compare_with_pointwise(frames[300:], basis, 'medium', bandwidth=0.2)
+    assert report['components'] == encoder.components
+    assert report['pca_bits'] < report['pointwise_bits']
+
+
+def test_rate_controller_tracks_link_rate():
+    """测试率失真控制器的平均码率贴近链路速率，且两端可正常解码"""
+    from src.core.rate_control import RateController
+    rng = np.random.default_rng(2)
+    frames = np.repeat(rng.uniform(0.4, 0.6, (1, 33, 4)).astype(np.float32), 300, axis=0)
+    frames[..., 3] = 1.0
+    frames[..., :2] += 0.03 * np.sin(np.arange(300) / 15)[:, None, None] + rng.normal(0, 0.002, (300, 33, 2))
+
+    for rate in (0.2, 0.4, 1.0):
+        encoder = EnhancedCompressor(entropy_coding=True, rate_controller=RateController(rate, fps=5))
+        decoder = EnhancedCompressor()
+        bits = []
+        for keypoints in frames:
+            packet = encoder.compress(keypoints, bandwidth=rate)
+            bits.append(len(packet) * 8)
+            decoded = decoder.decompress(packet)
+            sent = ~np.isnan(decoded[:, 0])
+            np.testing.assert_array_equal(decoded[sent], encoder.last_reconstructed[sent])
+        kbps = np.mean(bits[50:]) * 5 / 1000
+        assert 0.9 * rate <= kbps <= 1.02 * rate
+
+
+def test_keypoint_decoder_resyncs_after_loss():
+    """测试独立解码端在丢包后不输出错误帧，并通过反馈尽快重同步"""
+    from src.core.compression import KeypointEncoder, KeypointDecoder
+    rng = np.random.default_rng(4)
+    base = rng.uniform(0.3, 0.7, (33, 4)).astype(np.float32)
+    encoder, decoder = KeypointEncoder(), KeypointDecoder()
+
+    decoded_frames, burst, longest = 0, 0, 0
+    feedback = []
+    for t in range(300):
+        keypoints = base.copy()
+        keypoints[:, :2] += 0.1 * np.sin(t / 10) + rng.normal(0, 0.003, (33, 2))
+        # 反馈晚两帧到达编码端
+        for request in [request for arrival, request in feedback if arrival == t]:
+            encoder.request_keyframe(request)
+        packet = encoder.encode(keypoints)
+        burst += 1
+        longest = max(longest, burst)
+        if rng.random() < 0.1:
+            continue
+
+        decoded = decoder.decode(packet)
+        request = decoder.keyframe_request()
+        if request is not None:
+            feedback.append((t + 2, request))
+        if decoded is not None:
+            decoded_frames, burst = decoded_frames + 1, 0
+            np.testing.assert_array_equal(decoded, encoder.references[packet['seq']])
+
+    # 每次丢包只影响反馈往返期间的几帧，而不是直到下一个关键帧
+    assert longest < encoder.keyframe_interval // 2
+    assert decoded_frames > 0.6 * 300
+    # 等待重同步期间在途帧解码失败不重复请求
+    assert len(feedback) <= decoder.lost_frames / 2
+
+
+def test_rate_controller_survives_starved_link():
+    """链路速率低于最小数据包时 λ 不会无限增大，长时间运行后每帧仍能编码，速率恢复后很快回到目标码率"""
+    from src.core.rate_control import RateController, LOG_LAMBDA_RANGE
+    rng = np.random.default_rng(6)
+    base = rng.uniform(0.4, 0.6, (33, 4)).astype(np.float32)
+    base[:, 3] = 1.0
+    controller = RateController(0.05, fps=5)
+    encoder = EnhancedCompressor(rate_controller=controller)
+
+    for t in range(3000):  # 5fps 下 10 分钟，每帧只有 10 位
+        keypoints = base.copy()
+        keypoints[:, :2] += 0.03 * np.sin(t / 15)
+        assert encoder.compress(keypoints, bandwidth=0.05) is not None
+    assert LOG_LAMBDA_RANGE[0] <= controller.log_lambda <= LOG_LAMBDA_RANGE[1]
+    assert controller.bucket.fullness <= 1.0
+
+    bits = []
+    for t in range(100):
+        keypoints = base.copy()
+        keypoints[:, :2] += 0.03 * np.sin(t / 15) + rng.normal(0, 0.002, (33, 2))
+        bits.append(len(encoder.compress(keypoints, bandwidth=1.0)) * 8)
+    assert np.mean(bits[50:]) * 5 / 1000 > 0.8
+
+
+def test_enhanced_decoder_rejects_gaps_and_requests_keyframe():
+    """测试差分帧丢失或乱序时解码端不输出错误帧，请求一次关键帧后恢复"""
+    from src.core.compression_enhanced import EnhancedEncoder, EnhancedDecoder
+    rng = np.random.default_rng(7)
+    base = rng.uniform(0.3, 0.7, (33, 4)).astype(np.float32)
+    encoder, decoder = EnhancedEncoder(), EnhancedDecoder()
+    encoder.current_quality = 'high'
+
+    packets, expected = [], []
+    for t in range(12):
+        keypoints = base.copy()
+        keypoints[:, :2] += 0.02 * np.sin(t / 3)
+        packets.append(encoder.encode(keypoints))
+        expected.append(encoder.last_reconstructed.copy())
+
+    for t in range(4):
+        np.testing.assert_array_equal(decoder.decode(packets[t]), expected[t])
+    # 第 4 帧丢失，之后的差分帧都不解码，只请求一次
+    for t in range(5, 9):
+        assert decoder.decode(packets[t]) is None
+    assert decoder.keyframe_request() and not decoder.keyframe_request()
+    # 迟到的第 4 帧紧接最后解码的帧，仍可解码；之后的帧已被丢弃，仍需关键帧
+    np.testing.assert_array_equal(decoder.decode(packets[4]), expected[4])
+    assert decoder.decode(packets[9]) is None
+    assert decoder.lost_frames == 5 and not decoder.keyframe_request()
+
+    encoder.request_keyframe()
+    keypoints = base.copy()
+    packet = encoder.encode(keypoints)
+    np.testing.assert_array_equal(decoder.decode(packet), encoder.last_reconstructed)
+    packet = encoder.encode(keypoints)
+    np.testing.assert_array_equal(decoder.decode(packet), encoder.last_reconstructed)
+    # 重复的数据包被丢弃
+    assert decoder.decode(packet) is None
+
+
+def test_enhanced_decoder_matches_encoder_after_resync():
+    """测试连续丢包后，重同步关键帧之后的每一帧(含后续差分帧和周期关键帧)都与编码端重建值一致"""
+    from src.core.compression_enhanced import EnhancedEncoder, EnhancedDecoder
+    for predictor in ('kalman', 'linear'):
+        rng = np.random.default_rng(8)
+        base = rng.uniform(0.3, 0.7, (33, 4)).astype(np.float32)
+        base[:, 3] = 1.0
+        encoder, decoder = EnhancedEncoder(predictor=predictor), EnhancedDecoder(predictor=predictor)
+
+        resynced, checked = False, 0
+        for t in range(200):
+            keypoints = base.copy()
+            keypoints[:, :2] += 0.05 * np.sin(t / 7) + rng.normal(0, 0.003, (33, 2))
+            packet = encoder.encode(keypoints, bandwidth=0.4)
+            if 40 <= t <= 43:
+                continue
+            decoded = decoder.decode(packet)
+            if decoder.keyframe_request():
+                encoder.request_keyframe()
+            if t > 43 and decoded is not None:
+                resynced = True
+            if resynced:
+                assert decoded is not None
+                sent = ~np.isnan(encoder.last_reconstructed[:, 0])
+                np.testing.assert_array_equal(decoded[sent], encoder.last_reconstructed[sent])
+                checked += 1
+        assert checked > 150 and decoder.lost_frames > 0
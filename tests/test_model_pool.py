@@ -0,0 +1,80 @@
+import time
+from threading import Lock
+import numpy as np
+from src.core.model_pool import ModelPool
+
+
+class FakeModel:
+    """模拟 MediaPipe 模型：耗时 delay 秒，返回模型名和输入图像的帧标记"""
+
+    def __init__(self, name, delay=0.02):
+        self.name = name
+        self.delay = delay
+        self.lock = Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def process(self, image):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        return self.name, int(image[0, 0, 0])
+
+
+def _models(delay=0.02):
+    return {name: FakeModel(name, delay) for name in ('pose', 'hands', 'face_mesh')}
+
+
+def _frame(frame_id):
+    return np.full((4, 4, 3), frame_id, dtype=np.uint8)
+
+
+def test_concurrent_and_sequential_results_match():
+    """并发和顺序模式对同一帧给出相同结果，并发模式的整帧延迟小于各模型之和"""
+    results = {}
+    for concurrent in (True, False):
+        pool = ModelPool(_models(), concurrent=concurrent)
+        try:
+            results[concurrent] = [pool.process(frame_id, _frame(frame_id)) for frame_id in range(5)]
+            stats = pool.get_latency_stats()
+        finally:
+            pool.shutdown()
+        if concurrent:
+            assert stats['frame']['mean'] < 3 * 20
+        else:
+            assert stats['frame']['mean'] >= 3 * 20
+    assert results[True] == results[False]
+    assert results[True][2] == {'frame_id': 2, 'pose': ('pose', 2), 'hands': ('hands', 2),
+                                'face_mesh': ('face_mesh', 2)}
+
+
+def test_results_join_by_frame_id():
+    """多帧同时在途时，每帧的结果只来自该帧的图像；同一模型不会被并发调用"""
+    models = _models(delay=0.01)
+    pool = ModelPool(models, max_workers=3)
+    try:
+        jobs = [pool.submit(frame_id, _frame(frame_id)) for frame_id in (7, 8, 9)]
+        for job in reversed(jobs):
+            results = job.result(timeout=5)
+            assert all(frame == job.frame_id for _, frame in results.values())
+    finally:
+        pool.shutdown()
+    assert all(model.max_active == 1 for model in models.values())
+
+
+def test_latency_stats_are_recorded():
+    """各模型和整帧的延迟按窗口记录，单位为毫秒"""
+    pool = ModelPool(_models(delay=0.01), concurrent=False, latency_window=3)
+    assert pool.get_latency_stats()['pose'] == {'last': 0.0, 'mean': 0.0, 'p95': 0.0}
+    for frame_id in range(5):
+        pool.process(frame_id, _frame(frame_id))
+
+    stats = pool.get_latency_stats()
+    assert len(pool.latency_history['pose']) == 3 and len(pool.frame_latency_history) == 3
+    for name in ('pose', 'hands', 'face_mesh'):
+        assert min(stats[name]['last'], stats[name]['mean'], stats[name]['p95']) >= 10
+    assert stats['frame']['last'] >= 30
+    assert stats['concurrent'] is False and stats['max_workers'] == 1
@@ -0,0 +1,445 @@
+import threading
+import time
+import numpy as np
+from src.core.compression_enhanced import EnhancedCompressor
+from src.core.satellite_adapter import SatelliteAdapter
+from src.core.transport import Transport, UDPTransport, unpack_datagram, DATA, PARITY
+
+
+def _adapter_pair(sender_transport=None):
+    first = sender_transport or UDPTransport()
+    second = UDPTransport()
+    first.connect(second.address)
+    second.connect(first.address)
+    return SatelliteAdapter(first), SatelliteAdapter(second)
+
+
+class DropFirstTransport(UDPTransport):
+    """每个数据包第一次发送时丢弃，用于验证重传"""
+
+    def __init__(self):
+        super().__init__()
+        self.seen = set()
+
+    def send(self, datagram):
+        kind, seq, _ = unpack_datagram(datagram)
+        if kind == DATA and seq not in self.seen:
+            self.seen.add(seq)
+            return
+        super().send(datagram)
+
+
+def test_keypoint_packets_over_loopback():
+    """两个适配器通过 UDP 回环传输真实的关键点数据包"""
+    sender, receiver = _adapter_pair()
+    encoder, decoder = EnhancedCompressor(), EnhancedCompressor()
+    rng = np.random.default_rng(0)
+    base = rng.random((33, 4)).astype(np.float32)
+    try:
+        packets = []
+        for t in range(10):
+            keypoints = base.copy()
+            keypoints[:, :2] += 0.01 * np.sin(t / 3)
+            packets.append(encoder.compress(keypoints))
+            sender.send_data(packets[-1])
+
+        received = [receiver.receive_data(timeout=3.0) for _ in packets]
+        assert received == packets
+        for packet in received:
+            assert decoder.decompress(packet) is not None
+        # 全部数据包都被确认
+        assert _wait_until(lambda: not sender.pending_acks)
+    finally:
+        sender.close()
+        receiver.close()
+
+
+def test_lost_packets_are_retransmitted():
+    sender, receiver = _adapter_pair(DropFirstTransport())
+    sender.max_latency = 0.05
+    try:
+        sender.send_data(b'keyframe')
+        assert receiver.receive_data(timeout=3.0) == b'keyframe'
+        assert sender.retransmissions >= 1
+        assert _wait_until(lambda: not sender.pending_acks)
+    finally:
+        sender.close()
+        receiver.close()
+
+
+def _wait_until(condition, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_emulated_link_rate_and_latency():
+    """仿真链路：发送阻塞到数据离开链路，到达时刻再加上传播延迟"""
+    from src.core.link_emulator import EmulatedLink
+    clock = FakeClock()
+    link = EmulatedLink(bandwidth=0.8, latency=500, clock=clock, sleep=clock.sleep)
+    link.transmit(b'x' * 100)          # 800 位 / 800 位每秒 = 1 秒
+    assert clock.now == 1.0
+    assert link.receive(timeout=0) is None
+    clock.now = 1.5
+    assert link.receive(timeout=0) == b'x' * 100
+
+
+def test_emulated_loss_is_seeded(tmp_path):
+    from src.core.link_emulator import EmulatedLink, TraceReplay
+
+    def pattern(seed, **conditions):
+        clock = FakeClock()
+        link = EmulatedLink(bandwidth=1000, seed=seed, clock=clock, sleep=clock.sleep, **conditions)
+        return [link.transmit(b'packet') for _ in range(2000)]
+
+    assert pattern(7, packet_loss=0.2) == pattern(7, packet_loss=0.2)
+    assert abs(np.mean(pattern(7, packet_loss=0.2)) - 0.2) < 0.03
+    bursty = pattern(7, packet_loss=0.2, burst_length=5)
+    assert abs(np.mean(bursty) - 0.2) < 0.06
+    # 突发丢包：丢失后下一个也丢失的概率远高于平均丢包率
+    following = [b for a, b in zip(bursty, bursty[1:]) if a]
+    assert np.mean(following) > 0.6
+
+    trace = tmp_path / 'link.trace'
+    trace.write_text('# 延迟毫秒 丢失\n300 0\n650,1\n420 0\n')
+    replay = TraceReplay.from_file(trace)
+    assert [replay.next() for _ in range(4)] == [(0.3, False), (0.65, True), (0.42, False), (0.3, False)]
+
+
+def test_adapters_over_lossy_emulated_link():
+    """两个适配器经有损仿真链路传输，丢失的数据包由重传补齐"""
+    from src.core.link_emulator import emulated_pair
+    first, second = emulated_pair(seed=3, bandwidth=4, latency=50, jitter=10, packet_loss=0.2)
+    sender, receiver = SatelliteAdapter(first), SatelliteAdapter(second)
+    sender.max_latency = 0.1
+    try:
+        payloads = [b'frame-%d' % i for i in range(10)]
+        for payload in payloads:
+            sender.send_data(payload)
+        received = [receiver.receive_data(timeout=3.0) for _ in payloads]
+        assert sorted(received) == sorted(payloads)
+        assert first.outgoing.stats['lost'] > 0 and sender.retransmissions > 0
+    finally:
+        sender.close()
+        receiver.close()
+
+
+def test_receive_forms_wake_on_packet_events():
+    """阻塞、非阻塞和异步接收都由数据包到达事件唤醒，不依赖轮询"""
+    import asyncio
+    from src.core.link_emulator import emulated_pair
+    first, second = emulated_pair(seed=1, bandwidth=1000, latency=0)
+    sender, receiver = SatelliteAdapter(first), SatelliteAdapter(second)
+    try:
+        assert receiver.receive_nowait() is None
+        assert receiver.receive_data(timeout=0) is None
+
+        sender.send_data(b'blocking')
+        assert receiver.receive_data(timeout=3.0) == b'blocking'
+        # 确认和往返时间在收到确认时更新
+        assert _wait_until(lambda: len(sender.latency_history) == 1)
+
+        async def consume():
+            received = []
+            sender.send_data(b'first')
+            sender.send_data(b'second')
+            async for payload in receiver:
+                received.append(payload)
+                if len(received) == 2:
+                    break
+            timed_out = await receiver.receive_async(timeout=0.05)
+            return received, timed_out
+
+        received, timed_out = asyncio.run(consume())
+        assert received == [b'first', b'second']
+        assert timed_out is None
+    finally:
+        sender.close()
+        receiver.close()
+    # 关闭后阻塞接收立即返回
+    started = time.time()
+    assert receiver.receive_data(timeout=None) is None
+    assert time.time() - started < 0.5
+
+
+def test_inflight_table_orders_by_send_time_and_caps_memory():
+    from src.core.inflight import InFlightTable
+    table = InFlightTable(max_packets=3)
+    packets = [{'seq': seq, 'data': b'x' * 10, 'sent': None, 'retries': 0} for seq in range(4)]
+    for packet in packets[:3]:
+        assert table.add(packet) == []
+    for seq, now in ((1, 1.0), (0, 2.0), (2, 3.0)):
+        table.mark_sent(seq, now, 15)
+
+    # 超时只取出最早发出的数据包，重传后排到末尾
+    assert [p['seq'] for p in table.expire(2.5, timeout=1.0)] == [1]
+    table.mark_sent(1, 4.0, 15)
+    assert table.next_deadline(1.0) == 3.0
+    assert table.delivery_rate(4.0) is None
+    assert table.acknowledge(0, 4.5)['seq'] == 0 and 0 not in table
+
+    # 超出上限时淘汰最早发出的数据包
+    table.add(packets[3])
+    table.add({'seq': 4, 'data': b'x' * 10, 'sent': None, 'retries': 0})
+    assert table.evicted == 1 and 2 not in table and len(table) == 3
+
+
+def test_inflight_table_estimates_delivery_rate_from_acks():
+    """带宽估计按确认到达的字节数计算，与发送了多少无关，空闲时间不计入"""
+    from src.core.inflight import InFlightTable
+    table = InFlightTable(rate_window=10.0)
+    for seq in range(10):
+        table.add({'seq': seq, 'data': b'x' * 95, 'sent': None, 'retries': 0})
+    # 一次发出 10 个 100 字节的数据报，链路每 0.1 秒送达一个
+    for seq in range(10):
+        table.mark_sent(seq, 0.0, 100)
+    for seq in range(10):
+        table.acknowledge(seq, 0.5 + 0.1 * seq)
+    assert abs(table.delivery_rate(1.4) - 10 * 100 * 8 / 1.4) < 1e-6
+
+    # 空闲后发送方自身受限的低速样本不会拉低窗口内的最大值
+    table.add({'seq': 10, 'data': b'x' * 95, 'sent': None, 'retries': 0})
+    table.mark_sent(10, 5.0, 100)
+    table.acknowledge(10, 5.5)
+    assert table.delivery_rate(5.5) == table.delivery_rate(1.4)
+    assert table.delivery_rate(20.0) is None
+
+
+def test_fec_recovers_lost_packets_without_retransmission():
+    """校验包恢复组内丢失的数据包：XOR 补 1 个，Reed-Solomon 补 m 个"""
+    from src.core.fec import FECEncoder, FECDecoder
+    payloads = [b'keyframe-%d' % i * (i + 1) for i in range(4)]
+    for mode, lost in (('xor', [2]), ('rs', [0, 3])):
+        encoder = FECEncoder(mode, block_size=4, max_parity=2)
+        encoder.set_loss_rate(0.2)
+        parities = []
+        for seq, payload in enumerate(payloads, start=10):
+            parities += encoder.add(seq, payload, now=0.0)
+        assert len(parities) == encoder.parity == (1 if mode == 'xor' else 2)
+
+        decoder = FECDecoder()
+        recovered = []
+        for seq, payload in enumerate(payloads, start=10):
+            if seq - 10 not in lost:
+                recovered += decoder.on_data(seq, payload)
+        for base, body in parities:
+            recovered += decoder.on_parity(base, body)
+        assert sorted(recovered) == [(10 + i, payloads[i]) for i in lost]
+
+    # 丢包率越高校验包越多，无丢包时不发
+    encoder = FECEncoder('rs', max_parity=3)
+    counts = []
+    for loss in (0.0, 0.05, 0.2):
+        encoder.set_loss_rate(loss)
+        counts.append(encoder.parity)
+    assert counts[0] == 0 and counts[0] < counts[1] < counts[2]
+
+
+def test_adapters_recover_losses_with_fec():
+    """不重传时，有损链路上的数据包由校验包补齐，冗余开销在链路状态中报告"""
+    from src.core.link_emulator import emulated_pair
+    first, second = emulated_pair(seed=5, bandwidth=1000, latency=20, packet_loss=0.1)
+    sender = SatelliteAdapter(first, max_retries=0, fec='rs')
+    receiver = SatelliteAdapter(second)
+    try:
+        payloads = [b'frame-%d' % i for i in range(40)]
+        for payload in payloads:
+            sender.send_data(payload)
+        received = []
+        while len(received) < len(payloads):
+            payload = receiver.receive_data(timeout=1.0)
+            if payload is None:
+                break
+            received.append(payload)
+
+        assert first.outgoing.stats['lost'] > 0 and sender.retransmissions == 0
+        assert receiver.get_link_status()['fec_recovered'] > 0
+        assert len(received) > len(payloads) - first.outgoing.stats['lost']
+        status = sender.get_link_status()
+        assert status['fec_parity'] > 0 and 0 < status['fec_overhead'] < 2
+    finally:
+        sender.close()
+        receiver.close()
+
+
+def test_sender_paces_at_configured_link_rate():
+    """发送线程按配置的链路容量限速，快速链路上吞吐量不受 2-4 Kbps 初始估计限制"""
+    from src.core.link_emulator import emulated_pair
+    first, second = emulated_pair(seed=2, bandwidth=100, latency=20)
+    sender = SatelliteAdapter(first, rate=100_000)
+    receiver = SatelliteAdapter(second)
+    try:
+        payloads = [b'%03d' % i + b'x' * 97 for i in range(50)]
+        started = time.time()
+        for payload in payloads:
+            sender.send_data(payload)
+        received = [receiver.receive_data(timeout=3.0) for _ in payloads]
+        elapsed = time.time() - started
+        assert received == payloads
+        # 链路限速下约 0.42 秒，按 4 Kbps 发送则要 10 秒以上
+        assert elapsed < 2.0
+    finally:
+        sender.close()
+        receiver.close()
+
+
+def test_bandwidth_estimate_follows_acknowledged_rate():
+    """未配置链路容量时，带宽估计按确认的投递速率逐步升到链路容量，不再停在 2-4 Kbps"""
+    from src.core.link_emulator import emulated_pair
+    first, second = emulated_pair(seed=2, bandwidth=100, latency=20)
+    sender, receiver = SatelliteAdapter(first), SatelliteAdapter(second)
+    try:
+        for _ in range(200):
+            sender.send_data(b'x' * 100)
+        received = 0
+        while received < 200 and receiver.receive_data(timeout=5.0) is not None:
+            received += 1
+        assert received == 200
+        assert _wait_until(lambda: not sender.pending_acks)
+        assert 40_000 < sender.get_link_status()['bandwidth'] <= 110_000
+    finally:
+        sender.close()
+        receiver.close()
+
+
+def test_simulated_link_rate_caps_estimate_and_configure_keeps_fields():
+    """模拟的链路速率是带宽估计的上限；configure 只修改给出的参数"""
+    from src.core.link_emulator import EmulatedLink, TraceReplay
+    adapter = SatelliteAdapter()
+    try:
+        adapter.simulate_network_conditions(bandwidth=0.2, packet_loss=0.0, latency=50)
+        adapter.send_data(b'x' * 10)
+        assert _wait_until(lambda: not adapter.pending_acks)
+        assert adapter.get_link_status()['bandwidth'] <= 200
+        assert adapter._pacing_rate() == 200
+    finally:
+        adapter.close()
+
+    trace = TraceReplay([(0.1, False)])
+    link = EmulatedLink(trace=trace, reorder=True, burst=500)
+    link.configure(packet_loss=0.5)
+    assert link.trace is trace and link.reorder and link.bucket.burst == 500 * 8
+    assert link.conditions['packet_loss'] == 0.5
+
+
+def test_close_wakes_blocked_receiver():
+    """接收线程无超时阻塞在 transport.receive 中，close() 关闭传输层后立即退出"""
+    from src.core.link_emulator import emulated_pair
+    class RecordingTransport(UDPTransport):
+        def __init__(self):
+            super().__init__()
+            self.timeouts = []
+
+        def receive(self, timeout=None):
+            self.timeouts.append(timeout)
+            return super().receive(timeout)
+
+    recording = RecordingTransport()
+    udp = _adapter_pair(recording)
+    emulated = tuple(SatelliteAdapter(transport) for transport in emulated_pair(seed=1, latency=10))
+    for adapter in udp + emulated:
+        time.sleep(0.05)
+        start = time.perf_counter()
+        adapter.close()
+        assert time.perf_counter() - start < 0.5
+        assert not adapter.receiver_thread.is_alive()
+    # 空闲时不再按固定间隔唤醒轮询
+    assert recording.timeouts == [None]
+
+
+class RecordingTransport(Transport):
+    """记录每个发出的数据报及其发送时刻，不投递任何数据"""
+
+    def __init__(self):
+        self.sent = []
+        self.closed = threading.Event()
+
+    def send(self, datagram):
+        self.sent.append((time.time(), datagram))
+
+    def receive(self, timeout=None):
+        self.closed.wait(timeout)
+        return None
+
+    def close(self):
+        self.closed.set()
+
+
+def test_flushed_parity_is_paced_with_data():
+    """超时结束的纠错组发出的校验包计入限速，之后的数据包要等它占用的发送时间过去"""
+    from src.core.fec import FECEncoder
+    rate = 8000  # 1000 字节/秒
+    transport = RecordingTransport()
+    sender = SatelliteAdapter(transport, rate=rate, fec=FECEncoder('rs', block_size=4, max_delay=0.02))
+    try:
+        sender.send_data(b'x' * 100)
+        assert _wait_until(lambda: any(unpack_datagram(d)[0] == PARITY for _, d in transport.sent))
+        sender.send_data(b'y' * 10)
+        assert _wait_until(lambda: len([d for _, d in transport.sent if unpack_datagram(d)[0] == DATA]) == 2)
+
+        sent = [(at, unpack_datagram(d)[0], len(d)) for at, d in transport.sent]
+        parity_at = min(at for at, kind, _ in sent if kind == PARITY)
+        parity_bytes = sum(size for _, kind, size in sent if kind == PARITY)
+        data_at = [at for at, kind, _ in sent if kind == DATA]
+        # 第一个数据包占用 0.1 秒，校验包等它过去才发出
+        assert parity_at - data_at[0] >= 0.1 - 0.01
+        assert data_at[1] - parity_at >= parity_bytes * 8 / rate - 0.01
+    finally:
+        sender.close()
+
+
+def test_late_ack_is_not_counted_as_loss():
+    """重传超时后晚到的确认不计为丢包，重传次数用尽放弃时才计一次"""
+    transport = RecordingTransport()
+    sender = SatelliteAdapter(transport, max_retries=1)
+    sender.close()  # 只调用内部方法，不需要发送和接收线程
+    sender.packet_loss_rate = 0.0
+    for seq in (0, 1):
+        packet = {'seq': seq, 'data': b'x', 'time': 0.0, 'sent': None, 'retries': 0, 'priority': 0}
+        sender.pending_acks.add(packet)
+        sender.pending_acks.mark_sent(seq, time.time() - 10, 10)
+
+    sender._retransmit_expired()
+    assert sender.retransmissions == 2 and sender.packet_loss_rate == 0.0
+
+    # 第 0 个数据包的确认在重传之后才到达，按送达计
+    sender._acknowledged(0, b'')
+    assert 0 not in sender.pending_acks and sender.packet_loss_rate == 0.0
+
+    # 第 1 个数据包重传后仍未确认，放弃时计一次丢包
+    sender.pending_acks.mark_sent(1, time.time() - 10, 10)
+    sender._retransmit_expired()
+    assert sender.dropped_packets == 1 and 1 not in sender.pending_acks
+    assert sender.packet_loss_rate > 0.0
+
+
+def test_emergency_mode_drains_send_queue():
+    """紧急模式经队列接口清空发送队列，发送线程之后仍能正常取到新数据"""
+    transport = RecordingTransport()
+    sender = SatelliteAdapter(transport, rate=800)  # 100 字节/秒，后续数据包在队列中排队
+    try:
+        for _ in range(5):
+            sender.send_data(b'x' * 50)
+        sender.emergency_mode()
+        assert sender.send_buffer.empty() and sender.send_buffer.unfinished_tasks == 0
+        assert not sender.pending_acks
+
+        sender.send_data(b'after')
+        assert _wait_until(lambda: any(d.endswith(b'after') for _, d in transport.sent))
+    finally:
+        sender.close()